@@ -0,0 +1,151 @@
+"""
+Daily activity rollups per community and per user.
+
+Write paths call ``record()``, which hands today's deltas to the ``activity``
+job. Activity jobs all share one key, so a worker claiming a batch of them
+folds every delta into one multi-row upsert per table:
+``INSERT ... ON CONFLICT DO UPDATE`` (SQLite, PostgreSQL) or
+``ON DUPLICATE KEY UPDATE`` (MySQL), adding to the stored totals. Stats
+endpoints then read a few rows per day instead of scanning posts and votes.
+
+``backfill()`` rebuilds the rollups from the raw tables, e.g. after adding
+this on an existing database.
+"""
+from collections import Counter, defaultdict
+from datetime import date, datetime, time
+
+from django.db import connection, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate, TruncMonth, TruncWeek
+from django.utils import timezone
+
+from . import jobs
+from .models import Comment, CommentVote, CommunityActivity, Post, PostVote, Subscription, UserActivity
+
+# Rows per INSERT; keeps the parameter count under SQLite's limit.
+UPSERT_BATCH_SIZE = 100
+
+TABLES = {
+    'community': (CommunityActivity, 'community_id', ('posts', 'comments', 'votes', 'subscribers')),
+    'user': (UserActivity, 'user_id', ('posts', 'comments', 'votes')),
+}
+
+BUCKETS = {'day': None, 'week': TruncWeek, 'month': TruncMonth}
+
+
+def record(community=None, user=None, **deltas):
+    """Add ``deltas`` (e.g. ``posts=1``) to today's rows for the given ids."""
+    record_many([(community, user, deltas)])
+
+
+def record_many(events):
+    """``record()`` for several ``(community, user, deltas)`` in one job."""
+    day = timezone.localdate().isoformat()
+    rows = []
+    for community, user, deltas in events:
+        for table, owner in (('community', community), ('user', user)):
+            fields = TABLES[table][2]
+            counts = {field: delta for field, delta in deltas.items() if field in fields and delta}
+            if owner is not None and counts:
+                rows.append([table, owner, day, counts])
+    if rows:
+        jobs.enqueue('activity', {'rows': rows})
+
+
+def _upsert(model, column, fields, rows):
+    qn = connection.ops.quote_name
+    table = qn(model._meta.db_table)
+    columns = [column, 'day', *fields]
+    row_sql = '(' + ', '.join(['%s'] * len(columns)) + ')'
+    params = [value for owner, day, counts in rows for value in (owner, day, *(counts[f] for f in fields))]
+    if connection.vendor == 'mysql':
+        update = ', '.join(f'{qn(f)} = {qn(f)} + VALUES({qn(f)})' for f in fields)
+        conflict = f'ON DUPLICATE KEY UPDATE {update}'
+    else:
+        update = ', '.join(f'{qn(f)} = {table}.{qn(f)} + excluded.{qn(f)}' for f in fields)
+        conflict = f'ON CONFLICT ({qn(column)}, {qn("day")}) DO UPDATE SET {update}'
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {table} ({', '.join(qn(c) for c in columns)}) "
+            f"VALUES {', '.join([row_sql] * len(rows))} {conflict}",
+            params,
+        )
+
+
+def apply(rows):
+    """Add ``[table, owner_id, day, {field: delta}]`` rows to the rollups."""
+    totals = defaultdict(Counter)
+    for table, owner, day, counts in rows:
+        if isinstance(day, str):
+            day = date.fromisoformat(day)
+        totals[table, owner, day].update(counts)
+    for table, (model, column, fields) in TABLES.items():
+        # Sorted, so concurrent batches lock rows in the same order.
+        batch = sorted(
+            (owner, day, counts) for (name, owner, day), counts in totals.items()
+            if name == table and any(counts.values())
+        )
+        for start in range(0, len(batch), UPSERT_BATCH_SIZE):
+            _upsert(model, column, fields, batch[start:start + UPSERT_BATCH_SIZE])
+
+
+@jobs.handler('activity')
+def _apply_job(payloads):
+    apply([row for payload in payloads for row in payload['rows']])
+
+
+def series(queryset, since, until, bucket='day'):
+    """
+    Totals per ``bucket`` (day, week or month) between ``since`` and
+    ``until`` inclusive, oldest first. Buckets without activity are omitted.
+    """
+    fields = [f for f in TABLES['community'][2] if f in {field.name for field in queryset.model._meta.fields}]
+    rows = queryset.filter(day__gte=since, day__lte=until)
+    trunc = BUCKETS[bucket]
+    if trunc is None:
+        return list(rows.order_by('day').values(*fields, start=F('day')))
+    return list(
+        rows.annotate(start=trunc('day')).values('start')
+        .annotate(**{field: Sum(field) for field in fields})
+        .order_by('start')
+    )
+
+
+SOURCES = [
+    ('community', 'posts', Post._base_manager, 'community_id', 'created_at'),
+    ('community', 'comments', Comment.objects, 'post__community_id', 'created_at'),
+    ('community', 'votes', PostVote.objects, 'post__community_id', 'created_at'),
+    ('community', 'votes', CommentVote.objects, 'comment__post__community_id', 'created_at'),
+    ('community', 'subscribers', Subscription.objects, 'community_id', 'subscribed_at'),
+    ('user', 'posts', Post._base_manager, 'user_id', 'created_at'),
+    ('user', 'comments', Comment.objects, 'user_id', 'created_at'),
+    ('user', 'votes', PostVote.objects, 'user_id', 'created_at'),
+    ('user', 'votes', CommentVote.objects, 'user_id', 'created_at'),
+]
+
+
+@transaction.atomic
+def backfill(since=None, report=None):
+    """
+    Replace the rollups for ``since`` (a date) onwards, or all of them, with
+    totals counted from the raw tables. ``report(table, field, rows)`` is
+    called per source. Archived threads are not counted.
+    """
+    for model, _, _ in TABLES.values():
+        stale = model.objects.all() if since is None else model.objects.filter(day__gte=since)
+        stale.delete()
+    for table, field, manager, owner, timestamp in SOURCES:
+        queryset = manager.all()
+        if since is not None:
+            start = timezone.make_aware(datetime.combine(since, time.min))
+            queryset = queryset.filter(**{f'{timestamp}__gte': start})
+        counts = (
+            queryset.filter(**{f'{owner}__isnull': False})
+            .annotate(owner=F(owner), day=TruncDate(timestamp))
+            .values('owner', 'day').annotate(n=Count('pk')).order_by()
+            .values_list('owner', 'day', 'n')
+        )
+        rows = [[table, owner_id, day, {field: n}] for owner_id, day, n in counts]
+        apply(rows)
+        if report:
+            report(table, field, len(rows))
@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        # Register job handlers so `run_jobs` can execute them.
+        from . import activity, counters, inbox, live, purge, ranking, recommendations, snapshots, trending  # noqa: F401
+        # Connect the user-change receivers that expire token claims.
+        from . import authentication  # noqa: F401
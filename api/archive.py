@@ -0,0 +1,199 @@
+"""
+Cold storage for old posts.
+
+``archive_posts()`` moves posts older than ``ARCHIVE_AFTER_DAYS``, with their
+comments and votes, into ``ArchivedPost``/``ArchivedComment``: one row per
+post or comment, content and votes packed into bytes (zlib-compressed when
+``ARCHIVE_COMPRESS`` is on). Ids are kept, so post URLs keep working: the
+post detail and comments endpoints fall back to the archive, and archived
+threads are read-only. ``restore_post()`` moves a thread back.
+"""
+import json
+import zlib
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.http import Http404
+from django.utils import timezone
+from rest_framework.exceptions import PermissionDenied
+
+from . import purge, snapshots
+from .models import ArchivedComment, ArchivedPost, Comment, CommentVote, Post, PostVote, User
+
+
+# Counter columns restore_post() writes back after re-inserting the rows
+TOTALS = ('vote_count', 'upvotes', 'downvotes', 'comment_count')
+COMMENT_TOTALS = ('vote_count', 'upvotes', 'downvotes', 'best_score', 'controversy')
+
+
+class ArchivedThread(PermissionDenied):
+    default_detail = "This thread is archived and read-only."
+    default_code = 'archived'
+
+
+def find(queryset, pk, writing):
+    """
+    The archived row ``pk`` for a request the live table answered with 404.
+    Raises ``ArchivedThread`` if the request writes, ``Http404`` if there is
+    no such row.
+    """
+    try:
+        archived = queryset.filter(pk=pk).first()
+    except (TypeError, ValueError):
+        archived = None
+    if archived is None:
+        raise Http404
+    if writing:
+        raise ArchivedThread
+    return archived
+
+
+def pack(data, compress):
+    return zlib.compress(data) if compress else data
+
+
+def unpack(data, compressed):
+    data = bytes(data)
+    return zlib.decompress(data) if compressed else data
+
+
+def pack_text(text, compress):
+    return pack(text.encode(), compress)
+
+
+def unpack_text(data, compressed):
+    return unpack(data, compressed).decode()
+
+
+def pack_votes(votes, compress):
+    return pack(json.dumps(sorted(votes), separators=(',', ':')).encode(), compress)
+
+
+def unpack_votes(data, compressed):
+    """``{user_id: vote_value}`` from a packed votes blob."""
+    return dict(json.loads(unpack(data, compressed)))
+
+
+def _votes_by(model, owner, owner_ids):
+    votes = {}
+    for owner_id, user_id, value in model.objects.filter(**{f'{owner}__in': owner_ids}).values_list(
+        f'{owner}_id', 'user_id', 'vote_value',
+    ):
+        votes.setdefault(owner_id, []).append((user_id, value))
+    return votes
+
+
+def _archive_batch(post_ids, compress):
+    posts = list(Post.objects.filter(pk__in=post_ids).values(
+        'id', 'user_id', 'community_id', 'title', 'content', 'post_type', 'vote_count', 'upvotes',
+        'downvotes', 'comment_count', 'view_count', 'unique_viewers', 'created_at', 'updated_at',
+    ))
+    comments = list(Comment.objects.filter(post__in=post_ids).values(
+        'id', 'post_id', 'user_id', 'parent_id', 'content', 'vote_count', 'upvotes', 'downvotes',
+        'best_score', 'controversy', 'created_at', 'updated_at',
+    ))
+    post_votes = _votes_by(PostVote, 'post', post_ids)
+    comment_votes = _votes_by(CommentVote, 'comment', [c['id'] for c in comments])
+
+    ArchivedPost.objects.bulk_create([
+        ArchivedPost(
+            **{**post, 'content': pack_text(post['content'], compress)},
+            votes=pack_votes(post_votes.get(post['id'], []), compress),
+            compressed=compress,
+        )
+        for post in posts
+    ])
+    ArchivedComment.objects.bulk_create([
+        ArchivedComment(
+            **{**comment, 'content': pack_text(comment['content'], compress)},
+            votes=pack_votes(comment_votes.get(comment['id'], []), compress),
+            compressed=compress,
+        )
+        for comment in comments
+    ])
+    purge.remove(Post.objects.filter(pk__in=post_ids))
+    return len(posts), len(comments)
+
+
+def archive_posts(older_than=None, batch_size=100, compress=None, report=None):
+    """
+    Archive every live post created more than ``older_than`` ago, ``batch_size``
+    posts per transaction. ``report(posts, comments)`` gets running totals.
+    Returns them.
+    """
+    if older_than is None:
+        older_than = timedelta(days=settings.ARCHIVE_AFTER_DAYS)
+    if compress is None:
+        compress = settings.ARCHIVE_COMPRESS
+    candidates = Post.objects.filter(
+        created_at__lt=timezone.now() - older_than, deleted_at__isnull=True,
+    ).order_by('pk').values_list('pk', flat=True)
+    posts = comments = 0
+    last = 0
+    while True:
+        batch = list(candidates.filter(pk__gt=last)[:batch_size])
+        if not batch:
+            return posts, comments
+        with transaction.atomic():
+            archived_posts, archived_comments = _archive_batch(batch, compress)
+        posts += archived_posts
+        comments += archived_comments
+        last = batch[-1]
+        if report:
+            report(posts, comments)
+
+
+@transaction.atomic
+def restore_post(pk):
+    """Move archived post ``pk`` and its thread back into the live tables."""
+    archived = ArchivedPost.objects.select_for_update().get(pk=pk)
+    comments = list(archived.comments.order_by('pk'))
+    post_votes = unpack_votes(archived.votes, archived.compressed)
+    comment_votes = {c.pk: unpack_votes(c.votes, c.compressed) for c in comments}
+    # Accounts deleted since archiving lose their authorship and votes.
+    referenced = {archived.user_id, *post_votes, *(c.user_id for c in comments)}
+    for votes in comment_votes.values():
+        referenced.update(votes)
+    users = set(User.objects.filter(pk__in=referenced - {None}).values_list('pk', flat=True))
+
+    post = Post(
+        id=archived.pk, user_id=archived.user_id if archived.user_id in users else None,
+        community_id=archived.community_id, title=archived.title,
+        content=unpack_text(archived.content, archived.compressed), post_type=archived.post_type,
+        vote_count=archived.vote_count, upvotes=archived.upvotes, downvotes=archived.downvotes,
+        comment_count=archived.comment_count,
+        view_count=archived.view_count, unique_viewers=archived.unique_viewers,
+    )
+    post.save(force_insert=True)
+    restored = Comment.objects.bulk_create([
+        Comment(
+            id=c.pk, post_id=post.pk, user_id=c.user_id if c.user_id in users else None,
+            parent_id=c.parent_id, content=unpack_text(c.content, c.compressed), vote_count=c.vote_count,
+            upvotes=c.upvotes, downvotes=c.downvotes, best_score=c.best_score, controversy=c.controversy,
+        )
+        for c in comments
+    ])
+    PostVote.objects.bulk_create(
+        PostVote(post_id=post.pk, user_id=user_id, vote_value=value)
+        for user_id, value in post_votes.items() if user_id in users
+    )
+    CommentVote.objects.bulk_create(
+        CommentVote(comment_id=comment_id, user_id=user_id, vote_value=value)
+        for comment_id, votes in comment_votes.items()
+        for user_id, value in votes.items() if user_id in users
+    )
+
+    # auto_now/auto_now_add overwrote the timestamps on insert, and counter
+    # triggers (api.triggers) counted the rows again: put both back.
+    post.created_at, post.updated_at = archived.created_at, archived.updated_at
+    Post.objects.filter(pk=post.pk).update(
+        created_at=post.created_at, updated_at=post.updated_at, **{field: getattr(post, field) for field in TOTALS},
+    )
+    for comment, original in zip(restored, comments):
+        comment.created_at, comment.updated_at = original.created_at, original.updated_at
+    Comment.objects.bulk_update(restored, ['created_at', 'updated_at', *COMMENT_TOTALS])
+    snapshots.touch(post.community_id)
+
+    archived.delete()
+    return post
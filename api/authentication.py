@@ -0,0 +1,142 @@
+"""
+JWT authentication that skips the per-request ``User`` lookup on reads.
+
+Access tokens issued through ``ClaimsRefreshToken`` carry a few signed user
+claims. For safe methods ``CachedJWTAuthentication`` builds ``request.user``
+from those claims (or a per-worker cache) instead of querying the database;
+writes always load the row so permission and ownership checks see fresh data.
+
+Saving or deleting a user leaves a mark in the shared ``AUTH_USER_CACHE``.
+Every worker checks it on reads: claims minted before a change are ignored
+and the user is loaded from the database, and a deleted user's tokens are
+refused, until the mark outlives the tokens it covers.
+"""
+import copy
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils.translation import gettext_lazy as _
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .caches import LocalCache
+
+USER_CLAIMS = ('username', 'is_staff', 'is_superuser')
+
+# When the claims were read from the user, to compare with the user's last change.
+CLAIMS_AT = 'claims_at'
+
+# Change mark of a deleted user; other marks are the time of the last change.
+DELETED = 'deleted'
+
+user_cache = LocalCache(
+    'jwt_user',
+    maxsize=settings.AUTH_USER_CACHE_SIZE,
+    ttl=settings.AUTH_USER_CACHE_TTL,
+)
+
+
+class ClaimsRefreshToken(RefreshToken):
+    """Refresh token whose derived access tokens carry ``USER_CLAIMS``."""
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        for claim in USER_CLAIMS:
+            token[claim] = getattr(user, claim)
+        token[CLAIMS_AT] = time.time()
+        return token
+
+
+def _mark(user_id, value):
+    # Refresh tokens copy their claims into new access tokens, so the mark
+    # has to last as long as a refresh token issued just before the change.
+    caches[settings.AUTH_USER_CACHE].set(
+        f'jwt_user:{user_id}', value, timeout=api_settings.REFRESH_TOKEN_LIFETIME.total_seconds(),
+    )
+
+
+def last_change(user_id):
+    """``DELETED``, the time ``user_id`` last changed, or None if not recently."""
+    return caches[settings.AUTH_USER_CACHE].get(f'jwt_user:{user_id}')
+
+
+def invalidate_user(user_id):
+    """Load a user from the database in every worker until their older tokens expire."""
+    _mark(user_id, time.time())
+
+
+def forget_deleted_user(user_id):
+    """Refuse a deleted user's outstanding tokens in every worker."""
+    _mark(user_id, DELETED)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def _user_saved(sender, instance, created, update_fields=None, **kwargs):
+    # New users have no tokens yet, and logins only touch last_login.
+    if not created and set(update_fields or ()) != {'last_login'}:
+        invalidate_user(instance.pk)
+
+
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def _user_deleted(sender, instance, **kwargs):
+    forget_deleted_user(instance.pk)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+
+    def authenticate(self, request):
+        header = self.get_header(request)
+        if header is None:
+            return None
+
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+
+        validated_token = self.get_validated_token(raw_token)
+        if request.method in SAFE_METHODS:
+            return self.get_cached_user(validated_token), validated_token
+
+        user = self.get_user(validated_token)
+        user_cache.set(f'{user.pk}:{last_change(user.pk)}', user)
+        return user, validated_token
+
+    def get_cached_user(self, validated_token):
+        try:
+            user_id = str(validated_token[api_settings.USER_ID_CLAIM])
+        except KeyError as e:
+            raise InvalidToken(_("Token contained no recognizable user identification")) from e
+
+        changed = last_change(user_id)
+        if changed == DELETED:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+        # A change gives the user a new key, so every worker drops its old copy.
+        key = f'{user_id}:{changed}'
+        user = user_cache.get(key)
+        if user is None:
+            if changed is None or validated_token.get(CLAIMS_AT, 0) > changed:
+                user = self.get_user_from_claims(validated_token)
+            user = user or self.get_user(validated_token)
+            user_cache.set(key, user)
+        # Hand each request its own instance so views can't mutate the cached one.
+        return copy.copy(user)
+
+    def get_user_from_claims(self, validated_token):
+        """Build an unsaved-looking ``User`` from token claims, or None if they're missing."""
+        if api_settings.CHECK_REVOKE_TOKEN or api_settings.USER_ID_FIELD != 'id':
+            return None
+        if any(claim not in validated_token for claim in USER_CLAIMS):
+            return None
+
+        pk = self.user_model._meta.pk.to_python(validated_token[api_settings.USER_ID_CLAIM])
+        user = self.user_model(pk=pk, is_active=True, **{c: validated_token[c] for c in USER_CLAIMS})
+        user._state.adding = False
+        user._state.db = 'default'
+        return user
@@ -0,0 +1,62 @@
+"""
+Small per-process caches for lookups that sit on the request hot path.
+
+These live in each gunicorn worker's memory, so they cost no round trip but
+are not shared: callers keep the TTL short and invalidate locally on writes.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from .metrics import record_cache
+
+_caches = []
+
+
+class LocalCache:
+    """Thread-safe LRU cache whose entries expire after ``ttl`` seconds."""
+
+    def __init__(self, name, maxsize=1024, ttl=60):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._data = OrderedDict()
+        _caches.append(self)
+
+    def get(self, key, default=None):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[1] < now:
+                del self._data[key]
+                entry = None
+            if entry is not None:
+                self._data.move_to_end(key)
+        record_cache(self.name, entry is not None)
+        return default if entry is None else entry[0]
+
+    def set(self, key, value, ttl=None):
+        expires = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+def clear_all():
+    """Empty every LocalCache in this process (used between tests)."""
+    for cache in _caches:
+        cache.clear()
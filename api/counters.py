@@ -0,0 +1,272 @@
+"""
+Maintenance of denormalized counter columns (subscriber_count, vote_count, ...).
+
+``adjust()`` is the single write path the views use. By default it issues
+``UPDATE ... SET field = field + delta`` on the object's row. Counters listed
+in ``settings.SHARDED_COUNTERS`` (``{'api.Community.subscriber_count': 16}``)
+instead add the delta to one of N ``CounterShard`` rows chosen at random, so
+concurrent writers stop queueing on a single row lock. Reads add the pending
+shard total to the column, and ``consolidate()`` periodically folds shards
+back into the column.
+
+With ``JOB_QUEUE_ENABLED`` the update itself is deferred to the job queue,
+where all deltas for one object claimed together collapse into one write.
+
+Counters kept by database triggers (``COUNTER_TRIGGERS``, see
+``api.triggers``) are already up to date when the views get here; their
+deltas are dropped and only the read-back remains.
+"""
+import random
+from collections import defaultdict
+
+from django.apps import apps
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Case, F, IntegerField, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+
+from . import jobs, triggers
+from .models import CounterShard
+
+# Objects per UPDATE in adjust_bulk()
+BULK_BATCH_SIZE = 500
+
+
+def counter_name(model, field):
+    return f'{model._meta.label}.{field}'
+
+
+def shard_count(model, field):
+    return settings.SHARDED_COUNTERS.get(counter_name(model, field), 0)
+
+
+def sharded_fields(model):
+    prefix = f'{model._meta.label}.'
+    return [name[len(prefix):] for name in settings.SHARDED_COUNTERS if name.startswith(prefix)]
+
+
+def adjust(instance, field, delta, refresh=False):
+    """
+    Add ``delta`` to ``instance.<field>`` without reading it first.
+
+    With ``refresh=True`` the new value is returned: read back from the
+    database, or estimated from the loaded instance when the write was
+    deferred to the job queue.
+    """
+    values = adjust_many(instance, {field: delta}, refresh)
+    return values[field] if refresh else None
+
+
+def adjust_many(instance, deltas, refresh=False):
+    """
+    ``adjust()`` for several counters of one object in a single write (or
+    job). With ``refresh=True`` returns ``{field: new value}``.
+    """
+    model = type(instance)
+    requested = list(deltas)
+    deltas = {field: delta for field, delta in deltas.items() if delta and not triggers.maintains(model, field)}
+    if deltas and settings.JOB_QUEUE_ENABLED:
+        label = model._meta.label
+        jobs.enqueue(
+            'counter',
+            {'model': label, 'pk': instance.pk, 'deltas': deltas},
+            key=f'{label}:{instance.pk}',
+        )
+        if refresh:
+            return {
+                field: getattr(instance, field) + (getattr(instance, f'{field}_pending', 0) or 0) + deltas.get(field, 0)
+                for field in requested
+            }
+        return None
+    if deltas:
+        _apply(model, instance.pk, deltas)
+    if refresh:
+        return current_values(instance, requested)
+    return None
+
+
+def adjust_bulk(model, deltas):
+    """
+    ``adjust_many()`` for many objects of ``model``: ``{pk: {field: delta}}``.
+    Unsharded counters change with one ``UPDATE ... SET field = field +
+    CASE pk WHEN ... END`` per batch of objects; with the job queue on, one
+    INSERT queues a job per object.
+    """
+    deltas = {
+        pk: {field: delta for field, delta in changes.items() if delta and not triggers.maintains(model, field)}
+        for pk, changes in deltas.items()
+    }
+    deltas = {pk: changes for pk, changes in sorted(deltas.items()) if changes}
+    if not deltas:
+        return
+    label = model._meta.label
+    if settings.JOB_QUEUE_ENABLED:
+        jobs.enqueue_many('counter', [
+            ({'model': label, 'pk': pk, 'deltas': changes}, f'{label}:{pk}')
+            for pk, changes in deltas.items()
+        ])
+        return
+    direct = defaultdict(dict)
+    for pk, changes in deltas.items():
+        for field, delta in changes.items():
+            shards = shard_count(model, field)
+            if shards:
+                _add_to_shard(counter_name(model, field), pk, random.randrange(shards), delta)
+            else:
+                direct[field][pk] = delta
+    pks = sorted({pk for per_pk in direct.values() for pk in per_pk})
+    for start in range(0, len(pks), BULK_BATCH_SIZE):
+        chunk = pks[start:start + BULK_BATCH_SIZE]
+        updates = {}
+        for field, per_pk in direct.items():
+            whens = [When(pk=pk, then=Value(per_pk[pk])) for pk in chunk if pk in per_pk]
+            if whens:
+                updates[field] = F(field) + Case(*whens, default=Value(0), output_field=IntegerField())
+        model.objects.filter(pk__in=chunk).update(**updates)
+        _refresh_derived(model, chunk, direct)
+
+
+_derived = {}
+
+
+def derived(model_label, fields):
+    """
+    Register ``func(queryset)`` to recompute columns derived from the counter
+    ``fields`` of ``model_label`` after they change (e.g. sort keys). It runs
+    as a separate UPDATE, so it always sees the committed totals.
+    """
+    def register(func):
+        _derived.setdefault(model_label, []).append((set(fields), func))
+        return func
+    return register
+
+
+def _refresh_derived(model, pks, changed):
+    for fields, func in _derived.get(model._meta.label, ()):
+        if fields & set(changed):
+            func(model.objects.filter(pk__in=pks))
+
+
+def _apply(model, pk, deltas):
+    direct = {}
+    for field, delta in deltas.items():
+        if not delta:
+            continue
+        shards = shard_count(model, field)
+        if shards:
+            _add_to_shard(counter_name(model, field), pk, random.randrange(shards), delta)
+        else:
+            direct[field] = F(field) + delta
+    if direct:
+        model.objects.filter(pk=pk).update(**direct)
+        _refresh_derived(model, [pk], direct)
+
+
+@jobs.handler('counter')
+def _apply_deferred(payloads):
+    deltas = defaultdict(int)
+    for payload in payloads:
+        for field, delta in payload['deltas'].items():
+            deltas[field] += delta
+    _apply(apps.get_model(payloads[0]['model']), payloads[0]['pk'], deltas)
+
+
+def _add_to_shard(counter, object_id, shard, delta):
+    rows = CounterShard.objects.filter(counter=counter, object_id=object_id, shard=shard)
+    if rows.update(value=F('value') + delta):
+        return
+    try:
+        with transaction.atomic():
+            CounterShard.objects.create(counter=counter, object_id=object_id, shard=shard, value=delta)
+    except IntegrityError:
+        # Another writer created the shard row first
+        rows.update(value=F('value') + delta)
+
+
+def _pending_subquery(model, field):
+    pending = (
+        CounterShard.objects
+        .filter(counter=counter_name(model, field), object_id=OuterRef('pk'))
+        .values('object_id')
+        .annotate(total=Sum('value'))
+        .values('total')
+    )
+    return Coalesce(Subquery(pending), Value(0))
+
+
+def current_value(instance, field):
+    """Read the up-to-date value of a counter in a single query."""
+    return current_values(instance, [field])[field]
+
+
+def current_values(instance, fields):
+    """Read the up-to-date values of several counters in a single query."""
+    if not fields:
+        return {}
+    model = type(instance)
+    sharded = [field for field in fields if shard_count(model, field)]
+    rows = model.objects.filter(pk=instance.pk).annotate(
+        **{f'{field}_pending': _pending_subquery(model, field) for field in sharded}
+    )
+    row = rows.values(*fields, *(f'{field}_pending' for field in sharded)).get()
+    return {field: row[field] + row.get(f'{field}_pending', 0) for field in fields}
+
+
+def annotate_pending(queryset):
+    """Annotate ``<field>_pending`` for every sharded counter of the queryset's model."""
+    for field in sharded_fields(queryset.model):
+        queryset = queryset.annotate(**{f'{field}_pending': _pending_subquery(queryset.model, field)})
+    return queryset
+
+
+def add_pending(instance, data):
+    """Fold annotated shard totals into serialized counter values."""
+    for field in sharded_fields(type(instance)):
+        pending = getattr(instance, f'{field}_pending', None)
+        if pending and field in data:
+            data[field] += pending
+    return data
+
+
+def consolidate():
+    """
+    Fold every non-zero shard into its canonical column.
+
+    Shards are decremented by the amount that was folded rather than zeroed,
+    so increments landing while this runs are kept. Returns the number of
+    counters updated.
+    """
+    folded = 0
+    pending = (
+        CounterShard.objects.exclude(value=0)
+        .values_list('counter', 'object_id')
+        .distinct()
+        .order_by('counter', 'object_id')
+    )
+    for counter, object_id in pending.iterator():
+        app_label, model_name, field = counter.split('.')
+        model = apps.get_model(app_label, model_name)
+        with transaction.atomic():
+            shards = dict(
+                CounterShard.objects.select_for_update()
+                .filter(counter=counter, object_id=object_id)
+                .exclude(value=0)
+                .values_list('pk', 'value')
+            )
+            total = sum(shards.values())
+            if not model.objects.filter(pk=object_id).update(**{field: F(field) + total}):
+                # The object is gone; its shards are meaningless now
+                CounterShard.objects.filter(counter=counter, object_id=object_id).delete()
+                continue
+            _refresh_derived(model, [object_id], [field])
+            CounterShard.objects.filter(pk__in=shards).update(value=F('value') - Case(
+                *[When(pk=pk, then=Value(value)) for pk, value in shards.items()],
+                output_field=IntegerField(),
+            ))
+        folded += 1
+    return folded
+
+
+@jobs.handler('consolidate_counters', atomic=False)
+def _consolidate_job(payloads):
+    consolidate()
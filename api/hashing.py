@@ -0,0 +1,117 @@
+"""
+Password hashing off the request thread, with a bound on how much runs at once.
+
+A password hash is deliberately slow (hundreds of milliseconds with PBKDF2 or
+Argon2), so a wave of logins can occupy every worker. ``User.set_password``
+and ``User.check_password`` send the hashing here instead: it runs on a pool
+of ``PASSWORD_HASH_WORKERS`` threads (the hashers release the GIL) or, with
+``PASSWORD_HASH_POOL=process``, processes. At most that many hashes, plus
+``PASSWORD_HASH_QUEUE`` waiting, are in flight per worker process; a caller
+that can't get a slot within ``PASSWORD_HASH_WAIT`` seconds gets a 503 with
+``Retry-After`` instead of piling on.
+
+``PASSWORD_HASH_WORKERS=0`` hashes inline, as Django does by default.
+"""
+import math
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import hashers
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+class HashingBusy(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Too many sign-ins in progress, try again shortly.'
+    default_code = 'hashing_busy'
+
+    def __init__(self, wait):
+        super().__init__()
+        # Sent as Retry-After
+        self.wait = wait
+
+
+def _init_process():
+    import django
+
+    django.setup()
+
+
+class Pool:
+    """A lazily started executor and the semaphore that bounds it."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._executor = None
+        self._slots = None
+
+    def _start(self):
+        with self._lock:
+            if self._executor is None:
+                workers = settings.PASSWORD_HASH_WORKERS
+                if settings.PASSWORD_HASH_POOL == 'process':
+                    # Spawned, not forked: the caller may have threads running.
+                    self._executor = ProcessPoolExecutor(
+                        workers, mp_context=multiprocessing.get_context('spawn'), initializer=_init_process,
+                    )
+                else:
+                    self._executor = ThreadPoolExecutor(workers, thread_name_prefix='password-hash')
+                self._slots = threading.BoundedSemaphore(workers + settings.PASSWORD_HASH_QUEUE)
+            return self._executor, self._slots
+
+    def run(self, func, *args):
+        if not settings.PASSWORD_HASH_WORKERS:
+            return func(*args)
+        executor, slots = self._start()
+        if not slots.acquire(timeout=settings.PASSWORD_HASH_WAIT):
+            raise HashingBusy(max(math.ceil(settings.PASSWORD_HASH_WAIT), 1))
+        try:
+            return executor.submit(func, *args).result()
+        finally:
+            slots.release()
+
+    def reset(self, wait=False):
+        with self._lock:
+            executor, self._executor, self._slots = self._executor, None, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+
+pool = Pool()
+
+
+def _reset_after_fork():
+    # The parent's pool threads don't exist in the child.
+    pool._lock = threading.Lock()
+    pool._executor = pool._slots = None
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+@receiver(setting_changed)
+def _setting_changed(setting, **kwargs):
+    if setting.startswith('PASSWORD_HASH'):
+        pool.reset()
+
+
+def make_password(raw_password):
+    return pool.run(hashers.make_password, raw_password)
+
+
+def check_password(raw_password, encoded, setter=None):
+    """
+    ``django.contrib.auth.hashers.check_password`` with the hashing done in
+    the pool. ``setter`` (the re-hash on login when the preferred hasher or
+    its work factor changed) runs in the caller.
+    """
+    is_correct, must_update = pool.run(hashers.verify_password, raw_password, encoded)
+    if setter and is_correct and must_update:
+        setter(raw_password)
+    return is_correct
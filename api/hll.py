@@ -0,0 +1,55 @@
+"""
+HyperLogLog sketches for counting distinct post viewers.
+
+A sketch is ``2 ** PRECISION`` one-byte registers (2 KB). Adding a value
+keeps, per register, the longest run of leading zero bits seen among hashes
+routed to it; sketches merge by taking the register-wise maximum, so worker
+buffers and the stored column combine without double counting. The standard
+error of ``count`` is ``1.04 / sqrt(2 ** PRECISION)``, about 2.3%.
+"""
+import hashlib
+import math
+
+PRECISION = 11
+REGISTERS = 1 << PRECISION
+STANDARD_ERROR = 1.04 / math.sqrt(REGISTERS)
+
+_REST_BITS = 64 - PRECISION
+_ALPHA = 0.7213 / (1 + 1.079 / REGISTERS)
+
+
+def new():
+    return bytearray(REGISTERS)
+
+
+def load(data):
+    """A mutable sketch from a stored column value (``None``/empty: new sketch)."""
+    if not data:
+        return new()
+    if len(data) != REGISTERS:
+        raise ValueError(f"Expected a {REGISTERS}-byte sketch, got {len(data)} bytes.")
+    return bytearray(data)
+
+
+def add(sketch, value):
+    digest = hashlib.blake2b(str(value).encode(), digest_size=8).digest()
+    hashed = int.from_bytes(digest, 'big')
+    index = hashed >> _REST_BITS
+    rest = hashed & ((1 << _REST_BITS) - 1)
+    rank = _REST_BITS - rest.bit_length() + 1
+    if rank > sketch[index]:
+        sketch[index] = rank
+
+
+def merge(sketch, other):
+    """Fold ``other`` into ``sketch`` in place."""
+    sketch[:] = bytes(map(max, sketch, other))
+
+
+def count(sketch):
+    estimate = _ALPHA * REGISTERS * REGISTERS / sum(2.0 ** -rank for rank in sketch)
+    zeros = sketch.count(0)
+    if estimate <= 2.5 * REGISTERS and zeros:
+        # Linear counting is more accurate while many registers are empty.
+        estimate = REGISTERS * math.log(REGISTERS / zeros)
+    return round(estimate)
@@ -0,0 +1,97 @@
+"""
+Reply notifications.
+
+Creating a comment calls ``notify_reply()``, which hands the reply to the
+``inbox`` job instead of writing in the request. Inbox jobs all share one
+key, so a worker claiming a batch of them writes every notification with
+one INSERT and bumps each recipient's ``unread_count`` with one
+``UPDATE ... CASE`` (``counters.adjust_bulk``).
+
+``unread()`` is what clients poll: the counter column, read by primary key
+and kept for ``INBOX_UNREAD_CACHE_TTL`` seconds per worker. Marking items
+read updates this worker's entry, so the reader sees their own change at
+once even while the decrement waits in the job queue.
+"""
+from collections import Counter
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import counters, jobs
+from .caches import LocalCache
+from .models import Comment, InboxItem, User
+
+# User id -> unread count
+unread_counts = LocalCache(
+    'inbox_unread',
+    maxsize=settings.INBOX_UNREAD_CACHE_SIZE,
+    ttl=settings.INBOX_UNREAD_CACHE_TTL,
+)
+
+
+def notify_reply(comment):
+    """Queue a notification for the author ``comment`` replies to."""
+    if comment.parent_id is not None:
+        recipient, kind = comment.parent.user_id, InboxItem.COMMENT_REPLY
+    else:
+        recipient, kind = comment.post.user_id, InboxItem.POST_REPLY
+    if recipient is None or recipient == comment.user_id:
+        return
+    jobs.enqueue('inbox', {
+        'recipient': recipient,
+        'actor': comment.user_id,
+        'post': comment.post_id,
+        'comment': comment.pk,
+        'kind': kind,
+        'excerpt': comment.content[:InboxItem.EXCERPT_LENGTH],
+        'created_at': comment.created_at.isoformat(),
+    })
+
+
+@jobs.handler('inbox')
+def _deliver_job(payloads):
+    # Replies deleted, or recipients gone, before the batch ran are dropped.
+    comments = set(Comment.objects.filter(pk__in={p['comment'] for p in payloads}).values_list('pk', flat=True))
+    recipients = set(
+        User.objects.filter(pk__in={p['recipient'] for p in payloads}, deleted_at__isnull=True)
+        .values_list('pk', flat=True)
+    )
+    items = [
+        InboxItem(
+            recipient_id=p['recipient'], actor_id=p['actor'], post_id=p['post'], comment_id=p['comment'],
+            kind=p['kind'], excerpt=p['excerpt'], created_at=p['created_at'],
+        )
+        for p in payloads if p['comment'] in comments and p['recipient'] in recipients
+    ]
+    InboxItem.objects.bulk_create(items)
+    counts = Counter(item.recipient_id for item in items)
+    counters.adjust_bulk(User, {pk: {'unread_count': n} for pk, n in counts.items()})
+
+
+def unread(user):
+    """``user``'s unread notification count, at most a few seconds stale."""
+    count = unread_counts.get(user.pk)
+    if count is None:
+        count = max(counters.current_value(user, 'unread_count'), 0)
+        unread_counts.set(user.pk, count)
+    return count
+
+
+@transaction.atomic
+def mark_read(user, ids=None):
+    """
+    Mark ``user``'s notifications ``ids`` (or all of them) read. Returns
+    ``(marked, unread)``: how many were unread, and how many still are.
+    """
+    items = InboxItem.objects.filter(recipient=user, read_at__isnull=True)
+    if ids is not None:
+        items = items.filter(pk__in=ids)
+    before = unread(user)
+    marked = items.update(read_at=timezone.now())
+    remaining = max(before - marked, 0)
+    if marked:
+        counters.adjust(user, 'unread_count', -marked)
+        # The decrement may still be queued; don't re-read the column.
+        transaction.on_commit(lambda: unread_counts.set(user.pk, remaining))
+    return marked, remaining
@@ -0,0 +1,164 @@
+"""
+A small database-backed job queue with no broker dependency.
+
+Side effects that don't need to finish inside the request (counter updates,
+fan-out, rollups) are handed to ``enqueue()``. With ``JOB_QUEUE_ENABLED`` they
+are stored as ``Job`` rows and executed by ``manage.py run_jobs``; otherwise
+the handler runs inline, which keeps development and tests synchronous.
+
+Workers claim batches with ``SELECT ... FOR UPDATE SKIP LOCKED`` where the
+database supports it and with a guarded ``UPDATE`` on SQLite. Claimed jobs
+with the same ``(kind, key)`` are coalesced into one handler call, and failed
+batches are retried with exponential backoff. An atomic handler's writes and
+the deletion of its claimed jobs commit together, so a batch is applied at
+most once even if the worker dies or its claim goes stale and is requeued.
+"""
+import logging
+import os
+import random
+import socket
+import uuid
+from collections import namedtuple
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+Handler = namedtuple('Handler', ['func', 'atomic'])
+
+_handlers = {}
+
+
+def handler(kind, atomic=True):
+    """
+    Register ``func(payloads)`` to run jobs of ``kind``.
+
+    ``payloads`` is the list of payloads of every claimed job sharing a key.
+    With ``atomic=False`` the handler manages its own transactions.
+    """
+    def register(func):
+        _handlers[kind] = Handler(func, atomic)
+        return func
+    return register
+
+
+def enqueue(kind, payload=None, key=''):
+    payload = payload or {}
+    if not settings.JOB_QUEUE_ENABLED:
+        _run(kind, [payload])
+        return None
+    return Job.objects.create(kind=kind, key=key, payload=payload)
+
+
+def enqueue_many(kind, items):
+    """``enqueue()`` for several ``(payload, key)`` pairs with one INSERT."""
+    if not settings.JOB_QUEUE_ENABLED:
+        for payload, _ in items:
+            _run(kind, [payload])
+        return
+    Job.objects.bulk_create(Job(kind=kind, key=key, payload=payload) for payload, key in items)
+
+
+def enqueue_once(kind, key='', payload=None):
+    """Enqueue unless an identical job is already waiting."""
+    if Job.objects.filter(kind=kind, key=key, status=Job.PENDING).exists():
+        return None
+    return enqueue(kind, payload, key)
+
+
+def _run(kind, payloads):
+    registered = _handlers[kind]
+    if registered.atomic:
+        with transaction.atomic():
+            registered.func(payloads)
+    else:
+        registered.func(payloads)
+
+
+def worker_id():
+    return f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+
+
+def claim(limit, worker):
+    """Mark up to ``limit`` runnable jobs as running for ``worker`` and return them."""
+    now = timezone.now()
+    ready = Job.objects.filter(status=Job.PENDING, run_after__lte=now).order_by('id')
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            ids = list(ready.select_for_update(skip_locked=True).values_list('id', flat=True)[:limit])
+            Job.objects.filter(id__in=ids).update(status=Job.RUNNING, claimed_by=worker, claimed_at=now)
+    else:
+        # SQLite has no row locks but serializes writers, so the status guard
+        # makes sure each job is claimed by exactly one worker.
+        ids = list(ready.values_list('id', flat=True)[:limit])
+        Job.objects.filter(id__in=ids, status=Job.PENDING).update(
+            status=Job.RUNNING, claimed_by=worker, claimed_at=now,
+        )
+    return list(Job.objects.filter(id__in=ids, status=Job.RUNNING, claimed_by=worker).order_by('id'))
+
+
+def _retry(jobs, error):
+    now = timezone.now()
+    for job in jobs:
+        job.attempts += 1
+        job.last_error = error
+        job.claimed_by = ''
+        job.claimed_at = None
+        if job.attempts >= settings.JOB_MAX_ATTEMPTS:
+            job.status = Job.FAILED
+        else:
+            job.status = Job.PENDING
+            backoff = settings.JOB_RETRY_BACKOFF * 2 ** (job.attempts - 1)
+            job.run_after = now + timedelta(seconds=backoff * random.uniform(1, 1.5))
+    Job.objects.bulk_update(jobs, ['attempts', 'last_error', 'claimed_by', 'claimed_at', 'status', 'run_after'])
+
+
+class ClaimLost(Exception):
+    """The batch's jobs were requeued and claimed elsewhere while it ran."""
+
+
+def _finish(group, worker):
+    deleted, _ = Job.objects.filter(id__in=[job.id for job in group], claimed_by=worker).delete()
+    if deleted < len(group):
+        raise ClaimLost
+
+
+def run_pending(limit=100, worker=None):
+    """Claim and run one batch of jobs. Returns the number of jobs claimed."""
+    worker = worker or worker_id()
+    jobs = claim(limit, worker)
+    groups = {}
+    for job in jobs:
+        groups.setdefault((job.kind, job.key), []).append(job)
+
+    for (kind, key), group in groups.items():
+        payloads = [job.payload for job in group]
+        try:
+            registered = _handlers[kind]
+            if registered.atomic:
+                with transaction.atomic():
+                    registered.func(payloads)
+                    _finish(group, worker)
+            else:
+                registered.func(payloads)
+                _finish(group, worker)
+        except ClaimLost:
+            logger.warning("Job batch %s:%s was claimed by another worker; its changes were rolled back", kind, key)
+        except Exception as exc:
+            logger.exception("Job batch %s:%s failed", kind, key)
+            _retry(group, f'{type(exc).__name__}: {exc}')
+    return len(jobs)
+
+
+def requeue_stale(timeout=None):
+    """Return jobs claimed by workers that died mid-batch to the queue."""
+    timeout = settings.JOB_CLAIM_TIMEOUT if timeout is None else timeout
+    cutoff = timezone.now() - timedelta(seconds=timeout)
+    return Job.objects.filter(status=Job.RUNNING, claimed_at__lt=cutoff).update(
+        status=Job.PENDING, claimed_by='', claimed_at=None,
+    )
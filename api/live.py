@@ -0,0 +1,258 @@
+"""
+Live updates for open threads and communities.
+
+Write paths call ``publish()`` after commit. The configured ``LIVE_BACKEND``
+carries the event to every process: ``LocalBackend`` hands it straight to
+this process's broker, while ``DatabaseBackend`` stores a ``LiveEvent`` row
+that every process serving streams polls for.
+
+The broker coalesces events per channel: an event with a key replaces the
+pending one with the same key, so a thread voted on a thousand times in one
+``LIVE_COALESCE_INTERVAL`` sends each subscriber one ``vote`` event with the
+latest totals. Every interval the pending batch goes to each subscriber's
+bounded queue. A subscriber that falls a full queue behind is told to
+reconnect rather than buffered without limit.
+"""
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from datetime import timedelta
+from itertools import count
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.db.models import Max
+from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from . import jobs
+from .models import LiveEvent
+
+logger = logging.getLogger(__name__)
+
+
+def post_channel(post_id):
+    return f'post:{post_id}'
+
+
+def community_channel(community_id):
+    return f'community:{community_id}'
+
+
+class Subscriber:
+    """One open stream: a bounded queue of batches, read on ``loop``."""
+
+    def __init__(self, channel, loop):
+        self.channel = channel
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=settings.LIVE_QUEUE_SIZE)
+        self.overflowed = False
+
+    def put(self, batch):
+        # Runs on self.loop.
+        try:
+            self.queue.put_nowait(batch)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+
+class Broker:
+    """Per-process fan-out of coalesced events to subscribers."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+        self._pending = {}
+        self._sequence = count()
+        self._flusher = None
+
+    def channels(self):
+        with self._lock:
+            return list(self._subscribers)
+
+    def subscribe(self, channel):
+        """Subscribe on the running event loop, starting the flusher if needed."""
+        loop = asyncio.get_running_loop()
+        subscriber = Subscriber(channel, loop)
+        with self._lock:
+            self._subscribers[channel].add(subscriber)
+            if self._flusher is None or self._flusher.done():
+                self._flusher = loop.create_task(self._run())
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            subscribers = self._subscribers.get(subscriber.channel)
+            if subscribers is not None:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self._subscribers[subscriber.channel]
+                    self._pending.pop(subscriber.channel, None)
+
+    def deliver(self, channel, event, data, key=''):
+        """Queue an encoded event for the next flush (thread-safe)."""
+        with self._lock:
+            if channel not in self._subscribers:
+                return
+            pending = self._pending.setdefault(channel, {})
+            slot = (event, key) if key else next(self._sequence)
+            pending.pop(slot, None)
+            pending[slot] = (event, data)
+
+    def flush(self):
+        """Send every channel's pending batch to its subscribers."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            targets = [
+                (list(self._subscribers.get(channel, ())), list(events.values()))
+                for channel, events in pending.items()
+            ]
+        for subscribers, batch in targets:
+            for subscriber in subscribers:
+                subscriber.loop.call_soon_threadsafe(subscriber.put, batch)
+
+    async def _run(self):
+        while self.channels():
+            await asyncio.sleep(settings.LIVE_COALESCE_INTERVAL)
+            try:
+                await backend().poll(self)
+            except Exception:
+                logger.exception("Could not poll for live events")
+            self.flush()
+
+    def reset(self):
+        """Drop subscribers and pending events (forked children, tests)."""
+        with self._lock:
+            self._subscribers.clear()
+            self._pending.clear()
+            self._flusher = None
+
+
+broker = Broker()
+
+
+def _reset_after_fork():
+    # A parent thread may have held the lock at fork time.
+    broker._lock = threading.Lock()
+    broker.reset()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+class LocalBackend:
+    """Delivers in this process only; enough for a single ASGI worker."""
+
+    def publish(self, channel, event, data, key):
+        broker.deliver(channel, event, data, key)
+
+    async def poll(self, broker):
+        pass
+
+
+class DatabaseBackend:
+    """
+    Relays events through ``LiveEvent`` rows polled by every process. Each
+    publishing process also prunes rows older than ``LIVE_EVENT_RETENTION``
+    at most once per that interval, so the table stays small without a
+    scheduled job.
+    """
+
+    def __init__(self):
+        self._last = None
+        self._pruned = None
+
+    def publish(self, channel, event, data, key):
+        LiveEvent.objects.create(channel=channel, event=event, key=key, data=data)
+        now = time.monotonic()
+        if self._pruned is None or now - self._pruned >= settings.LIVE_EVENT_RETENTION:
+            self._pruned = now
+            prune()
+
+    def _fetch(self, channels):
+        if self._last is None:
+            # Start from now; streams don't replay history.
+            self._last = LiveEvent.objects.aggregate(last=Max('pk'))['last'] or 0
+            return []
+        rows = list(
+            LiveEvent.objects.filter(pk__gt=self._last).order_by('pk')
+            .values_list('pk', 'channel', 'event', 'key', 'data')
+        )
+        if rows:
+            self._last = rows[-1][0]
+        return [row for row in rows if row[1] in channels]
+
+    async def poll(self, broker):
+        for _, channel, event, key, data in await sync_to_async(self._fetch)(set(broker.channels())):
+            broker.deliver(channel, event, data, key)
+
+
+_backend = None
+
+
+def backend():
+    global _backend
+    if _backend is None:
+        _backend = import_string(settings.LIVE_BACKEND)()
+    return _backend
+
+
+@receiver(setting_changed)
+def _setting_changed(setting, **kwargs):
+    global _backend
+    if setting == 'LIVE_BACKEND':
+        _backend = None
+
+
+def publish(channel, event, data, key=''):
+    """
+    Send ``event`` to ``channel``'s subscribers once the current transaction
+    commits. Events sharing a non-empty ``key`` are coalesced to the latest.
+    """
+    encoded = json.dumps(data, cls=DjangoJSONEncoder, separators=(',', ':'))
+    transaction.on_commit(lambda: backend().publish(channel, event, encoded, key))
+
+
+def format_event(event, data):
+    return f'event: {event}\ndata: {data}\n\n'
+
+
+async def stream(channel):
+    """
+    Yield server-sent event text for ``channel`` until the client goes away,
+    with a comment line every ``LIVE_HEARTBEAT_INTERVAL`` seconds of quiet.
+    """
+    subscriber = broker.subscribe(channel)
+    try:
+        yield f'retry: {int(settings.LIVE_COALESCE_INTERVAL * 1000) * 3}\n: connected\n\n'
+        while True:
+            try:
+                batch = await asyncio.wait_for(subscriber.queue.get(), settings.LIVE_HEARTBEAT_INTERVAL)
+            except asyncio.TimeoutError:
+                yield ': keepalive\n\n'
+                continue
+            yield ''.join(format_event(event, data) for event, data in batch)
+            if subscriber.overflowed and subscriber.queue.empty():
+                yield format_event('reconnect', '{}')
+                return
+    finally:
+        broker.unsubscribe(subscriber)
+
+
+def prune():
+    """Delete ``LiveEvent`` rows older than ``LIVE_EVENT_RETENTION`` seconds."""
+    cutoff = timezone.now() - timedelta(seconds=settings.LIVE_EVENT_RETENTION)
+    LiveEvent.objects.filter(created_at__lt=cutoff).delete()
+
+
+@jobs.handler('prune_live_events')
+def _prune_job(payloads):
+    prune()
@@ -0,0 +1,42 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api import archive
+
+
+class Command(BaseCommand):
+    help = "Move old posts, with their comments and votes, to the archive tables (or restore one)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than', type=int, metavar='DAYS',
+            help="Archive posts created more than DAYS days ago (default: settings.ARCHIVE_AFTER_DAYS).",
+        )
+        parser.add_argument('--batch-size', type=int, default=100, help="Posts per transaction (default 100).")
+        parser.add_argument('--no-compress', action='store_true', help="Store content uncompressed.")
+        parser.add_argument('--restore', type=int, nargs='+', metavar='POST_ID', help="Restore these posts instead.")
+
+    def handle(self, *args, **options):
+        if options['restore']:
+            for pk in options['restore']:
+                archive.restore_post(pk)
+                self.stdout.write(f"Restored post {pk}.")
+            return
+
+        days = options['older_than']
+        if days is None:
+            days = settings.ARCHIVE_AFTER_DAYS
+
+        def report(posts, comments):
+            if options['verbosity'] > 1:
+                self.stdout.write(f"  {posts} posts, {comments} comments archived")
+
+        posts, comments = archive.archive_posts(
+            older_than=timedelta(days=days),
+            batch_size=options['batch_size'],
+            compress=False if options['no_compress'] else None,
+            report=report,
+        )
+        self.stdout.write(f"Archived {posts} post(s) and {comments} comment(s).")
@@ -0,0 +1,30 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api import activity
+
+
+class Command(BaseCommand):
+    help = "Rebuild the daily community/user activity rollups from the raw tables."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--since', metavar='YYYY-MM-DD',
+            help="Only rebuild days from this date on (default: everything).",
+        )
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            try:
+                since = date.fromisoformat(options['since'])
+            except ValueError:
+                raise CommandError("--since must be a date (YYYY-MM-DD).")
+
+        def report(table, field, rows):
+            if options['verbosity'] > 1:
+                self.stdout.write(f"  {table} {field}: {rows} day(s)")
+
+        activity.backfill(since, report)
+        self.stdout.write(f"Rebuilt activity rollups{f' since {since}' if since else ''}.")
@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from api import ranking
+from api.models import Comment, CommentVote, Post, PostVote
+
+
+def _tally(vote_model, owner, value):
+    votes = (
+        vote_model.objects.filter(**{owner: OuterRef('pk')}, vote_value=value)
+        .order_by().values(owner).annotate(n=Count('pk')).values('n')
+    )
+    return Coalesce(Subquery(votes, output_field=IntegerField()), 0)
+
+
+class Command(BaseCommand):
+    help = "Recompute upvotes/downvotes (and comment sort keys) from the vote tables."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000, help="Rows per UPDATE.")
+
+    def handle(self, *args, **options):
+        size = options['chunk_size']
+        for model, vote_model, owner in ((Post, PostVote, 'post'), (Comment, CommentVote, 'comment')):
+            done = last = 0
+            while True:
+                pks = list(
+                    model.objects.filter(pk__gt=last).order_by('pk').values_list('pk', flat=True)[:size]
+                )
+                if not pks:
+                    break
+                with transaction.atomic():
+                    rows = model.objects.filter(pk__in=pks)
+                    rows.update(
+                        upvotes=_tally(vote_model, owner, 1),
+                        downvotes=_tally(vote_model, owner, -1),
+                    )
+                    if model is Comment:
+                        ranking.refresh_scores(rows)
+                done += len(pks)
+                last = pks[-1]
+                if options['verbosity'] > 1:
+                    self.stdout.write(f"  {model._meta.label}: {done}")
+            self.stdout.write(f"{model._meta.label}: {done} row(s) recomputed.")
@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api import recommendations
+
+
+class Command(BaseCommand):
+    help = "Rebuild community similarity (co-subscription neighbours) from the subscription table."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-k', type=int, help="Neighbours kept per community (default: settings.RECOMMENDATION_TOP_K).")
+        parser.add_argument(
+            '--min-overlap', type=int,
+            help="Minimum shared subscribers for a pair (default: settings.RECOMMENDATION_MIN_OVERLAP).",
+        )
+        parser.add_argument(
+            '--block-size', type=int,
+            help="Communities per sparse product (default: settings.RECOMMENDATION_BLOCK_SIZE).",
+        )
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        try:
+            communities, neighbours = recommendations.compute(
+                options['top_k'], options['min_overlap'], options['block_size'],
+            )
+        except ImportError as e:
+            raise CommandError(f"compute_recommendations needs numpy and scipy ({e}).")
+        self.stdout.write(
+            f"Stored {neighbours} neighbours for {communities} communities "
+            f"in {time.perf_counter() - start:.1f}s."
+        )
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from api import trending
+
+
+class Command(BaseCommand):
+    help = "Recompute Community.trending_score from the recent activity rollups."
+
+    def handle(self, *args, **options):
+        scored = trending.compute()
+        self.stdout.write(f"Scored {scored} trending communities.")
@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api import counters
+
+
+class Command(BaseCommand):
+    help = "Fold sharded counter rows back into their canonical columns."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop', type=float, metavar='SECONDS',
+            help="Keep running, consolidating every SECONDS seconds.",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            folded = counters.consolidate()
+            if options['verbosity'] > 1 or not options['loop']:
+                self.stdout.write(f"Consolidated {folded} counter(s).")
+            if not options['loop']:
+                return
+            time.sleep(options['loop'])
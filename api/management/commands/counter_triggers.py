@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, NotSupportedError, connections, transaction
+
+from api import triggers
+
+
+class Command(BaseCommand):
+    help = "Install, drop or list the database triggers that keep counter columns (COUNTER_TRIGGERS)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('action', choices=['install', 'drop', 'status'])
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        try:
+            if options['action'] == 'install':
+                with transaction.atomic(using=options['database']):
+                    triggers.install(connection)
+            elif options['action'] == 'drop':
+                triggers.drop(connection)
+            present = triggers.installed(connection)
+        except NotSupportedError as e:
+            raise CommandError(str(e))
+        expected = len(triggers.definitions())
+        self.stdout.write(f"{len(present)} of {expected} counter trigger(s) installed.")
+        if options['action'] == 'install' and not triggers.enabled():
+            self.stderr.write("COUNTER_TRIGGERS is off: the views will count these changes a second time.")
+        if options['action'] == 'drop' and triggers.enabled():
+            self.stderr.write("COUNTER_TRIGGERS is on: counters will stop changing until it is turned off.")
+        if options['verbosity'] > 1:
+            for name in present:
+                self.stdout.write(f"  {name}")
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from api import purge
+
+
+class Command(BaseCommand):
+    help = "Remove communities, posts and users marked as deleted, in chunks."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int,
+            help="Rows per DELETE (default: settings.PURGE_CHUNK_SIZE).",
+        )
+
+    def handle(self, *args, **options):
+        verbose = options['verbosity'] > 1
+
+        def report(label, removed):
+            if verbose:
+                self.stdout.write(f"  {label}: {removed} removed")
+
+        roots = 0
+        for model, pk in purge.marked():
+            self.stdout.write(f"Purging {model._meta.label} {pk}")
+            counts = purge.purge(model, pk, options['chunk_size'], report)
+            summary = ', '.join(f"{label} {count}" for label, count in sorted(counts.items()))
+            self.stdout.write(f"  done: {summary or 'nothing left'}")
+            roots += 1
+        self.stdout.write(f"Purged {roots} deleted object(s).")
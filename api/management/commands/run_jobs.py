@@ -0,0 +1,75 @@
+import multiprocessing
+import signal
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from api import jobs
+
+
+class Command(BaseCommand):
+    help = "Run background job workers for the database-backed job queue."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=1, help="Number of worker processes to fork.")
+        parser.add_argument('--batch-size', type=int, default=100, help="Jobs claimed per batch.")
+        parser.add_argument('--sleep', type=float, default=1.0, help="Seconds to wait when the queue is empty.")
+        parser.add_argument('--once', action='store_true', help="Drain the queue once and exit.")
+
+    def handle(self, *args, **options):
+        if options['once']:
+            total = 0
+            while claimed := jobs.run_pending(options['batch_size']):
+                total += claimed
+            self.stdout.write(f"Ran {total} job(s).")
+            return
+
+        if options['processes'] == 1:
+            self.work(options)
+            return
+
+        # Children must not share the parent's database connections.
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        children = [context.Process(target=self.work, args=(options,)) for _ in range(options['processes'])]
+        for child in children:
+            child.start()
+
+        def stop(signum, frame):
+            for child in children:
+                child.terminate()
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+        for child in children:
+            child.join()
+
+    def work(self, options):
+        stopping = False
+
+        def stop(signum, frame):
+            nonlocal stopping
+            stopping = True
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+
+        worker = jobs.worker_id()
+        last_scheduled = {}
+        last_requeue = 0.0
+        self.stdout.write(f"Worker {worker} started.")
+        while not stopping:
+            now = time.monotonic()
+            for kind, interval in settings.JOB_SCHEDULE.items():
+                if now - last_scheduled.get(kind, 0.0) >= interval:
+                    jobs.enqueue_once(kind, key=kind)
+                    last_scheduled[kind] = now
+            if now - last_requeue >= settings.JOB_CLAIM_TIMEOUT:
+                jobs.requeue_stale()
+                last_requeue = now
+
+            if not jobs.run_pending(options['batch_size'], worker):
+                time.sleep(options['sleep'])
+        self.stdout.write(f"Worker {worker} stopped.")
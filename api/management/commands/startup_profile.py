@@ -0,0 +1,136 @@
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Runs in a fresh interpreter under `python -X importtime` so nothing this
+# process has already imported hides the real cold-start cost.
+PROBE = r'''
+import json, sys, time
+from wsgiref.util import setup_testing_defaults
+
+start = time.perf_counter()
+import django
+from django.apps.config import AppConfig
+
+ready = {}
+_create = AppConfig.create.__func__
+
+
+def create(cls, entry):
+    config = _create(cls, entry)
+    original = config.ready
+
+    def timed_ready():
+        t = time.perf_counter()
+        original()
+        ready[config.label] = time.perf_counter() - t
+
+    config.ready = timed_ready
+    return config
+
+
+AppConfig.create = classmethod(create)
+
+timings = {}
+t = time.perf_counter()
+django.setup()
+timings['django.setup()'] = time.perf_counter() - t
+
+from django.urls import get_resolver
+t = time.perf_counter()
+get_resolver().reverse_dict
+timings['URLconf loading'] = time.perf_counter() - t
+
+from django.core.handlers.wsgi import WSGIHandler
+t = time.perf_counter()
+handler = WSGIHandler()
+timings['Middleware init'] = time.perf_counter() - t
+
+environ = {'PATH_INFO': sys.argv[1], 'HTTP_HOST': 'localhost'}
+setup_testing_defaults(environ)
+t = time.perf_counter()
+response = handler(environ, lambda status, headers: None)
+b''.join(response)
+response.close()
+timings['First request'] = time.perf_counter() - t
+timings['Total'] = time.perf_counter() - start
+
+print(json.dumps({'timings': timings, 'ready': ready}))
+'''
+
+
+def parse_importtime(stderr):
+    """Yield (module, self_us, cumulative_us) from `-X importtime` output."""
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        fields = line[len('import time:'):].split('|')
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue  # the header line
+        yield fields[2].strip(), int(fields[0]), int(fields[1])
+
+
+class Command(BaseCommand):
+    help = (
+        "Profile a cold start in a fresh interpreter: import cost per package, "
+        "AppConfig.ready() per app, URLconf loading, middleware init and the "
+        "first request."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=15, help="Rows per table (default 15).")
+        parser.add_argument('--path', default='/api/', help="Path for the first request (default /api/).")
+        parser.add_argument('--json', action='store_true', help="Print the raw profile as JSON.")
+
+    def handle(self, *args, **options):
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', 'app.settings')}
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', PROBE, options['path']],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+        )
+        if result.returncode != 0:
+            raise CommandError(f"Profiling process failed:\n{result.stderr[-2000:]}")
+        probe = json.loads(result.stdout.strip().splitlines()[-1])
+
+        modules = list(parse_importtime(result.stderr))
+        packages = defaultdict(lambda: [0, 0])
+        for name, self_us, _ in modules:
+            package = packages[name.split('.')[0]]
+            package[0] += self_us
+            package[1] += 1
+        packages = sorted(packages.items(), key=lambda item: item[1][0], reverse=True)
+        slowest = sorted(modules, key=lambda module: module[2], reverse=True)
+
+        if options['json']:
+            self.stdout.write(json.dumps({
+                **probe,
+                'packages': {name: {'self_us': us, 'modules': count} for name, (us, count) in packages},
+                'modules': [{'name': n, 'self_us': s, 'cumulative_us': c} for n, s, c in modules],
+                'deferred_imports': settings.DEFERRED_IMPORTS,
+                'api_only': settings.API_ONLY,
+            }, indent=2))
+            return
+
+        top = options['top']
+        write = self.stdout.write
+        write("Cold start (fresh interpreter, -X importtime)")
+        for name, seconds in probe['timings'].items():
+            write(f"  {name:<34} {seconds * 1000:9.1f} ms")
+            if name == 'django.setup()':
+                for label, ready in sorted(probe['ready'].items(), key=lambda item: item[1], reverse=True):
+                    write(f"    {label + '.ready()':<32} {ready * 1000:9.1f} ms")
+
+        write(f"\nImport cost by top-level package (self time, {len(modules)} modules)")
+        for name, (us, count) in packages[:top]:
+            write(f"  {name:<34} {us / 1000:9.1f} ms  ({count} modules)")
+
+        write("\nSlowest imports (cumulative)")
+        for name, _, cumulative in slowest[:top]:
+            write(f"  {name:<50} {cumulative / 1000:9.1f} ms")
+
+        write(f"\nAPI_ONLY={settings.API_ONLY}  DEFERRED_IMPORTS={','.join(settings.DEFERRED_IMPORTS) or '-'}")
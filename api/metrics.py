@@ -0,0 +1,356 @@
+"""
+Prometheus metrics for the API.
+
+Each process writes its samples into its own memory-mapped file under
+``METRICS_DIR`` so the ``/metrics/`` view can sum them across gunicorn
+workers. Without ``METRICS_DIR`` samples only live in process memory, which
+is what runserver and the test suite use.
+"""
+import bisect
+import glob
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.signals import setting_changed
+from django.db import connection
+from django.http import HttpResponse, HttpResponseForbidden
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+_HEADER = struct.Struct('i4x')
+_KEYLEN = struct.Struct('i')
+_VALUE = struct.Struct('d')
+_INITIAL_SIZE = 64 * 1024
+_METHODS = {'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'}
+
+REGISTRY = {}
+
+
+def _read_entries(data, used):
+    pos = _HEADER.size
+    while pos < used:
+        keylen, = _KEYLEN.unpack_from(data, pos)
+        key = bytes(data[pos + _KEYLEN.size:pos + _KEYLEN.size + keylen]).decode('utf-8')
+        pos += _KEYLEN.size + keylen
+        pos += -pos % 8
+        value, = _VALUE.unpack_from(data, pos)
+        yield key, value, pos
+        pos += _VALUE.size
+
+
+class _LocalStore:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def add(self, key, amount):
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def add_many(self, pairs):
+        with self._lock:
+            for key, amount in pairs:
+                self._values[key] = self._values.get(key, 0.0) + amount
+
+    def items(self):
+        with self._lock:
+            return list(self._values.items())
+
+
+class _MmapStore:
+    """Append-only key/value file of doubles, written by a single process."""
+
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        self._positions = {}
+        self._file = open(path, 'a+b')
+        size = os.fstat(self._file.fileno()).st_size
+        if size == 0:
+            self._file.truncate(_INITIAL_SIZE)
+            size = _INITIAL_SIZE
+        self._map = mmap.mmap(self._file.fileno(), size)
+        self._used, = _HEADER.unpack_from(self._map, 0)
+        if self._used == 0:
+            self._used = _HEADER.size
+            _HEADER.pack_into(self._map, 0, self._used)
+        for key, _value, pos in _read_entries(self._map, self._used):
+            self._positions[key] = pos
+
+    def _position(self, key):
+        pos = self._positions.get(key)
+        if pos is None:
+            encoded = key.encode('utf-8')
+            padding = -(_KEYLEN.size + len(encoded)) % 8
+            entry = _KEYLEN.pack(len(encoded)) + encoded + b'\x00' * padding + _VALUE.pack(0.0)
+            needed = self._used + len(entry)
+            if needed > len(self._map):
+                size = len(self._map)
+                while size < needed:
+                    size *= 2
+                self._map.close()
+                self._file.truncate(size)
+                self._map = mmap.mmap(self._file.fileno(), size)
+            self._map[self._used:needed] = entry
+            pos = needed - _VALUE.size
+            self._used = needed
+            _HEADER.pack_into(self._map, 0, self._used)
+            self._positions[key] = pos
+        return pos
+
+    def add(self, key, amount):
+        with self._lock:
+            pos = self._position(key)
+            value, = _VALUE.unpack_from(self._map, pos)
+            _VALUE.pack_into(self._map, pos, value + amount)
+
+    def add_many(self, pairs):
+        with self._lock:
+            for key, amount in pairs:
+                pos = self._position(key)
+                value, = _VALUE.unpack_from(self._map, pos)
+                _VALUE.pack_into(self._map, pos, value + amount)
+
+    def items(self):
+        with self._lock:
+            return [(key, value) for key, value, _pos in _read_entries(self._map, self._used)]
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def _get_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                directory = settings.METRICS_DIR
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                    _store = _MmapStore(os.path.join(directory, f'metrics_{os.getpid()}.db'))
+                else:
+                    _store = _LocalStore()
+    return _store
+
+
+def reset_store(**kwargs):
+    """Drop this process's store so the next sample opens a fresh one."""
+    global _store
+    _store = None
+
+
+os.register_at_fork(after_in_child=reset_store)
+
+
+def _reset_on_setting_change(setting, **kwargs):
+    if setting in ('METRICS_DIR', 'METRICS_ENABLED'):
+        reset_store()
+
+
+setting_changed.connect(_reset_on_setting_change)
+
+
+def _sample_key(name, labelnames, labelvalues):
+    return json.dumps([name, [[n, str(v)] for n, v in zip(labelnames, labelvalues)]])
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._keys = {}
+        REGISTRY[name] = self
+
+    def inc(self, *labelvalues, amount=1):
+        key = self._keys.get(labelvalues)
+        if key is None:
+            key = self._keys[labelvalues] = _sample_key(self.name, self.labelnames, labelvalues)
+        _get_store().add(key, amount)
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(float(b) for b in buckets))
+        self._keys = {}
+        REGISTRY[name] = self
+
+    def _build_keys(self, labelvalues):
+        bounds = [repr(b) for b in self.buckets] + ['+Inf']
+        buckets = [
+            _sample_key(f'{self.name}_bucket', self.labelnames + ('le',), labelvalues + (le,))
+            for le in bounds
+        ]
+        total = _sample_key(f'{self.name}_sum', self.labelnames, labelvalues)
+        count = _sample_key(f'{self.name}_count', self.labelnames, labelvalues)
+        return buckets, total, count
+
+    def observe(self, value, *labelvalues):
+        keys = self._keys.get(labelvalues)
+        if keys is None:
+            keys = self._keys[labelvalues] = self._build_keys(labelvalues)
+        buckets, total, count = keys
+        bucket = buckets[bisect.bisect_left(self.buckets, value)]
+        _get_store().add_many(((bucket, 1), (total, value), (count, 1)))
+
+
+REQUESTS = Counter(
+    'hennepin_http_requests_total',
+    'HTTP requests by view, method and status code.',
+    ['view', 'method', 'status'],
+)
+REQUEST_LATENCY = Histogram(
+    'hennepin_http_request_duration_seconds',
+    'Time spent producing a response, by view.',
+    ['view'],
+    buckets=[0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10],
+)
+DB_QUERIES = Histogram(
+    'hennepin_db_queries_per_request',
+    'Database queries executed per request, by view.',
+    ['view'],
+    buckets=[0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100],
+)
+DB_TIME = Histogram(
+    'hennepin_db_time_per_request_seconds',
+    'Time spent in database queries per request, by view.',
+    ['view'],
+    buckets=[0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5],
+)
+CACHE_REQUESTS = Counter(
+    'hennepin_cache_requests_total',
+    'Cache lookups by cache name and result (hit or miss).',
+    ['cache', 'result'],
+)
+
+
+def record_cache(name, hit):
+    CACHE_REQUESTS.inc(name, 'hit' if hit else 'miss')
+
+
+def _collect():
+    """Sum every process's samples, keyed by sample key."""
+    totals = {}
+    directory = settings.METRICS_DIR
+    if directory:
+        for path in glob.glob(os.path.join(directory, 'metrics_*.db')):
+            with open(path, 'rb') as f:
+                data = f.read()
+            if len(data) < _HEADER.size:
+                continue
+            used, = _HEADER.unpack_from(data, 0)
+            for key, value, _pos in _read_entries(data, min(used, len(data))):
+                totals[key] = totals.get(key, 0.0) + value
+    else:
+        for key, value in _get_store().items():
+            totals[key] = totals.get(key, 0.0) + value
+    return totals
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_sample(name, labels, value):
+    if labels:
+        rendered = ','.join(f'{n}="{_escape(v)}"' for n, v in labels)
+        return f'{name}{{{rendered}}} {value!r}'
+    return f'{name} {value!r}'
+
+
+def render():
+    """Render all registered metrics in the Prometheus text format."""
+    samples = {}
+    for key, value in _collect().items():
+        name, labels = json.loads(key)
+        samples.setdefault(name, []).append((tuple(tuple(pair) for pair in labels), value))
+
+    lines = []
+    for metric in REGISTRY.values():
+        lines.append(f'# HELP {metric.name} {metric.documentation}')
+        lines.append(f'# TYPE {metric.name} {metric.kind}')
+        if metric.kind == 'counter':
+            for labels, value in sorted(samples.get(metric.name, [])):
+                lines.append(_format_sample(metric.name, labels, value))
+            continue
+
+        # Buckets are stored per bucket; the exposition format wants them cumulative.
+        series = {}
+        for labels, value in samples.get(f'{metric.name}_bucket', []):
+            base = tuple(pair for pair in labels if pair[0] != 'le')
+            le = dict(labels)['le']
+            series.setdefault(base, {})[le] = value
+        sums = dict(samples.get(f'{metric.name}_sum', []))
+        counts = dict(samples.get(f'{metric.name}_count', []))
+        bounds = [repr(b) for b in metric.buckets] + ['+Inf']
+        for base in sorted(series):
+            running = 0.0
+            for le in bounds:
+                running += series[base].get(le, 0.0)
+                lines.append(_format_sample(f'{metric.name}_bucket', base + (('le', le),), running))
+            lines.append(_format_sample(f'{metric.name}_sum', base, sums.get(base, 0.0)))
+            lines.append(_format_sample(f'{metric.name}_count', base, counts.get(base, 0.0)))
+    return '\n'.join(lines) + '\n'
+
+
+class _QueryRecorder:
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+
+
+class MetricsMiddleware:
+    """Record request counts, latency and database usage per resolved view."""
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = _QueryRecorder()
+        start = time.perf_counter()
+        with connection.execute_wrapper(queries):
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - start
+
+        match = request.resolver_match
+        view = match.view_name if match else 'unmatched'
+        method = request.method if request.method in _METHODS else 'other'
+        REQUESTS.inc(view, method, str(response.status_code))
+        REQUEST_LATENCY.observe(elapsed, view)
+        DB_QUERIES.observe(queries.count, view)
+        DB_TIME.observe(queries.duration, view)
+        return response
+
+
+def metrics_view(request):
+    """Expose collected metrics to loopback or token-bearing scrapers only."""
+    token = settings.METRICS_TOKEN
+    authorized = request.META.get('REMOTE_ADDR') in settings.METRICS_ALLOWED_IPS
+    if token and request.META.get('HTTP_AUTHORIZATION') == f'Bearer {token}':
+        authorized = True
+    if not settings.METRICS_ENABLED or not authorized:
+        return HttpResponseForbidden()
+    return HttpResponse(render(), content_type=CONTENT_TYPE)
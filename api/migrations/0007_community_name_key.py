@@ -0,0 +1,45 @@
+import unicodedata
+
+from django.db import migrations, models
+
+
+def normalize_name(name):
+    return unicodedata.normalize('NFKC', name).strip().casefold()
+
+
+def fill_name_keys(apps, schema_editor):
+    """
+    Key every community by its folded name. Names that collide with an older
+    community are renamed "<name> (<id>)" so the key can be unique.
+    """
+    Community = apps.get_model('api', 'Community')
+    taken = set()
+    for community in Community.objects.order_by('created_at', 'pk').iterator():
+        key = normalize_name(community.name)
+        if key in taken:
+            community.name = f'{community.name[:100 - len(str(community.pk)) - 3]} ({community.pk})'
+            key = normalize_name(community.name)
+        taken.add(key)
+        community.name_key = key
+        community.save(update_fields=['name', 'name_key'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_post_view_counts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='community',
+            name='name_key',
+            field=models.CharField(editable=False, max_length=255, null=True),
+        ),
+        migrations.RunPython(fill_name_keys, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='community',
+            name='name_key',
+            field=models.CharField(editable=False, max_length=255, unique=True),
+        ),
+    ]
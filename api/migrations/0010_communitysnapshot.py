@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:14
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_archive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CommunitySnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sort', models.CharField(max_length=20)),
+                ('payload', models.TextField(blank=True)),
+                ('version', models.PositiveIntegerField(default=0)),
+                ('built_version', models.PositiveIntegerField(null=True)),
+                ('generated_at', models.DateTimeField(null=True)),
+                ('regenerating_since', models.DateTimeField(null=True)),
+                ('community', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshots', to='api.community')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('community', 'sort'), name='unique_community_snapshot')],
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_liveevent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CommunitySimilarity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('community', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similarities', to='api.community')),
+                ('similar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='api.community')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['community', '-score'], name='community_similarity_idx')],
+                'constraints': [models.UniqueConstraint(fields=('community', 'similar'), name='unique_community_similarity')],
+            },
+        ),
+    ]
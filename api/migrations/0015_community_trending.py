@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_activity_rollups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='community',
+            name='trending_score',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='community',
+            index=models.Index(fields=['-trending_score', '-id'], name='community_trending_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='community',
+            index=models.Index(fields=['-subscriber_count', '-id'], name='community_largest_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='community',
+            index=models.Index(fields=['-created_at', '-id'], name='community_newest_idx'),
+        ),
+    ]
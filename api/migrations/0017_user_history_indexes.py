@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0016_inbox'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='comment_user_new_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='commentvote',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='commentvote_user_new_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='post_user_new_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='postvote',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='postvote_user_new_idx'),
+        ),
+    ]
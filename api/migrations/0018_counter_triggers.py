@@ -0,0 +1,25 @@
+from django.conf import settings
+from django.db import migrations
+
+from api import triggers
+
+
+def install_triggers(apps, schema_editor):
+    if settings.COUNTER_TRIGGERS:
+        triggers.install(schema_editor.connection)
+
+
+def drop_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor in triggers.VENDORS:
+        triggers.drop(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0017_user_history_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(install_triggers, drop_triggers),
+    ]
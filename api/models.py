@@ -1,15 +1,37 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
+import unicodedata
+
+from . import hashing
 
 class User(AbstractUser):
     # Don't redefine username, email, password - AbstractUser has them!
     karma = models.IntegerField(default=0)
     avatar_url = models.URLField(blank=True, null=True)
+    # Set when the account is deleted; api.purge removes it and its content later
+    deleted_at = models.DateTimeField(null=True, blank=True)
+    # Unread InboxItems, kept in step by api.inbox
+    unread_count = models.IntegerField(default=0)
     # created_at is already in AbstractUser as 'date_joined'
     
     def __str__(self):
         return self.username
+
+    # Hashing runs in api.hashing's bounded pool rather than the request thread.
+    def set_password(self, raw_password):
+        self.password = hashing.make_password(raw_password)
+        self._password = raw_password
+
+    def check_password(self, raw_password):
+        def setter(raw_password):
+            self.set_password(raw_password)
+            # A re-hash on login isn't a password change.
+            self._password = None
+            self.save(update_fields=['password'])
+
+        return hashing.check_password(raw_password, self.password, setter)
     
 class Community(models.Model):
     creator = models.ForeignKey(
@@ -18,15 +40,43 @@ class Community(models.Model):
         related_name='communities'
     )
     name = models.CharField(max_length=100)
+    # Case-folded name, unique so name lookups are one index probe
+    name_key = models.CharField(max_length=255, unique=True, editable=False)
     description = models.CharField(max_length=255)
     subscriber_count = models.IntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     deleted_at = models.DateTimeField(null=True, blank=True)
+    # Recent activity velocity, recomputed periodically by api.trending
+    trending_score = models.FloatField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-trending_score', '-id'], name='community_trending_idx'),
+            models.Index(fields=['-subscriber_count', '-id'], name='community_largest_idx'),
+            models.Index(fields=['-created_at', '-id'], name='community_newest_idx'),
+        ]
 
     def __str__(self):
         return self.name
+
+    @staticmethod
+    def normalize_name(name):
+        return unicodedata.normalize('NFKC', name).strip().casefold()
+
+    def save(self, *args, **kwargs):
+        self.name_key = self.normalize_name(self.name)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'name' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'name_key'}
+        super().save(*args, **kwargs)
     
+class PostManager(models.Manager):
+    def get_queryset(self):
+        # The viewer sketch is only read when view counts are flushed.
+        return super().get_queryset().defer('viewers_hll')
+
+
 class Post(models.Model):
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
@@ -43,11 +93,24 @@ class Post(models.Model):
     content = models.TextField(max_length=40000)
     post_type = models.CharField(max_length=100)
     vote_count = models.IntegerField(default=0)
+    upvotes = models.IntegerField(default=0)
+    downvotes = models.IntegerField(default=0)
     comment_count = models.IntegerField(default=0)
+    view_count = models.PositiveBigIntegerField(default=0)
+    unique_viewers = models.PositiveIntegerField(default=0)
+    # HyperLogLog registers (api/hll.py), merged in by api.post_views.flush()
+    viewers_hll = models.BinaryField(null=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     deleted_at = models.DateTimeField(null=True, blank=True)
 
+    objects = PostManager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-id'], name='post_user_new_idx'),
+        ]
+
     def __str__(self):
         return self.title
     
@@ -72,10 +135,24 @@ class Comment(models.Model):
     )
     content = models.TextField(max_length=10000)
     vote_count = models.IntegerField(default=0)
+    upvotes = models.IntegerField(default=0)
+    downvotes = models.IntegerField(default=0)
+    # Sort keys kept in step with upvotes/downvotes by api.ranking
+    best_score = models.FloatField(default=0)
+    controversy = models.FloatField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     deleted_at = models.DateTimeField(null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['post', '-best_score', '-id'], name='comment_post_best_idx'),
+            models.Index(fields=['post', '-controversy', '-id'], name='comment_post_controversy_idx'),
+            models.Index(fields=['post', '-vote_count', '-id'], name='comment_post_top_idx'),
+            models.Index(fields=['post', '-created_at', '-id'], name='comment_post_new_idx'),
+            models.Index(fields=['user', '-created_at', '-id'], name='comment_user_new_idx'),
+        ]
+
 class PostVote(models.Model):
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
@@ -94,6 +171,9 @@ class PostVote(models.Model):
         constraints = [
             models.UniqueConstraint(fields=['user', 'post'], name='unique_user_post_vote')
         ]
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-id'], name='postvote_user_new_idx'),
+        ]
 
     def __str__(self):
         return f"Vote {self.vote_value} by {self.user_id} on Post {self.post_id}"
@@ -117,6 +197,9 @@ class CommentVote(models.Model):
         constraints = [
             models.UniqueConstraint(fields=['user', 'comment'], name='unique_user_comment_vote')
         ]
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-id'], name='commentvote_user_new_idx'),
+        ]
 
     def __str__(self):
         return f"Vote {self.vote_value} by {self.user_id} on Comment {self.comment_id}"
@@ -143,3 +226,301 @@ class Subscription(models.Model):
     def __str__(self):
         return f"{self.user_id} subscribed to {self.community_id}"
 
+
+
+class CounterShard(models.Model):
+    """
+    One of N rows holding pending increments for a hot counter column.
+
+    ``counter`` names the column as ``app_label.Model.field``; the canonical
+    value is the column plus the sum of its shards until they are consolidated.
+    """
+    counter = models.CharField(max_length=100)
+    object_id = models.BigIntegerField()
+    shard = models.PositiveSmallIntegerField()
+    value = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['counter', 'object_id', 'shard'], name='unique_counter_shard')
+        ]
+
+    def __str__(self):
+        return f"{self.counter}[{self.object_id}] shard {self.shard}: {self.value}"
+
+
+class Job(models.Model):
+    """
+    A unit of deferred work for the ``run_jobs`` worker.
+
+    Jobs sharing ``kind`` and ``key`` that are claimed together are handed to
+    their handler as one batch, so e.g. many counter deltas for the same row
+    become a single UPDATE.
+    """
+    PENDING = 'pending'
+    RUNNING = 'running'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (FAILED, 'Failed'),
+    ]
+
+    kind = models.CharField(max_length=50)
+    key = models.CharField(max_length=200, blank=True)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    run_after = models.DateTimeField(default=timezone.now)
+    claimed_by = models.CharField(max_length=100, blank=True)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='job_status_run_after_idx'),
+            models.Index(fields=['kind', 'key'], name='job_kind_key_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind}:{self.key} ({self.status})"
+
+
+class ArchivedPost(models.Model):
+    """
+    A post moved out of the hot tables by ``api.archive``, keeping its id.
+
+    ``content`` and ``votes`` (JSON ``[[user_id, value], ...]``) are stored
+    as bytes, zlib-compressed when ``compressed`` is set.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='+',
+    )
+    community = models.ForeignKey(
+        Community,
+        on_delete=models.CASCADE,
+        related_name='archived_posts',
+    )
+    title = models.CharField(max_length=100)
+    content = models.BinaryField()
+    post_type = models.CharField(max_length=100)
+    vote_count = models.IntegerField(default=0)
+    upvotes = models.IntegerField(default=0)
+    downvotes = models.IntegerField(default=0)
+    comment_count = models.IntegerField(default=0)
+    view_count = models.PositiveBigIntegerField(default=0)
+    unique_viewers = models.PositiveIntegerField(default=0)
+    votes = models.BinaryField()
+    compressed = models.BooleanField(default=False)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return self.title
+
+
+class ArchivedComment(models.Model):
+    """A comment of an ``ArchivedPost``, stored like its post."""
+    id = models.BigIntegerField(primary_key=True)
+    post = models.ForeignKey(
+        ArchivedPost,
+        on_delete=models.CASCADE,
+        related_name='comments',
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='+',
+    )
+    parent_id = models.BigIntegerField(null=True)
+    content = models.BinaryField()
+    vote_count = models.IntegerField(default=0)
+    upvotes = models.IntegerField(default=0)
+    downvotes = models.IntegerField(default=0)
+    best_score = models.FloatField(default=0)
+    controversy = models.FloatField(default=0)
+    votes = models.BinaryField()
+    compressed = models.BooleanField(default=False)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+
+
+class CommunitySnapshot(models.Model):
+    """
+    The pre-rendered first page of a community's posts for one sort order.
+
+    ``version`` is bumped whenever the community's posts change; the snapshot
+    is stale while ``built_version`` lags behind it. ``regenerating_since``
+    marks a rebuild in flight so only one process does it.
+    """
+    community = models.ForeignKey(
+        Community,
+        on_delete=models.CASCADE,
+        related_name='snapshots',
+    )
+    sort = models.CharField(max_length=20)
+    payload = models.TextField(blank=True)
+    version = models.PositiveIntegerField(default=0)
+    built_version = models.PositiveIntegerField(null=True)
+    generated_at = models.DateTimeField(null=True)
+    regenerating_since = models.DateTimeField(null=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['community', 'sort'], name='unique_community_snapshot')
+        ]
+
+    def __str__(self):
+        return f"{self.community_id}/{self.sort} v{self.built_version}"
+
+
+class LiveEvent(models.Model):
+    """
+    A live update relayed between processes by ``api.live.DatabaseBackend``.
+    Each process polls for rows newer than the last one it saw; old rows are
+    pruned by the ``prune_live_events`` job.
+    """
+    channel = models.CharField(max_length=50)
+    event = models.CharField(max_length=30)
+    key = models.CharField(max_length=50, blank=True)
+    data = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.channel} {self.event}"
+
+
+class CommunitySimilarity(models.Model):
+    """
+    One of a community's nearest neighbours by co-subscription: the cosine
+    similarity of their subscriber sets. Rebuilt in bulk by
+    ``manage.py compute_recommendations``; only the top K per community are kept.
+    """
+    community = models.ForeignKey(
+        Community,
+        on_delete=models.CASCADE,
+        related_name='similarities',
+    )
+    similar = models.ForeignKey(
+        Community,
+        on_delete=models.CASCADE,
+        related_name='+',
+    )
+    score = models.FloatField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['community', 'similar'], name='unique_community_similarity')
+        ]
+        indexes = [
+            models.Index(fields=['community', '-score'], name='community_similarity_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.community_id} ~ {self.similar_id} ({self.score:.3f})"
+
+
+class CommunityActivity(models.Model):
+    """
+    Per-community, per-day activity totals, kept up to date by
+    ``api.activity`` so stats never aggregate the raw tables.
+    ``subscribers`` is the day's net change in subscribers.
+    """
+    community = models.ForeignKey(
+        Community,
+        on_delete=models.CASCADE,
+        related_name='activity',
+    )
+    day = models.DateField()
+    posts = models.IntegerField(default=0)
+    comments = models.IntegerField(default=0)
+    votes = models.IntegerField(default=0)
+    subscribers = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['community', 'day'], name='unique_community_activity_day')
+        ]
+
+    def __str__(self):
+        return f"{self.community_id} on {self.day}"
+
+
+class UserActivity(models.Model):
+    """Per-user, per-day totals of posts, comments and votes cast."""
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='activity',
+    )
+    day = models.DateField()
+    posts = models.IntegerField(default=0)
+    comments = models.IntegerField(default=0)
+    votes = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'day'], name='unique_user_activity_day')
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} on {self.day}"
+
+
+class InboxItem(models.Model):
+    """
+    A reply to one of the recipient's posts or comments, written in batches
+    by the ``inbox`` job. ``post`` and ``comment`` are kept as plain ids
+    (archived threads keep theirs) and the excerpt is copied, so the item
+    still reads after the reply is deleted or archived.
+    """
+    POST_REPLY = 'post_reply'
+    COMMENT_REPLY = 'comment_reply'
+    KIND_CHOICES = [
+        (POST_REPLY, 'Reply to post'),
+        (COMMENT_REPLY, 'Reply to comment'),
+    ]
+    EXCERPT_LENGTH = 200
+
+    recipient = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='inbox',
+    )
+    actor = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='+',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name='+',
+    )
+    comment = models.ForeignKey(
+        Comment,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name='+',
+    )
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    excerpt = models.CharField(max_length=EXCERPT_LENGTH)
+    created_at = models.DateTimeField(default=timezone.now)
+    read_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['recipient', '-created_at', '-id'], name='inbox_recipient_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} for {self.recipient_id}"
@@ -0,0 +1,145 @@
+"""
+Post view counting.
+
+Each worker buffers views in memory: a view count and an HLL sketch of
+viewers per post. ``flush()`` writes the buffer in one transaction: it locks
+the touched posts, merges each buffered sketch into the stored
+``viewers_hll``, and issues a single batched ``UPDATE ... CASE WHEN`` per
+chunk of posts for ``view_count``, ``unique_viewers`` and the sketch.
+
+Flushing happens on the request path when ``POST_VIEW_FLUSH_INTERVAL``
+seconds have passed or ``POST_VIEW_BUFFER_SIZE`` distinct posts are
+buffered, which bounds a worker's buffer to about 2 KB per buffered post.
+A flush that fails puts its views back in the buffer and is logged, so the
+request that triggered it still succeeds. Unflushed views in a worker that
+dies are lost; exiting normally flushes.
+"""
+import atexit
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+from . import hll
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+FLUSH_BATCH_SIZE = 500
+
+_lock = threading.Lock()
+_views = defaultdict(int)
+_sketches = {}
+_last_flush = time.monotonic()
+
+
+def viewer_key(request):
+    if request.user.is_authenticated:
+        return f'user:{request.user.pk}'
+    return f"addr:{request.META.get('REMOTE_ADDR', '')}"
+
+
+def record(post_id, viewer):
+    """Buffer one view of ``post_id`` by ``viewer``; may flush."""
+    with _lock:
+        _views[post_id] += 1
+        sketch = _sketches.get(post_id)
+        if sketch is None:
+            sketch = _sketches[post_id] = hll.new()
+        hll.add(sketch, viewer)
+        due = (
+            len(_views) >= settings.POST_VIEW_BUFFER_SIZE
+            or time.monotonic() - _last_flush >= settings.POST_VIEW_FLUSH_INTERVAL
+        )
+    if due:
+        try:
+            flush()
+        except Exception:
+            logger.exception("Could not flush buffered post views; will retry")
+
+
+def _take():
+    global _views, _sketches, _last_flush
+    with _lock:
+        views, sketches = _views, _sketches
+        _views, _sketches = defaultdict(int), {}
+        _last_flush = time.monotonic()
+    return views, sketches
+
+
+def _restore(views, sketches, post_ids):
+    """Put views taken by a failed flush back into the buffer."""
+    with _lock:
+        for post_id in post_ids:
+            _views[post_id] += views[post_id]
+            if post_id in _sketches:
+                hll.merge(_sketches[post_id], sketches[post_id])
+            else:
+                _sketches[post_id] = sketches[post_id]
+
+
+def flush():
+    """
+    Write this worker's buffered views. Returns the number of posts updated.
+    On error the chunks not yet written go back into the buffer and the error
+    is raised.
+    """
+    views, sketches = _take()
+    if not views:
+        return 0
+    post_ids = sorted(views)
+    updated = 0
+    for start in range(0, len(post_ids), FLUSH_BATCH_SIZE):
+        chunk = post_ids[start:start + FLUSH_BATCH_SIZE]
+        try:
+            updated += _write(chunk, views, sketches)
+        except Exception:
+            _restore(views, sketches, post_ids[start:])
+            raise
+    return updated
+
+
+def _write(chunk, views, sketches):
+    with transaction.atomic():
+        posts = list(
+            Post.objects.select_for_update()
+            .filter(pk__in=chunk)
+            .only('pk', 'viewers_hll')
+            .order_by('pk')
+        )
+        for post in posts:
+            sketch = hll.load(post.viewers_hll)
+            hll.merge(sketch, sketches[post.pk])
+            post.viewers_hll = bytes(sketch)
+            post.unique_viewers = hll.count(sketch)
+            post.view_count = F('view_count') + views[post.pk]
+        Post.objects.bulk_update(posts, ['view_count', 'unique_viewers', 'viewers_hll'])
+    return len(posts)
+
+
+def discard():
+    """Drop buffered views without writing them (forked children, tests)."""
+    _take()
+
+
+def _reset_after_fork():
+    # A parent thread may have held the lock at fork time.
+    global _lock
+    _lock = threading.Lock()
+    discard()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+@atexit.register
+def _flush_at_exit():
+    try:
+        flush()
+    except Exception:
+        logger.exception("Could not flush buffered post views at exit")
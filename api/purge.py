@@ -0,0 +1,124 @@
+"""
+Chunked removal of deleted communities, posts and users.
+
+Deleting through the API only marks the root row (``deleted_at``) and hands
+it to the ``purge`` job. ``purge()`` then walks the model's reverse foreign
+keys the way Django's deletion collector would, but never loads model
+instances: it reads primary keys in keyset order, ``PURGE_CHUNK_SIZE`` at a
+time, clears each chunk's own dependents first, and removes the chunk with a
+plain ``DELETE ... WHERE id IN (...)``. Every chunk commits on its own, so
+locks stay short and memory stays flat however big the tree is. Each delete
+re-checks its chunk's dependents in the same transaction, so rows attached
+while the purge ran don't break it.
+
+Signals are not sent for purged rows. Removing posts (here or through
+``api.archive``) marks their communities' front pages stale.
+"""
+import logging
+from collections import Counter
+
+from django.apps import apps
+from django.conf import settings
+from django.db import models, transaction
+from django.utils import timezone
+
+from . import jobs, snapshots
+
+logger = logging.getLogger(__name__)
+
+
+def _dependents(model):
+    """Reverse one-to-one/many relations, including hidden ones (m2m tables)."""
+    return [
+        field for field in model._meta.get_fields(include_hidden=True)
+        if field.auto_created and not field.concrete and (field.one_to_many or field.one_to_one)
+    ]
+
+
+def _chunks(queryset, size):
+    """Yield lists of primary keys from ``queryset`` in ascending pk order."""
+    last = None
+    while True:
+        page = queryset if last is None else queryset.filter(pk__gt=last)
+        pks = list(page.order_by('pk').values_list('pk', flat=True)[:size])
+        if not pks:
+            return
+        yield pks
+        last = pks[-1]
+
+
+def _clear(model, pks, size, progress, report):
+    for relation in _dependents(model):
+        related = relation.related_model
+        lookup = {f'{relation.field.name}__in': pks}
+        on_delete = relation.on_delete
+        if on_delete is models.CASCADE:
+            _remove(related, related._base_manager.filter(**lookup), size, progress, report)
+        elif on_delete is models.SET_NULL:
+            for chunk in _chunks(related._base_manager.filter(**lookup), size):
+                related._base_manager.filter(pk__in=chunk).update(**{relation.field.name: None})
+        elif on_delete is not models.DO_NOTHING:
+            raise NotImplementedError(f"purge cannot handle {on_delete.__name__} on {relation.field}")
+
+
+def _front_pages(model, pks):
+    """Communities whose snapshots list any of these rows."""
+    if model._meta.label != 'api.Post':
+        return []
+    return sorted(set(model._base_manager.filter(pk__in=pks).values_list('community_id', flat=True)))
+
+
+def _remove(model, queryset, size, progress, report):
+    for chunk in _chunks(queryset, size):
+        _clear(model, chunk, size, progress, report)
+        with transaction.atomic():
+            # Pick up anything attached since the first pass (usually nothing).
+            _clear(model, chunk, size, progress, report)
+            communities = _front_pages(model, chunk)
+            deleted = model._base_manager.filter(pk__in=chunk)._raw_delete(queryset.db)
+            for community_id in communities:
+                snapshots.touch(community_id)
+        progress[model._meta.label] += deleted
+        if report:
+            report(model._meta.label, progress[model._meta.label])
+
+
+def purge(model, pk, chunk_size=None, report=None):
+    """
+    Remove ``model`` row ``pk`` and everything that cascades from it.
+
+    ``report(label, removed_so_far)`` is called after every chunk. Returns the
+    number of rows removed per model label.
+    """
+    return remove(model._base_manager.filter(pk=pk), chunk_size, report)
+
+
+def remove(queryset, chunk_size=None, report=None):
+    """Like ``purge()``, for every row of ``queryset``."""
+    progress = Counter()
+    _remove(queryset.model, queryset, chunk_size or settings.PURGE_CHUNK_SIZE, progress, report)
+    return progress
+
+
+def mark_deleted(instance):
+    """Hide ``instance`` now and purge it (inline when the job queue is off)."""
+    now = timezone.now()
+    type(instance)._base_manager.filter(pk=instance.pk).update(deleted_at=now)
+    instance.deleted_at = now
+    label = instance._meta.label
+    jobs.enqueue('purge', {'model': label, 'pk': instance.pk}, key=f'{label}:{instance.pk}')
+
+
+def marked():
+    """Every root marked for deletion and not yet purged, as ``(model, pk)``."""
+    for label in ('api.User', 'api.Community', 'api.Post'):
+        model = apps.get_model(label)
+        for pk in model._base_manager.filter(deleted_at__isnull=False).order_by('pk').values_list('pk', flat=True):
+            yield model, pk
+
+
+@jobs.handler('purge', atomic=False)
+def _purge_job(payloads):
+    payload = payloads[0]
+    counts = purge(apps.get_model(payload['model']), payload['pk'])
+    logger.info("purge: %s %s done: %s", payload['model'], payload['pk'], dict(counts))
@@ -0,0 +1,103 @@
+"""
+"Communities you may like", from co-subscriptions.
+
+``compute()`` is a batch job: it loads every subscription into a sparse
+user x community matrix, finds each community's ``RECOMMENDATION_TOP_K``
+nearest neighbours by cosine similarity (``api/similarity.py``, NumPy/SciPy),
+and replaces the ``CommunitySimilarity`` table in one transaction. The
+endpoints only read that table: ``similar()`` is one index range scan, and
+``recommended()`` sums the neighbours of a user's subscriptions.
+"""
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Sum
+
+from . import jobs
+from .models import Community, CommunitySimilarity, Subscription
+
+logger = logging.getLogger(__name__)
+
+INSERT_BATCH_SIZE = 5000
+
+
+def _pairs(chunk_size):
+    return Subscription.objects.filter(
+        user__deleted_at__isnull=True, community__deleted_at__isnull=True,
+    ).values_list('user_id', 'community_id').iterator(chunk_size=chunk_size)
+
+
+def compute(top_k=None, min_overlap=None, block_size=None, chunk_size=100_000):
+    """
+    Rebuild ``CommunitySimilarity`` from the subscription table. Returns
+    ``(communities, neighbours)``: columns in the matrix and rows stored.
+    """
+    from . import similarity
+
+    top_k = top_k or settings.RECOMMENDATION_TOP_K
+    min_overlap = min_overlap or settings.RECOMMENDATION_MIN_OVERLAP
+    block_size = block_size or settings.RECOMMENDATION_BLOCK_SIZE
+
+    matrix, community_ids = similarity.subscription_matrix(_pairs(chunk_size))
+    blocks = list(similarity.top_neighbours(matrix, top_k, min_overlap, block_size))
+    total = sum(len(scores) for _, _, scores in blocks)
+    with transaction.atomic():
+        CommunitySimilarity.objects.all().delete()
+        for sources, targets, scores in blocks:
+            for start in range(0, len(scores), INSERT_BATCH_SIZE):
+                end = start + INSERT_BATCH_SIZE
+                CommunitySimilarity.objects.bulk_create(
+                    CommunitySimilarity(community_id=source, similar_id=target, score=score)
+                    for source, target, score in zip(
+                        community_ids[sources[start:end]].tolist(),
+                        community_ids[targets[start:end]].tolist(),
+                        scores[start:end].tolist(),
+                    )
+                )
+    return len(community_ids), total
+
+
+def _with_scores(scored):
+    """Live communities for ``[(id, score)]``, in order, with ``score`` set."""
+    communities = Community.objects.filter(deleted_at__isnull=True).in_bulk([pk for pk, _ in scored])
+    result = []
+    for pk, score in scored:
+        community = communities.get(pk)
+        if community is not None:
+            community.score = score
+            result.append(community)
+    return result
+
+
+def similar(community_id, limit):
+    """The communities most like ``community_id``, most similar first."""
+    scored = (
+        CommunitySimilarity.objects.filter(community_id=community_id)
+        .order_by('-score', 'similar_id')
+        .values_list('similar_id', 'score')[:limit]
+    )
+    return _with_scores(list(scored))
+
+
+def recommended(user, limit):
+    """
+    Communities ``user`` is not subscribed to, ranked by their summed
+    similarity to the ones they are.
+    """
+    subscribed = Subscription.objects.filter(user=user).values('community_id')
+    scored = (
+        CommunitySimilarity.objects.filter(community__in=subscribed)
+        .exclude(similar__in=subscribed)
+        .values('similar_id')
+        .annotate(total=Sum('score'))
+        .order_by('-total', 'similar_id')
+        .values_list('similar_id', 'total')[:limit]
+    )
+    return _with_scores(list(scored))
+
+
+@jobs.handler('community_recommendations', atomic=False)
+def _compute_job(payloads):
+    communities, neighbours = compute()
+    logger.info("community_recommendations: %s communities, %s neighbours", communities, neighbours)
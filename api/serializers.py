@@ -1,8 +1,119 @@
+import copy
+from functools import cached_property
+
 from rest_framework import serializers
+from django.conf import settings
 from django.contrib.auth.password_validation import validate_password
-from .models import User, Community, Post, Comment, PostVote, CommentVote, Subscription, Subscription
+from django.core.signals import setting_changed
+from django.db import models
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer as BaseTokenObtainPairSerializer
+from . import archive, counters
+from .authentication import ClaimsRefreshToken
+from .models import User, Community, Post, Comment, PostVote, CommentVote, Subscription, ArchivedPost, ArchivedComment, InboxItem
+
+_field_cache = {}
+
+
+def clear_field_cache():
+    _field_cache.clear()
+
+
+def _clear_on_setting_change(setting, **kwargs):
+    if setting == 'REST_FRAMEWORK':
+        clear_field_cache()
+
+
+setting_changed.connect(_clear_on_setting_change)
+
+
+def _copy_field(field):
+    if isinstance(field, serializers.ListSerializer):
+        # Its child is an argument and must not be shared.
+        return copy.deepcopy(field)
+    return field.__class__(*field._args, **field._kwargs)
+
+
+class CachedFieldsMixin:
+    """
+    Builds ``get_fields()`` once per class and hands each instance a deep copy.
+
+    ``ModelSerializer.get_fields`` introspects the model and rebuilds every
+    field for each serializer instance, including nested ones. The result
+    depends only on the class, so it is compiled on first use and copied
+    afterwards. Mixins that narrow fields per request (``SparseFieldsMixin``)
+    must come before this one so they narrow the copy.
+
+    Copies re-run each field's constructor with the original arguments rather
+    than deep-copying them, so querysets and other arguments are shared, not
+    cloned; don't give cached serializers mutable ``default`` values.
+    """
+
+    def get_fields(self):
+        cls = type(self)
+        fields = _field_cache.get(cls)
+        if fields is None:
+            fields = _field_cache[cls] = super().get_fields()
+        return {name: _copy_field(field) for name, field in fields.items()}
+
+    @cached_property
+    def _readable_fields(self):
+        # DRF re-filters self.fields for every object rendered.
+        return [field for field in self.fields.values() if not field.write_only]
+
 
-class UserSerializer(serializers.ModelSerializer):
+class SparseFieldsMixin:
+    """
+    Narrows a top-level serializer to ``context['sparse']``.
+
+    ``fields`` keeps only the named fields (plus ``id``), nested serializers not
+    named in ``expand`` collapse to their primary key, and ``excerpt`` renders
+    ``content`` from the database-truncated ``content_excerpt`` annotation.
+    Nested serializers always render in full.
+    """
+
+    def get_fields(self):
+        fields = super().get_fields()
+        sparse = self.context.get('sparse')
+        parent = self.parent
+        if isinstance(parent, serializers.ListSerializer):
+            parent = parent.parent
+        if not sparse or parent is not None:
+            return fields
+
+        wanted = sparse['fields']
+        if wanted is not None:
+            fields = {
+                name: field for name, field in fields.items()
+                if name in wanted or name == 'id' or field.write_only
+            }
+        for name, field in fields.items():
+            if isinstance(field, serializers.BaseSerializer) and name not in sparse['expand']:
+                fields[name] = serializers.PrimaryKeyRelatedField(read_only=True)
+        if sparse['excerpt'] and 'content' in fields:
+            fields['content'] = serializers.CharField(source='content_excerpt', read_only=True)
+        return fields
+
+
+class ViewerStateListSerializer(serializers.ListSerializer):
+    """
+    Resolves the requesting user's votes and subscriptions for the whole page
+    up front, one query each, instead of once per rendered object.
+    """
+
+    def to_representation(self, data):
+        items = list(data.all() if isinstance(data, models.manager.BaseManager) else data)
+        request = self.context.get('request')
+        if request and request.user.is_authenticated and items:
+            self._context = {**self._context, **self.child.resolve_viewer_state(request.user, items)}
+        return super().to_representation(items)
+
+
+def subscribed_communities(user, community_ids):
+    subscribed = Subscription.objects.filter(user=user, community__in=community_ids)
+    return {'subscribed_communities': set(subscribed.values_list('community_id', flat=True))}
+
+
+class UserSerializer(CachedFieldsMixin, serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, required=False, allow_blank=True)
 
     class Meta:
@@ -29,7 +140,34 @@ class UserSerializer(serializers.ModelSerializer):
         instance.save()
         return instance
     
-class RegistrationSerializer(serializers.ModelSerializer):
+class BulkVoteItemSerializer(serializers.Serializer):
+    type = serializers.ChoiceField(choices=['post', 'comment'])
+    id = serializers.IntegerField(min_value=1)
+    # The vote to end up with; 0 removes it
+    vote_value = serializers.ChoiceField(choices=[1, -1, 0])
+
+
+class BulkVoteSerializer(serializers.Serializer):
+    votes = BulkVoteItemSerializer(many=True, allow_empty=False, max_length=settings.BULK_VOTE_MAX_ITEMS)
+
+
+class InboxItemSerializer(CachedFieldsMixin, serializers.ModelSerializer):
+    actor = UserSerializer(read_only=True)
+
+    class Meta:
+        model = InboxItem
+        fields = ['id', 'kind', 'actor', 'post', 'comment', 'excerpt', 'created_at', 'read_at']
+        read_only_fields = fields
+
+
+class InboxReadSerializer(serializers.Serializer):
+    # Omitted: mark everything read
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), required=False, allow_empty=False, max_length=500,
+    )
+
+
+class RegistrationSerializer(CachedFieldsMixin, serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, required=True)
     password2 = serializers.CharField(write_only=True, required=True, label="Confirm password")
 
@@ -54,26 +192,47 @@ class RegistrationSerializer(serializers.ModelSerializer):
         user.save()
         return user
 
-class CommunitySerializer(serializers.ModelSerializer):
+class TokenObtainPairSerializer(BaseTokenObtainPairSerializer):
+    token_class = ClaimsRefreshToken
+
+class CommunitySerializer(CachedFieldsMixin, serializers.ModelSerializer):
     creator = serializers.PrimaryKeyRelatedField(read_only=True)
     is_subscribed = serializers.SerializerMethodField()
 
     class Meta:
         model = Community
-        fields = ['id', 'creator', 'name', 'description', 'subscriber_count', 'is_subscribed', 'created_at', 'updated_at', 'deleted_at']
-        read_only_fields = ['id', 'creator', 'subscriber_count', 'is_subscribed', 'created_at', 'updated_at', 'deleted_at']
+        fields = ['id', 'creator', 'name', 'description', 'subscriber_count', 'trending_score', 'is_subscribed', 'created_at', 'updated_at', 'deleted_at']
+        read_only_fields = ['id', 'creator', 'subscriber_count', 'trending_score', 'is_subscribed', 'created_at', 'updated_at', 'deleted_at']
+        list_serializer_class = ViewerStateListSerializer
+
+    def validate_name(self, value):
+        taken = Community.objects.filter(name_key=Community.normalize_name(value))
+        if self.instance is not None:
+            taken = taken.exclude(pk=self.instance.pk)
+        if taken.exists():
+            raise serializers.ValidationError("A community with this name already exists.")
+        return value
+
+    def resolve_viewer_state(self, user, communities):
+        return subscribed_communities(user, [c.pk for c in communities])
 
     def get_is_subscribed(self, obj):
+        subscribed = self.context.get('subscribed_communities')
+        if subscribed is not None:
+            return obj.pk in subscribed
         request = self.context.get('request')
         if request and request.user.is_authenticated:
             return Subscription.objects.filter(user=request.user, community=obj).exists()
         return False
 
+    def to_representation(self, instance):
+        return counters.add_pending(instance, super().to_representation(instance))
+
     def create(self, validated_data):
         validated_data['creator'] = self.context['request'].user
         return super().create(validated_data)
     
-class PostSerializer(serializers.ModelSerializer):
+class PostSerializer(SparseFieldsMixin, CachedFieldsMixin, serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
     community = CommunitySerializer(read_only=True)
     community_id = serializers.PrimaryKeyRelatedField(
@@ -86,35 +245,104 @@ class PostSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Post
-        fields = ['id', 'user', 'community', 'community_id', 'title', 'content', 'post_type', 'vote_count', 'comment_count', 'user_vote', 'created_at', 'updated_at', 'deleted_at']
-        read_only_fields = ['id', 'user', 'community', 'vote_count', 'comment_count', 'user_vote', 'created_at', 'updated_at', 'deleted_at']
+        fields = ['id', 'user', 'community', 'community_id', 'title', 'content', 'post_type', 'vote_count', 'upvotes', 'downvotes', 'comment_count', 'view_count', 'unique_viewers', 'user_vote', 'created_at', 'updated_at', 'deleted_at']
+        read_only_fields = ['id', 'user', 'community', 'vote_count', 'upvotes', 'downvotes', 'comment_count', 'view_count', 'unique_viewers', 'user_vote', 'created_at', 'updated_at', 'deleted_at']
+        list_serializer_class = ViewerStateListSerializer
+
+    def resolve_viewer_state(self, user, posts):
+        state = {}
+        if 'user_vote' in self.fields:
+            votes = PostVote.objects.filter(user=user, post__in=[p.pk for p in posts])
+            state['post_votes'] = dict(votes.values_list('post_id', 'vote_value'))
+        if isinstance(self.fields.get('community'), CommunitySerializer):
+            state.update(subscribed_communities(user, {p.community_id for p in posts}))
+        return state
 
     def get_user_vote(self, obj):
+        votes = self.context.get('post_votes')
+        if votes is not None:
+            return votes.get(obj.pk)
         request = self.context.get('request')
         if request and request.user.is_authenticated:
             vote = PostVote.objects.filter(user=request.user, post=obj).first()
             return vote.vote_value if vote else None
         return None
 
+    def to_representation(self, instance):
+        return counters.add_pending(instance, super().to_representation(instance))
+
     def create(self, validated_data):
         validated_data['user'] = self.context['request'].user
         return super().create(validated_data)
 
-class CommentSerializer(serializers.ModelSerializer):
+class PostField(serializers.PrimaryKeyRelatedField):
+    """Answers 403 rather than "does not exist" for archived posts."""
+
+    def to_internal_value(self, data):
+        try:
+            return super().to_internal_value(data)
+        except serializers.ValidationError:
+            try:
+                archived = ArchivedPost.objects.filter(pk=data).exists()
+            except (TypeError, ValueError):
+                archived = False
+            if archived:
+                raise archive.ArchivedThread
+            raise
+
+class CommentSerializer(SparseFieldsMixin, CachedFieldsMixin, serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
-    post = serializers.PrimaryKeyRelatedField(queryset=Post.objects.all())
+    post = PostField(queryset=Post.objects.filter(deleted_at__isnull=True, community__deleted_at__isnull=True))
     parent = serializers.PrimaryKeyRelatedField(queryset=Comment.objects.all(), required=False, allow_null=True)
 
     class Meta:
         model = Comment
-        fields = ['id', 'user', 'post', 'parent', 'content', 'vote_count', 'created_at', 'updated_at', 'deleted_at']
-        read_only_fields = ['id', 'user', 'vote_count', 'created_at', 'updated_at', 'deleted_at']
+        fields = ['id', 'user', 'post', 'parent', 'content', 'vote_count', 'upvotes', 'downvotes', 'created_at', 'updated_at', 'deleted_at']
+        read_only_fields = ['id', 'user', 'vote_count', 'upvotes', 'downvotes', 'created_at', 'updated_at', 'deleted_at']
 
     def create(self, validated_data):
         validated_data['user'] = self.context['request'].user
         return super().create(validated_data)
 
-class PostVoteSerializer(serializers.ModelSerializer):
+class ArchivedPostSerializer(CachedFieldsMixin, serializers.ModelSerializer):
+    """Renders an ``ArchivedPost`` in the shape of ``PostSerializer``."""
+    user = UserSerializer(read_only=True)
+    community = CommunitySerializer(read_only=True)
+    content = serializers.SerializerMethodField()
+    user_vote = serializers.SerializerMethodField()
+    deleted_at = serializers.ReadOnlyField(default=None)
+    archived = serializers.ReadOnlyField(default=True)
+
+    class Meta:
+        model = ArchivedPost
+        fields = ['id', 'user', 'community', 'title', 'content', 'post_type', 'vote_count', 'upvotes', 'downvotes', 'comment_count', 'view_count', 'unique_viewers', 'user_vote', 'created_at', 'updated_at', 'deleted_at', 'archived', 'archived_at']
+        read_only_fields = fields
+
+    def get_content(self, obj):
+        return archive.unpack_text(obj.content, obj.compressed)
+
+    def get_user_vote(self, obj):
+        request = self.context.get('request')
+        if request and request.user.is_authenticated:
+            return archive.unpack_votes(obj.votes, obj.compressed).get(request.user.pk)
+        return None
+
+class ArchivedCommentSerializer(CachedFieldsMixin, serializers.ModelSerializer):
+    """Renders an ``ArchivedComment`` in the shape of ``CommentSerializer``."""
+    user = UserSerializer(read_only=True)
+    parent = serializers.ReadOnlyField(source='parent_id')
+    content = serializers.SerializerMethodField()
+    deleted_at = serializers.ReadOnlyField(default=None)
+
+    class Meta:
+        model = ArchivedComment
+        fields = ['id', 'user', 'post', 'parent', 'content', 'vote_count', 'upvotes', 'downvotes', 'created_at', 'updated_at', 'deleted_at']
+        read_only_fields = fields
+
+    def get_content(self, obj):
+        return archive.unpack_text(obj.content, obj.compressed)
+
+class PostVoteSerializer(CachedFieldsMixin, serializers.ModelSerializer):
     user = serializers.PrimaryKeyRelatedField(read_only=True)
 
     class Meta:
@@ -126,7 +354,7 @@ class PostVoteSerializer(serializers.ModelSerializer):
         validated_data['user'] = self.context['request'].user
         return super().create(validated_data)
 
-class CommentVoteSerializer(serializers.ModelSerializer):
+class CommentVoteSerializer(CachedFieldsMixin, serializers.ModelSerializer):
     user = serializers.PrimaryKeyRelatedField(read_only=True)
 
     class Meta:
@@ -138,7 +366,7 @@ class CommentVoteSerializer(serializers.ModelSerializer):
         validated_data['user'] = self.context['request'].user
         return super().create(validated_data)
 
-class SubscriptionSerializer(serializers.ModelSerializer):
+class SubscriptionSerializer(CachedFieldsMixin, serializers.ModelSerializer):
     user = serializers.PrimaryKeyRelatedField(read_only=True)
 
     class Meta:
@@ -0,0 +1,55 @@
+"""
+Item-item similarity over a sparse user x community subscription matrix.
+
+Kept apart from ``api/recommendations.py`` because it needs NumPy and SciPy,
+which only the batch job uses.
+"""
+import itertools
+
+import numpy as np
+from scipy import sparse
+
+
+def subscription_matrix(pairs):
+    """
+    Build the user x community matrix from an iterable of
+    ``(user_id, community_id)`` pairs. Returns ``(matrix, community_ids)``,
+    where column ``i`` of the matrix is community ``community_ids[i]``.
+    """
+    flat = np.fromiter(itertools.chain.from_iterable(pairs), dtype=np.int64)
+    users, communities = flat[0::2], flat[1::2]
+    _, rows = np.unique(users, return_inverse=True)
+    community_ids, cols = np.unique(communities, return_inverse=True)
+    matrix = sparse.csr_matrix(
+        (np.ones(len(rows), dtype=np.int32), (rows, cols)),
+        shape=(rows.max() + 1 if len(rows) else 0, len(community_ids)),
+    )
+    return matrix, community_ids
+
+
+def top_neighbours(matrix, top_k, min_overlap=1, block_size=1000):
+    """
+    Yield ``(rows, cols, scores)`` arrays per block of communities: for each
+    community (column) its ``top_k`` most similar others by cosine similarity,
+    best first, ignoring pairs sharing fewer than ``min_overlap`` subscribers.
+
+    Each block is one sparse product ``items[block] @ matrix``, so memory
+    follows the number of co-subscribed pairs in the block, not its square.
+    """
+    items = matrix.T.tocsr()
+    norms = np.sqrt(np.diff(items.indptr)).astype(np.float64)
+    for start in range(0, items.shape[0], block_size):
+        overlap = (items[start:start + block_size] @ matrix).tocoo()
+        rows = overlap.row.astype(np.int64) + start
+        cols = overlap.col.astype(np.int64)
+        counts = overlap.data
+        keep = (rows != cols) & (counts >= min_overlap)
+        rows, cols, counts = rows[keep], cols[keep], counts[keep]
+        scores = counts / (norms[rows] * norms[cols])
+
+        # Best first within each row (ties by column), then keep each row's first top_k.
+        order = np.lexsort((cols, -scores, rows))
+        rows, cols, scores = rows[order], cols[order], scores[order]
+        rank = np.arange(len(rows)) - np.searchsorted(rows, rows)
+        keep = rank < top_k
+        yield rows[keep], cols[keep], scores[keep]
@@ -0,0 +1,124 @@
+"""
+Pre-rendered community front pages.
+
+``GET /api/communities/<id>/posts/?sort=new|top`` serves the community's
+first ``COMMUNITY_SNAPSHOT_SIZE`` posts from a ``CommunitySnapshot``: JSON
+rendered once without the per-user fields (``user_vote``,
+``community.is_subscribed``), which the view fills in per request.
+
+Writes call ``touch()``, which bumps the snapshot version and, with
+``JOB_QUEUE_ENABLED``, queues a ``community_snapshot`` job. Without the queue
+the write does nothing more: the next read of a stale snapshot rebuilds it,
+so a burst of votes costs one rebuild, not one each. While a snapshot is
+stale, requests keep getting the stale copy; the one process that claims
+``regenerating_since`` rebuilds it, so a hot community never sends its
+readers to the database at once.
+"""
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from . import counters, jobs
+from .models import CommunitySnapshot, Post, PostVote, Subscription
+from .serializers import PostSerializer
+
+SORTS = {
+    'new': ('-created_at', '-id'),
+    'top': ('-vote_count', '-created_at', '-id'),
+}
+
+
+def render(community_id, sort):
+    """The snapshot JSON for one community and sort order, built from ``Post``."""
+    posts = counters.annotate_pending(
+        Post.objects.filter(community_id=community_id, deleted_at__isnull=True)
+        .select_related('user', 'community')
+        .order_by(*SORTS[sort])
+    )[:settings.COMMUNITY_SNAPSHOT_SIZE]
+    data = PostSerializer(posts, many=True).data
+    for post in data:
+        # Filled in per request by personalize()
+        del post['user_vote']
+        del post['community']['is_subscribed']
+    return JSONRenderer().render(data).decode()
+
+
+def _claim_cutoff():
+    # Claims older than this belong to a rebuild that died.
+    return timezone.now() - timedelta(seconds=settings.COMMUNITY_SNAPSHOT_REGENERATE_TIMEOUT)
+
+
+def regenerate(community_id, sort):
+    """
+    Rebuild one snapshot unless another process is already doing it.
+    Returns True if this call rebuilt it.
+    """
+    snapshot, _ = CommunitySnapshot.objects.get_or_create(community_id=community_id, sort=sort)
+    row = CommunitySnapshot.objects.filter(pk=snapshot.pk)
+    if not row.exclude(regenerating_since__gte=_claim_cutoff()).update(regenerating_since=timezone.now()):
+        return False
+    try:
+        version = row.values_list('version', flat=True).get()
+        payload = render(community_id, sort)
+    except Exception:
+        row.update(regenerating_since=None)
+        raise
+    row.update(payload=payload, built_version=version, generated_at=timezone.now(), regenerating_since=None)
+    return True
+
+
+def _queue(community_id):
+    jobs.enqueue_once('community_snapshot', str(community_id), {'community': community_id})
+
+
+def touch(community_id):
+    """Mark the community's snapshots stale and queue their rebuild (left to the next read without a queue)."""
+    updated = CommunitySnapshot.objects.filter(community_id=community_id).update(version=F('version') + 1)
+    if updated and settings.JOB_QUEUE_ENABLED:
+        _queue(community_id)
+
+
+def get(community_id, sort):
+    """
+    The snapshot's posts, building it on first use and rebuilding it (or
+    queueing the rebuild) when stale. While another process builds the first snapshot, the page
+    is rendered without being stored.
+    """
+    snapshot = CommunitySnapshot.objects.filter(community_id=community_id, sort=sort).first()
+    if snapshot is None or snapshot.built_version is None:
+        regenerate(community_id, sort)
+        snapshot = CommunitySnapshot.objects.get(community_id=community_id, sort=sort)
+        payload = render(community_id, sort) if snapshot.built_version is None else snapshot.payload
+        return json.loads(payload)
+    if snapshot.built_version != snapshot.version:
+        if snapshot.regenerating_since is None or snapshot.regenerating_since < _claim_cutoff():
+            if settings.JOB_QUEUE_ENABLED:
+                _queue(community_id)
+            elif regenerate(community_id, sort):
+                snapshot.refresh_from_db()
+    return json.loads(snapshot.payload)
+
+
+def personalize(posts, user, community_id):
+    """Fill in the requesting user's fields left out of the snapshot."""
+    votes = dict(
+        PostVote.objects.filter(user=user, post__in=[post['id'] for post in posts])
+        .values_list('post_id', 'vote_value')
+    )
+    subscribed = Subscription.objects.filter(user=user, community_id=community_id).exists()
+    for post in posts:
+        post['user_vote'] = votes.get(post['id'])
+        post['community']['is_subscribed'] = subscribed
+    return posts
+
+
+@jobs.handler('community_snapshot', atomic=False)
+def _regenerate_job(payloads):
+    community_id = payloads[0]['community']
+    stale = CommunitySnapshot.objects.filter(community_id=community_id).exclude(built_version=F('version'))
+    for sort in stale.values_list('sort', flat=True):
+        regenerate(community_id, sort)
@@ -0,0 +1,56 @@
+"""
+Server-sent event endpoints (see ``api/live.py``).
+
+These are plain async Django views rather than DRF views so a stream holds
+no thread while it waits; they need the ASGI worker class. Under WSGI an open
+stream would pin a worker until gunicorn's timeout, so there they answer 501.
+Clients send the usual ``Authorization: Bearer`` header (e.g. with a
+fetch-based EventSource).
+"""
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+from rest_framework.exceptions import AuthenticationFailed
+
+from . import live
+from .authentication import CachedJWTAuthentication
+from .models import Community, Post
+
+
+async def _authenticate(request):
+    try:
+        result = await sync_to_async(CachedJWTAuthentication().authenticate)(request)
+    except AuthenticationFailed as e:
+        return JsonResponse({'detail': str(e.detail)}, status=401)
+    if result is None:
+        return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=401)
+    return None
+
+
+async def _stream(request, queryset, pk, channel):
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({'detail': 'Live streams are only served by the ASGI server.'}, status=501)
+    denied = await _authenticate(request)
+    if denied:
+        return denied
+    if not await queryset.filter(pk=pk).aexists():
+        return JsonResponse({'detail': 'No such object.'}, status=404)
+    response = StreamingHttpResponse(live.stream(channel), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@require_GET
+async def post_stream(request, pk):
+    """``vote``, ``comment`` and ``comment_vote`` events for one post."""
+    posts = Post.objects.filter(deleted_at__isnull=True, community__deleted_at__isnull=True)
+    return await _stream(request, posts, pk, live.post_channel(pk))
+
+
+@require_GET
+async def community_stream(request, pk):
+    """``vote`` and ``comment`` events for every post in one community."""
+    communities = Community.objects.filter(deleted_at__isnull=True)
+    return await _stream(request, communities, pk, live.community_channel(pk))
@@ -1,5 +1,7 @@
 import pytest
+from django.core.cache import caches as django_caches
 from rest_framework.test import APIClient
+from api import caches, live, post_views
 from api.models import User
 
 @pytest.fixture
@@ -26,4 +28,15 @@ def access_token(api_client, sample_user):
 @pytest.fixture
 def auth_client(api_client, access_token):
     api_client.credentials(HTTP_AUTHORIZATION=f"Bearer {access_token}")
-    return api_client
\ No newline at end of file
+    return api_client
+
+
+@pytest.fixture(autouse=True)
+def clear_local_caches():
+    # Per-worker caches outlive a test's transaction; start each test empty.
+    yield
+    caches.clear_all()
+    for cache in django_caches.all():
+        cache.clear()
+    post_views.discard()
+    live.broker.reset()
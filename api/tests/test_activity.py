@@ -0,0 +1,116 @@
+from datetime import date, timedelta
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework import status
+from api import activity, jobs
+from api.models import Comment, Community, CommunityActivity, Post, PostVote, Subscription, User, UserActivity
+
+
+@pytest.fixture
+def community(sample_user):
+    return Community.objects.create(creator=sample_user, name="Stats", description="desc")
+
+
+def totals(model, **owner):
+    row = model.objects.filter(day=timezone.localdate(), **owner).values().first()
+    return {k: v for k, v in row.items() if k not in ("id", "day", "community_id", "user_id")} if row else None
+
+
+@pytest.mark.django_db
+class TestWritePaths:
+    def test_api_writes_update_rollups(self, auth_client, community, sample_user):
+        auth_client.post("/api/posts/", {"community_id": community.id, "title": "T", "content": "b", "post_type": "text"})
+        post = Post.objects.get()
+        auth_client.post("/api/comments/", {"post": post.id, "content": "hi"}, format="json")
+        auth_client.post(f"/api/posts/{post.id}/vote/", {"vote_value": 1}, format="json")
+        auth_client.post(f"/api/posts/{post.id}/vote/", {"vote_value": -1}, format="json")  # switch: not a new vote
+        auth_client.post(f"/api/comments/{Comment.objects.get().id}/vote/", {"vote_value": 1}, format="json")
+        auth_client.post(f"/api/communities/{community.id}/subscribe/")
+
+        assert totals(CommunityActivity, community=community) == {"posts": 1, "comments": 1, "votes": 2, "subscribers": 1}
+        assert totals(UserActivity, user=sample_user) == {"posts": 1, "comments": 1, "votes": 2}
+
+        auth_client.delete(f"/api/communities/{community.id}/unsubscribe/")
+        assert totals(CommunityActivity, community=community)["subscribers"] == 0
+
+    def test_queued_deltas_fold_into_one_upsert(self, settings, community, sample_user):
+        settings.JOB_QUEUE_ENABLED = True
+        other = Community.objects.create(creator=sample_user, name="Other", description="desc")
+        for _ in range(5):
+            activity.record(community=community.pk, user=sample_user.pk, votes=1)
+        activity.record(community=other.pk, posts=2)
+
+        with CaptureQueriesContext(connection) as queries:
+            jobs.run_pending()
+
+        inserts = [q["sql"] for q in queries.captured_queries if "INSERT INTO" in q["sql"] and "activity" in q["sql"]]
+        assert len(inserts) == 2  # one per table
+        assert totals(CommunityActivity, community=community)["votes"] == 5
+        assert totals(CommunityActivity, community=other)["posts"] == 2
+        assert totals(UserActivity, user=sample_user)["votes"] == 5
+
+
+@pytest.mark.django_db
+class TestSeries:
+    @pytest.fixture
+    def history(self, community):
+        activity.apply([
+            ["community", community.pk, date(2024, 1, 1), {"posts": 1}],  # Monday
+            ["community", community.pk, date(2024, 1, 3), {"posts": 2, "votes": 5}],
+            ["community", community.pk, date(2024, 1, 8), {"comments": 4}],
+            ["community", community.pk, date(2024, 2, 1), {"subscribers": 3}],
+        ])
+
+    def test_buckets(self, auth_client, community, history):
+        url = f"/api/communities/{community.id}/activity/?since=2024-01-01&until=2024-02-29"
+
+        days = auth_client.get(url).data
+        weeks = auth_client.get(url + "&bucket=week").data
+        months = auth_client.get(url + "&bucket=month").data
+
+        assert [row["start"] for row in days] == [date(2024, 1, 1), date(2024, 1, 3), date(2024, 1, 8), date(2024, 2, 1)]
+        assert [(row["start"], row["posts"], row["votes"]) for row in weeks[:2]] == [
+            (date(2024, 1, 1), 3, 5), (date(2024, 1, 8), 0, 0),
+        ]
+        assert [(row["start"], row["comments"], row["subscribers"]) for row in months] == [
+            (date(2024, 1, 1), 4, 0), (date(2024, 2, 1), 0, 3),
+        ]
+
+    def test_user_activity(self, auth_client, sample_user):
+        activity.record(user=sample_user.pk, posts=1, subscribers=1)  # users have no subscribers column
+
+        response = auth_client.get(f"/api/users/{sample_user.id}/activity/")
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data == [{"start": timezone.localdate(), "posts": 1, "comments": 0, "votes": 0}]
+
+    @pytest.mark.parametrize("query", ["since=yesterday", "bucket=year", "since=2024-02-01&until=2024-01-01", "since=2000-01-01"])
+    def test_invalid_params(self, auth_client, community, query):
+        response = auth_client.get(f"/api/communities/{community.id}/activity/?{query}")
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.django_db
+def test_backfill_matches_live_counting(auth_client, community, sample_user):
+    other = User.objects.create(username="other")
+    post = Post.objects.create(user=sample_user, community=community, title="T", content="b", post_type="text")
+    Comment.objects.create(post=post, user=other, content="c")
+    PostVote.objects.create(post=post, user=other, vote_value=1)
+    Subscription.objects.create(user=other, community=community)
+    old = Post.objects.create(user=sample_user, community=community, title="Old", content="b", post_type="text")
+    Post.objects.filter(pk=old.pk).update(created_at=timezone.now() - timedelta(days=40))
+    activity.apply([["community", community.pk, timezone.localdate(), {"posts": 99}]])
+
+    call_command("backfill_activity", since=str(timezone.localdate() - timedelta(days=7)), stdout=open("/dev/null", "w"))
+
+    assert totals(CommunityActivity, community=community) == {"posts": 1, "comments": 1, "votes": 1, "subscribers": 1}
+    assert totals(UserActivity, user=other) == {"posts": 0, "comments": 1, "votes": 1}
+    assert not CommunityActivity.objects.filter(day__lt=timezone.localdate() - timedelta(days=7)).exists()
+
+    call_command("backfill_activity", stdout=open("/dev/null", "w"))
+    assert CommunityActivity.objects.filter(day=timezone.localdate() - timedelta(days=40), posts=1).exists()
@@ -0,0 +1,80 @@
+import io
+from datetime import timedelta
+
+import pytest
+from django.core.management import call_command
+from django.utils import timezone
+from rest_framework import status
+from api import archive
+from api.models import ArchivedComment, ArchivedPost, Comment, CommentVote, Community, Post, PostVote
+
+
+@pytest.fixture
+def old_post(sample_user):
+    c = Community.objects.create(creator=sample_user, name="Old", description="desc")
+    p = Post.objects.create(user=sample_user, community=c, title="Ancient", content="lorem ipsum " * 200, post_type="text", vote_count=1)
+    PostVote.objects.create(user=sample_user, post=p, vote_value=1)
+    top = Comment.objects.create(user=sample_user, post=p, content="first")
+    reply = Comment.objects.create(user=sample_user, post=p, parent=top, content="reply")
+    CommentVote.objects.create(user=sample_user, comment=reply, vote_value=-1)
+    long_ago = timezone.now() - timedelta(days=400)
+    Post.objects.filter(pk=p.pk).update(created_at=long_ago, updated_at=long_ago)
+    return p
+
+
+@pytest.mark.django_db
+class TestArchive:
+    def test_archives_old_threads_only(self, old_post, sample_user):
+        recent = Post.objects.create(user=sample_user, community=old_post.community, title="New", content="b", post_type="text")
+
+        assert archive.archive_posts() == (1, 2)
+
+        assert list(Post.objects.values_list('pk', flat=True)) == [recent.pk]
+        assert not Comment.objects.exists()
+        assert not PostVote.objects.exists()
+        stored = ArchivedPost.objects.get(pk=old_post.pk)
+        assert stored.compressed
+        assert len(stored.content) < len(old_post.content)
+        assert ArchivedComment.objects.filter(post=stored).count() == 2
+
+    def test_detail_and_comments_read_through(self, auth_client, old_post):
+        archive.archive_posts()
+
+        detail = auth_client.get(f"/api/posts/{old_post.id}/")
+        comments = auth_client.get(f"/api/posts/{old_post.id}/comments/")
+
+        assert detail.status_code == status.HTTP_200_OK
+        assert detail.data["archived"] is True
+        assert detail.data["content"] == old_post.content
+        assert detail.data["user_vote"] == 1
+        assert detail.data["community"]["name"] == "Old"
+        assert [c["content"] for c in comments.data] == ["first", "reply"]
+        assert comments.data[1]["parent"] == comments.data[0]["id"]
+
+    def test_archived_threads_are_read_only(self, auth_client, old_post):
+        archive.archive_posts()
+        comment_id = ArchivedComment.objects.first().pk
+
+        responses = [
+            auth_client.post(f"/api/posts/{old_post.id}/vote/", {"vote_value": 1}, format="json"),
+            auth_client.patch(f"/api/posts/{old_post.id}/", {"title": "x"}),
+            auth_client.post("/api/comments/", {"post": old_post.id, "content": "late"}),
+            auth_client.delete(f"/api/comments/{comment_id}/"),
+        ]
+
+        assert [r.status_code for r in responses] == [status.HTTP_403_FORBIDDEN] * 4
+        assert auth_client.get(f"/api/comments/{comment_id}/").data["content"] == "first"
+
+    def test_restore_round_trips_thread(self, auth_client, old_post):
+        archive.archive_posts()
+
+        call_command('archive_posts', restore=[old_post.pk], stdout=io.StringIO())
+
+        post = Post.objects.get(pk=old_post.pk)
+        assert post.content == old_post.content
+        assert post.created_at < timezone.now() - timedelta(days=399)
+        assert PostVote.objects.get(post=post).vote_value == 1
+        assert CommentVote.objects.get().vote_value == -1
+        assert Comment.objects.get(content="reply").parent.content == "first"
+        assert not ArchivedPost.objects.exists()
+        assert auth_client.get(f"/api/posts/{post.id}/").data.get("archived") is None
@@ -0,0 +1,78 @@
+import pytest
+from rest_framework import status
+from rest_framework.test import APIRequestFactory
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from api import caches
+from api.authentication import CachedJWTAuthentication, last_change, user_cache
+
+
+def read_as(token):
+    request = APIRequestFactory().get("/", HTTP_AUTHORIZATION=f"Bearer {token}")
+    user, _ = CachedJWTAuthentication().authenticate(request)
+    return user
+
+
+@pytest.mark.django_db
+class TestCachedJWTAuthentication:
+    def test_token_carries_user_claims(self, api_client, sample_user):
+        from rest_framework_simplejwt.tokens import AccessToken
+
+        resp = api_client.post(
+            "/api/token/",
+            {"username": sample_user.username, "password": "password123!"},
+            format="json",
+        )
+        token = AccessToken(resp.data["access"])
+
+        assert token["username"] == sample_user.username
+        assert token["is_staff"] is False
+
+    def test_read_skips_user_query(self, auth_client, sample_user, django_assert_num_queries):
+        # One query for the user list, none for the authenticated user
+        with django_assert_num_queries(1):
+            response = auth_client.get("/api/users/")
+
+        assert response.status_code == status.HTTP_200_OK
+
+    def test_write_loads_user_from_db(self, auth_client, sample_user, django_assert_num_queries):
+        with django_assert_num_queries(6):
+            # user lookup + name uniqueness check + savepoint, insert, release + is_subscribed check
+            response = auth_client.post("/api/communities/", {"name": "New", "description": "d"})
+
+        assert response.status_code == status.HTTP_201_CREATED
+        assert user_cache.get(f"{sample_user.pk}:{last_change(sample_user.pk)}").username == sample_user.username
+
+    def test_update_outdates_the_token_claims(self, auth_client, access_token, sample_user):
+        assert read_as(access_token).username == "TestUser"
+
+        auth_client.patch(f"/api/users/{sample_user.id}/", {"username": "Renamed"})
+        caches.clear_all()  # as another worker would see it
+
+        assert last_change(sample_user.pk) is not None
+        assert read_as(access_token).username == "Renamed"
+
+    def test_newer_tokens_use_their_claims(self, api_client, sample_user, django_assert_num_queries):
+        sample_user.save()
+        token = api_client.post(
+            "/api/token/", {"username": sample_user.username, "password": "password123!"}, format="json",
+        ).data["access"]
+
+        with django_assert_num_queries(0):
+            assert read_as(token).username == "TestUser"
+
+    def test_deactivated_user_is_refused_on_reads(self, access_token, sample_user):
+        read_as(access_token)
+        sample_user.is_active = False
+        sample_user.save()
+
+        with pytest.raises(AuthenticationFailed):
+            read_as(access_token)
+
+    def test_deleted_user_is_refused_on_reads(self, auth_client, sample_user):
+        response = auth_client.delete(f"/api/users/{sample_user.id}/")
+        assert response.status_code == status.HTTP_204_NO_CONTENT
+
+        caches.clear_all()  # the mark is shared, not held by the worker that deleted
+        response = auth_client.get("/api/communities/")
+
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
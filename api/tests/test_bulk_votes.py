@@ -0,0 +1,135 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework import status
+from api import jobs
+from api.models import (
+    ArchivedPost, Comment, CommentVote, Community, CommunityActivity, Job, Post, PostVote, User,
+)
+
+URL = "/api/votes/bulk/"
+
+
+@pytest.fixture
+def community(sample_user):
+    return Community.objects.create(creator=sample_user, name="Bulk", description="desc")
+
+
+def make_posts(community, user, n):
+    return Post.objects.bulk_create(
+        Post(user=user, community=community, title=f"P{i}", content="b", post_type="text") for i in range(n)
+    )
+
+
+@pytest.mark.django_db
+class TestBulkVotes:
+    def test_mixed_batch(self, auth_client, community, sample_user):
+        fresh, switched, removed, kept = make_posts(community, sample_user, 4)
+        comment = Comment.objects.create(post=fresh, user=sample_user, content="c")
+        for post, value in ((switched, 1), (removed, -1), (kept, 1)):
+            PostVote.objects.create(user=sample_user, post=post, vote_value=value)
+            Post.objects.filter(pk=post.pk).update(
+                vote_count=value, upvotes=int(value == 1), downvotes=int(value == -1),
+            )
+        ArchivedPost.objects.create(
+            id=9000, community=community, title="old", content=b"", post_type="text",
+            votes=b"[]", created_at=timezone.now(), updated_at=timezone.now(),
+        )
+
+        response = auth_client.post(URL, {"votes": [
+            {"type": "post", "id": fresh.id, "vote_value": -1},
+            {"type": "post", "id": fresh.id, "vote_value": 1},
+            {"type": "post", "id": switched.id, "vote_value": -1},
+            {"type": "post", "id": removed.id, "vote_value": 0},
+            {"type": "post", "id": kept.id, "vote_value": 1},
+            {"type": "comment", "id": comment.id, "vote_value": 1},
+            {"type": "post", "id": 9000, "vote_value": 1},
+            {"type": "comment", "id": 12345, "vote_value": 1},
+        ]}, format="json")
+
+        assert response.status_code == status.HTTP_200_OK
+        results = response.data["results"]
+        assert [r["status"] for r in results] == [
+            "superseded", "created", "updated", "removed", "unchanged", "created", "error", "error",
+        ]
+        assert results[1] == {
+            "type": "post", "id": fresh.id, "status": "created", "user_vote": 1,
+            "vote_count": 1, "upvotes": 1, "downvotes": 0,
+        }
+        assert (results[2]["vote_count"], results[2]["upvotes"], results[2]["downvotes"]) == (-1, 0, 1)
+        assert results[3]["user_vote"] is None and results[3]["vote_count"] == 0
+        assert results[6]["error"] == "archived" and results[7]["error"] == "not_found"
+
+        assert dict(PostVote.objects.filter(user=sample_user).values_list("post_id", "vote_value")) == {
+            fresh.id: 1, switched.id: -1, kept.id: 1,
+        }
+        comment.refresh_from_db()
+        assert (comment.vote_count, comment.upvotes) == (1, 1)
+        assert comment.best_score > 0
+        assert CommentVote.objects.filter(user=sample_user, comment=comment, vote_value=1).exists()
+        assert CommunityActivity.objects.get(community=community).votes == 2
+
+    def test_200_votes_take_a_handful_of_queries(self, settings, auth_client, community, sample_user):
+        settings.THROTTLE_RATES = {**settings.THROTTLE_RATES, "vote": ""}
+        other = Community.objects.create(creator=sample_user, name="Other", description="desc")
+        posts = make_posts(community, sample_user, 150) + make_posts(other, sample_user, 50)
+        PostVote.objects.bulk_create(PostVote(user=sample_user, post=p, vote_value=1) for p in posts[:50])
+        Post.objects.filter(pk__in=[p.pk for p in posts[:50]]).update(vote_count=1, upvotes=1)
+        payload = {"votes": [{"type": "post", "id": p.id, "vote_value": -1} for p in posts]}
+
+        with CaptureQueriesContext(connection) as queries:
+            response = auth_client.post(URL, payload, format="json")
+
+        assert response.status_code == status.HTTP_200_OK
+        assert len(queries) <= 20, [q["sql"][:80] for q in queries.captured_queries]
+        assert Post.objects.filter(vote_count=-1, downvotes=1).count() == 200
+        assert Post.objects.filter(upvotes=0).count() == 200
+
+    def test_upsert_without_conflict_target(self, monkeypatch, auth_client, community, sample_user):
+        # MySQL: Django refuses unique_fields there, ON DUPLICATE KEY UPDATE needs none.
+        monkeypatch.setattr(connection.features, "supports_update_conflicts_with_target", False)
+        posts = make_posts(community, sample_user, 2)
+
+        response = auth_client.post(URL, {"votes": [
+            {"type": "post", "id": p.id, "vote_value": 1} for p in posts
+        ]}, format="json")
+
+        assert response.status_code == status.HTTP_200_OK
+        assert [r["status"] for r in response.data["results"]] == ["created", "created"]
+        assert PostVote.objects.filter(user=sample_user, vote_value=1).count() == 2
+
+    def test_queued_counters(self, auth_client, community, sample_user, settings):
+        settings.JOB_QUEUE_ENABLED = True
+        posts = make_posts(community, sample_user, 3)
+
+        response = auth_client.post(URL, {"votes": [
+            {"type": "post", "id": p.id, "vote_value": 1} for p in posts
+        ]}, format="json")
+
+        assert [r["vote_count"] for r in response.data["results"]] == [1, 1, 1]
+        assert Job.objects.filter(kind="counter").count() == 3
+        jobs.run_pending()
+        assert Post.objects.filter(vote_count=1, upvotes=1).count() == 3
+
+    def test_other_users_votes_untouched(self, auth_client, community, sample_user):
+        post, = make_posts(community, sample_user, 1)
+        other = User.objects.create(username="other")
+        PostVote.objects.create(user=other, post=post, vote_value=-1)
+
+        auth_client.post(URL, {"votes": [{"type": "post", "id": post.id, "vote_value": 1}]}, format="json")
+
+        assert PostVote.objects.get(user=other).vote_value == -1
+        assert PostVote.objects.get(user=sample_user).vote_value == 1
+
+    @pytest.mark.parametrize("payload", [
+        {"votes": []},
+        {"votes": [{"type": "user", "id": 1, "vote_value": 1}]},
+        {"votes": [{"type": "post", "id": 1, "vote_value": 2}]},
+        {"votes": [{"type": "post", "id": 1, "vote_value": 1}] * 501},
+    ])
+    def test_invalid_payload(self, auth_client, payload):
+        assert auth_client.post(URL, payload, format="json").status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_requires_authentication(self, api_client):
+        assert api_client.post(URL, {"votes": []}, format="json").status_code == status.HTTP_401_UNAUTHORIZED
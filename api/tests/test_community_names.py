@@ -0,0 +1,61 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from api.models import Community
+from api.serializers import CommunitySerializer
+
+
+@pytest.mark.django_db
+class TestCommunityByName:
+    def test_lookup_is_case_insensitive(self, auth_client, sample_user):
+        c = Community.objects.create(creator=sample_user, name="Django", description="desc")
+
+        response = auth_client.get("/api/communities/by-name/DJANGO/")
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["id"] == c.id
+        assert response.data["name"] == "Django"
+
+    def test_lookup_uses_name_key_index(self, auth_client, sample_user):
+        Community.objects.create(creator=sample_user, name="Indexed", description="desc")
+
+        with CaptureQueriesContext(connection) as queries:
+            auth_client.get("/api/communities/by-name/indexed/")
+
+        community_query = next(q["sql"] for q in queries if 'FROM "api_community"' in q["sql"])
+        assert '"api_community"."name_key" = ' in community_query
+
+    def test_unknown_name_is_404(self, auth_client):
+        response = auth_client.get("/api/communities/by-name/nope/")
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_duplicate_names_rejected_ignoring_case(self, auth_client, sample_user):
+        Community.objects.create(creator=sample_user, name="Taken", description="desc")
+
+        response = auth_client.post("/api/communities/", {"name": " TAKEN", "description": "d"})
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert "name" in response.data
+
+    def test_renamed_community_moves_to_its_new_name(self, auth_client, sample_user):
+        c = Community.objects.create(creator=sample_user, name="Before", description="desc")
+        auth_client.get("/api/communities/by-name/before/")
+
+        auth_client.patch(f"/api/communities/{c.id}/", {"name": "After"})
+
+        assert auth_client.get("/api/communities/by-name/before/").status_code == status.HTTP_404_NOT_FOUND
+        assert auth_client.get("/api/communities/by-name/after/").data["id"] == c.id
+
+    def test_name_taken_concurrently_is_400(self, monkeypatch, auth_client, sample_user):
+        Community.objects.create(creator=sample_user, name="Raced", description="desc")
+        other = Community.objects.create(creator=sample_user, name="Other", description="desc")
+        # As if the other create committed between validate_name's check and the insert
+        monkeypatch.setattr(CommunitySerializer, "validate_name", lambda self, value: value)
+
+        created = auth_client.post("/api/communities/", {"name": "raced", "description": "d"})
+        renamed = auth_client.patch(f"/api/communities/{other.id}/", {"name": "RACED"})
+
+        assert created.status_code == renamed.status_code == status.HTTP_400_BAD_REQUEST
+        assert "name" in created.data and "name" in renamed.data
@@ -0,0 +1,169 @@
+import io
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from api import archive, ranking, triggers
+from api.models import Comment, CommentVote, Community, Post, PostVote, Subscription, User
+
+pytestmark = pytest.mark.skipif(connection.vendor not in triggers.VENDORS, reason="no counter triggers here")
+
+
+@pytest.fixture
+def with_triggers(settings):
+    # SQLite DDL is transactional: the triggers go with the test's rollback.
+    settings.COUNTER_TRIGGERS = True
+    triggers.install(connection)
+
+
+def client_for(user):
+    client = APIClient()
+    client.force_authenticate(user)
+    return client
+
+
+def scenario(tag):
+    """The same API traffic in either mode; returns every counter it touched and every total it reported."""
+    users = [User.objects.create(username=f"{tag}{i}") for i in range(4)]
+    clients = [client_for(user) for user in users]
+    community = Community.objects.create(creator=users[0], name=f"Parity {tag}", description="d")
+    posts = [
+        Post.objects.create(user=users[0], community=community, title=f"P{i}", content="c", post_type="text")
+        for i in range(3)
+    ]
+    reported = []
+
+    def call(response):
+        assert response.status_code < 300, response.data
+        data = response.data or {}
+        reported.append({k: v for k, v in data.items() if k in ("vote_count", "upvotes", "downvotes", "subscriber_count")})
+        return response
+
+    for client in clients:
+        call(client.post(f"/api/communities/{community.id}/subscribe/"))
+    call(clients[1].delete(f"/api/communities/{community.id}/unsubscribe/"))
+
+    for client, value in zip(clients, (1, 1, -1, 1)):
+        call(client.post(f"/api/posts/{posts[0].id}/vote/", {"vote_value": value}, format="json"))
+    call(clients[0].post(f"/api/posts/{posts[0].id}/vote/", {"vote_value": -1}, format="json"))  # switch
+    call(clients[1].post(f"/api/posts/{posts[0].id}/vote/", {"vote_value": 1}, format="json"))  # toggle off
+    call(clients[2].delete(f"/api/posts/{posts[0].id}/vote/"))
+
+    comment_ids = [
+        call(client.post("/api/comments/", {"post": posts[1].id, "content": "hi"}, format="json")).data["id"]
+        for client in clients
+    ]
+    for client, value in zip(clients, (1, -1, 1, 1)):
+        call(client.post(f"/api/comments/{comment_ids[0]}/vote/", {"vote_value": value}, format="json"))
+    call(clients[1].post(f"/api/comments/{comment_ids[0]}/vote/", {"vote_value": 1}, format="json"))
+    call(clients[3].delete(f"/api/comments/{comment_ids[0]}/vote/"))
+    call(clients[3].delete(f"/api/comments/{comment_ids[3]}/"))
+
+    call(clients[3].post("/api/votes/bulk/", {"votes": [
+        {"type": "post", "id": posts[2].id, "vote_value": 1},
+        {"type": "post", "id": posts[0].id, "vote_value": -1},
+        {"type": "comment", "id": comment_ids[1], "vote_value": -1},
+        {"type": "comment", "id": comment_ids[0], "vote_value": 1},
+    ]}, format="json"))
+
+    community.refresh_from_db()
+    return {
+        "reported": reported,
+        "subscribers": community.subscriber_count,
+        "posts": [
+            (p.vote_count, p.upvotes, p.downvotes, p.comment_count)
+            for p in Post.objects.filter(community=community).order_by("pk")
+        ],
+        "comments": [
+            (c.vote_count, c.upvotes, c.downvotes, pytest.approx(c.best_score), pytest.approx(c.controversy))
+            for c in Comment.objects.filter(post__community=community).order_by("pk")
+        ],
+    }
+
+
+def recount(community):
+    """The totals straight from the rows."""
+    posts = [
+        (
+            sum(v.vote_value for v in p.votes.all()), p.votes.filter(vote_value=1).count(),
+            p.votes.filter(vote_value=-1).count(), p.comments.count(),
+        )
+        for p in Post.objects.filter(community=community).order_by("pk")
+    ]
+    comments = []
+    for c in Comment.objects.filter(post__community=community).order_by("pk"):
+        ups, downs = c.votes.filter(vote_value=1).count(), c.votes.filter(vote_value=-1).count()
+        comments.append((ups - downs, ups, downs, ranking.wilson_lower_bound(ups, downs), ranking.controversy(ups, downs)))
+    return Subscription.objects.filter(community=community).count(), posts, comments
+
+
+@pytest.mark.django_db
+class TestCounterTriggers:
+    def test_same_counters_either_way(self, request):
+        by_views = scenario("views")
+        request.getfixturevalue("with_triggers")
+        by_triggers = scenario("triggers")
+
+        assert by_triggers == by_views
+        for tag, result in (("views", by_views), ("triggers", by_triggers)):
+            subscribers, posts, comments = recount(Community.objects.get(name=f"Parity {tag}"))
+            assert result["subscribers"] == subscribers == 3
+            assert result["posts"] == posts
+            assert result["comments"] == comments
+
+    def test_views_skip_the_counter_update(self, with_triggers, sample_user):
+        community = Community.objects.create(creator=sample_user, name="Quiet", description="d")
+        post = Post.objects.create(user=sample_user, community=community, title="T", content="c", post_type="text")
+        client = client_for(sample_user)
+        with CaptureQueriesContext(connection) as queries:
+            response = client.post(f"/api/posts/{post.id}/vote/", {"vote_value": 1}, format="json")
+        assert response.data["vote_count"] == 1
+        assert not [q for q in queries if q["sql"].startswith('UPDATE "api_post"')]
+
+    def test_direct_writes_are_counted(self, with_triggers, sample_user):
+        community = Community.objects.create(creator=sample_user, name="Direct", description="d")
+        post = Post.objects.create(user=sample_user, community=community, title="T", content="c", post_type="text")
+        comment = Comment.objects.create(user=sample_user, post=post, content="c")
+        others = User.objects.bulk_create(User(username=f"u{i}") for i in range(3))
+        PostVote.objects.bulk_create(PostVote(user=u, post=post, vote_value=v) for u, v in zip(others, (1, 1, -1)))
+        PostVote.objects.filter(user=others[0]).update(vote_value=-1)
+        CommentVote.objects.bulk_create(CommentVote(user=u, comment=comment, vote_value=v) for u, v in zip(others, (1, -1, 1)))
+        Subscription.objects.bulk_create(Subscription(user=u, community=community) for u in others)
+        Subscription.objects.filter(user=others[0]).delete()
+
+        post.refresh_from_db()
+        comment.refresh_from_db()
+        community.refresh_from_db()
+        assert (post.vote_count, post.upvotes, post.downvotes, post.comment_count) == (-1, 1, 2, 1)
+        assert (comment.vote_count, comment.upvotes, comment.downvotes) == (1, 2, 1)
+        assert comment.best_score == pytest.approx(ranking.wilson_lower_bound(2, 1))
+        assert comment.controversy == pytest.approx(ranking.controversy(2, 1))
+        assert community.subscriber_count == 2
+
+    def test_restore_is_not_counted_twice(self, with_triggers, sample_user):
+        community = Community.objects.create(creator=sample_user, name="Restore", description="d")
+        post = Post.objects.create(user=sample_user, community=community, title="T", content="c", post_type="text")
+        comment = Comment.objects.create(user=sample_user, post=post, content="c")
+        PostVote.objects.create(user=sample_user, post=post, vote_value=1)
+        CommentVote.objects.create(user=sample_user, comment=comment, vote_value=-1)
+        archive._archive_batch([post.pk], compress=False)
+
+        archive.restore_post(post.pk)
+
+        post.refresh_from_db()
+        comment.refresh_from_db()
+        assert (post.vote_count, post.upvotes, post.comment_count) == (1, 1, 1)
+        assert (comment.vote_count, comment.downvotes) == (-1, 1)
+
+    def test_command(self, settings):
+        out = io.StringIO()
+        call_command("counter_triggers", "status", stdout=out)
+        assert out.getvalue().startswith(f"0 of {len(triggers.definitions())}")
+        settings.COUNTER_TRIGGERS = True
+        call_command("counter_triggers", "install", stdout=out)
+        assert len(triggers.installed(connection)) == len(triggers.definitions())
+        settings.COUNTER_TRIGGERS = False
+        call_command("counter_triggers", "drop", stdout=out)
+        assert triggers.installed(connection) == []
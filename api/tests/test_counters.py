@@ -0,0 +1,69 @@
+import pytest
+from django.core.management import call_command
+from rest_framework import status
+from api import counters
+from api.models import Community, CounterShard, Post
+
+
+@pytest.fixture
+def sharded(settings):
+    settings.SHARDED_COUNTERS = {
+        'api.Community.subscriber_count': 4,
+        'api.Post.vote_count': 4,
+    }
+
+
+@pytest.mark.django_db
+class TestShardedCounters:
+    def test_subscribe_writes_shard_not_column(self, auth_client, sample_user, sharded):
+        c = Community.objects.create(creator=sample_user, name="Hot", description="desc")
+
+        response = auth_client.post(f"/api/communities/{c.id}/subscribe/")
+
+        assert response.status_code == status.HTTP_201_CREATED
+        assert response.data["subscriber_count"] == 1
+        c.refresh_from_db()
+        assert c.subscriber_count == 0
+        assert CounterShard.objects.get(counter='api.Community.subscriber_count', object_id=c.id).value == 1
+
+    def test_reads_include_pending_shards(self, auth_client, sample_user, sharded):
+        c = Community.objects.create(creator=sample_user, name="Hot", description="desc", subscriber_count=10)
+        for shard in range(3):
+            counters._add_to_shard('api.Community.subscriber_count', c.id, shard, 2)
+
+        detail = auth_client.get(f"/api/communities/{c.id}/")
+        listing = auth_client.get("/api/communities/")
+
+        assert detail.data["subscriber_count"] == 16
+        assert listing.data[0]["subscriber_count"] == 16
+
+    def test_vote_uses_shards(self, auth_client, sample_user, sharded):
+        c = Community.objects.create(creator=sample_user, name="Hot", description="desc")
+        p = Post.objects.create(user=sample_user, community=c, title="T", content="body", post_type="text")
+
+        auth_client.post(f"/api/posts/{p.id}/vote/", {"vote_value": 1}, format='json')
+        response = auth_client.post(f"/api/posts/{p.id}/vote/", {"vote_value": -1}, format='json')
+
+        assert response.data["vote_count"] == -1
+        assert auth_client.get(f"/api/posts/{p.id}/").data["vote_count"] == -1
+
+    def test_consolidate_folds_shards_into_column(self, sample_user, sharded):
+        c = Community.objects.create(creator=sample_user, name="Hot", description="desc", subscriber_count=5)
+        for shard, value in enumerate([3, -1, 2]):
+            counters._add_to_shard('api.Community.subscriber_count', c.id, shard, value)
+
+        call_command('consolidate_counters', verbosity=0)
+
+        c.refresh_from_db()
+        assert c.subscriber_count == 9
+        assert not CounterShard.objects.exclude(value=0).exists()
+        assert counters.current_value(c, 'subscriber_count') == 9
+
+    def test_consolidate_drops_shards_of_deleted_objects(self, sample_user, sharded):
+        c = Community.objects.create(creator=sample_user, name="Gone", description="desc")
+        counters._add_to_shard('api.Community.subscriber_count', c.id, 0, 1)
+        c.delete()
+
+        counters.consolidate()
+
+        assert not CounterShard.objects.exists()
@@ -0,0 +1,74 @@
+import threading
+from importlib.util import find_spec
+
+import pytest
+from django.contrib.auth.hashers import make_password
+from rest_framework import status
+from api import hashing
+from api.models import User
+
+ARGON2_FIRST = [
+    "django.contrib.auth.hashers.Argon2PasswordHasher",
+    "django.contrib.auth.hashers.PBKDF2PasswordHasher",
+]
+needs_argon2 = pytest.mark.skipif(find_spec("argon2") is None, reason="argon2-cffi is not installed")
+
+
+def login(client, username, password="password123!"):
+    return client.post("/api/token/", {"username": username, "password": password}, format="json")
+
+
+@pytest.mark.django_db
+class TestPasswordHashing:
+    @needs_argon2
+    def test_login_rehashes_with_the_preferred_hasher(self, settings, api_client, sample_user):
+        assert sample_user.password.startswith("pbkdf2_sha256$")
+        settings.PASSWORD_HASHERS = ARGON2_FIRST
+        assert login(api_client, sample_user.username).status_code == status.HTTP_200_OK
+        sample_user.refresh_from_db()
+        assert sample_user.password.startswith("argon2")
+        assert login(api_client, sample_user.username).status_code == status.HTTP_200_OK
+
+    @needs_argon2
+    def test_wrong_password_is_not_rehashed(self, settings, api_client, sample_user):
+        settings.PASSWORD_HASHERS = ARGON2_FIRST
+        assert login(api_client, sample_user.username, "nope").status_code == status.HTTP_401_UNAUTHORIZED
+        sample_user.refresh_from_db()
+        assert sample_user.password.startswith("pbkdf2_sha256$")
+
+    def test_hashing_runs_on_the_pool(self, settings):
+        settings.PASSWORD_HASH_WORKERS = 1
+        assert hashing.pool.run(lambda: threading.current_thread().name).startswith("password-hash")
+        settings.PASSWORD_HASH_WORKERS = 0
+        assert hashing.pool.run(lambda: threading.current_thread().name) == threading.current_thread().name
+
+    def test_full_pool_returns_503(self, settings, api_client, sample_user):
+        settings.PASSWORD_HASH_WORKERS = 1
+        settings.PASSWORD_HASH_QUEUE = 0
+        settings.PASSWORD_HASH_WAIT = 0.01
+        _, slots = hashing.pool._start()
+        slots.acquire()
+        try:
+            response = login(api_client, sample_user.username)
+        finally:
+            slots.release()
+        assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+        assert response["Retry-After"] == "1"
+        assert login(api_client, sample_user.username).status_code == status.HTTP_200_OK
+
+    @needs_argon2
+    def test_registration_hashes_with_the_preferred_hasher(self, settings, api_client):
+        settings.PASSWORD_HASHERS = ARGON2_FIRST
+        data = {"username": "new", "email": "new@x.io", "password": "Sup3r-secret!", "password2": "Sup3r-secret!"}
+        assert api_client.post("/api/auth/register/", data, format="json").status_code == status.HTTP_201_CREATED
+        assert User.objects.get(username="new").password.startswith("argon2")
+
+    def test_process_pool(self, settings):
+        settings.PASSWORD_HASH_POOL = "process"
+        settings.PASSWORD_HASH_WORKERS = 1
+        try:
+            encoded = hashing.make_password("secret")
+            assert hashing.check_password("secret", encoded)
+            assert not hashing.check_password("other", make_password("secret"))
+        finally:
+            hashing.pool.reset(wait=True)
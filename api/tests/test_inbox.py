@@ -0,0 +1,137 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+from api import jobs
+from api.models import Comment, Community, InboxItem, Post, User
+
+
+def client_for(user):
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(user).access_token}")
+    return client
+
+
+@pytest.fixture
+def author(db):
+    return User.objects.create(username="Author")
+
+
+@pytest.fixture
+def post(author):
+    community = Community.objects.create(creator=author, name="Inbox", description="desc")
+    return Post.objects.create(user=author, community=community, title="T", content="body", post_type="text")
+
+
+def reply(client, post, content="hi", parent=None):
+    data = {"post": post.id, "content": content}
+    if parent is not None:
+        data["parent"] = parent.id
+    response = client.post("/api/comments/", data, format="json")
+    assert response.status_code == status.HTTP_201_CREATED
+    return Comment.objects.get(pk=response.data["id"])
+
+
+@pytest.mark.django_db
+class TestNotifications:
+    def test_post_and_comment_replies_notify_their_authors(self, auth_client, sample_user, author, post):
+        top = reply(auth_client, post, "first")
+        author_client = client_for(author)
+        reply(author_client, post, "answer", parent=top)
+
+        item = InboxItem.objects.get(recipient=author)
+        assert (item.kind, item.actor, item.comment_id, item.post_id) == (InboxItem.POST_REPLY, sample_user, top.id, post.id)
+        item = InboxItem.objects.get(recipient=sample_user)
+        assert (item.kind, item.actor, item.excerpt) == (InboxItem.COMMENT_REPLY, author, "answer")
+        assert User.objects.get(pk=author.pk).unread_count == 1
+        assert User.objects.get(pk=sample_user.pk).unread_count == 1
+
+    def test_own_replies_are_not_notified(self, author, post):
+        client = client_for(author)
+        top = reply(client, post)
+        reply(client, post, parent=top)
+        assert not InboxItem.objects.exists()
+        assert client.get("/api/inbox/unread/").data == {"unread": 0}
+
+    def test_queued_replies_are_written_in_one_batch(self, settings, sample_user, author, post):
+        settings.JOB_QUEUE_ENABLED = True
+        client = client_for(sample_user)
+        top = reply(client, post)
+        for _ in range(4):
+            reply(client_for(author), post, parent=top)
+        assert not InboxItem.objects.exists()
+
+        with CaptureQueriesContext(connection) as queries:
+            jobs.run_pending()
+        inserts = [q["sql"] for q in queries.captured_queries if 'INSERT INTO "api_inboxitem"' in q["sql"]]
+        assert len(inserts) == 1
+        jobs.run_pending()  # the queued unread_count deltas
+
+        assert InboxItem.objects.filter(recipient=sample_user).count() == 4
+        assert User.objects.get(pk=sample_user.pk).unread_count == 4
+        assert User.objects.get(pk=author.pk).unread_count == 1
+
+    def test_items_survive_the_reply_being_deleted(self, auth_client, author, post):
+        comment = reply(auth_client, post, "gone soon")
+        auth_client.delete(f"/api/comments/{comment.id}/")
+        response = client_for(author).get("/api/inbox/")
+        assert [(item["comment"], item["excerpt"]) for item in response.data["results"]] == [(comment.id, "gone soon")]
+
+
+@pytest.mark.django_db
+class TestInboxEndpoints:
+    @pytest.fixture
+    def replies(self, auth_client, post):
+        return [reply(auth_client, post, f"reply {i}") for i in range(5)]
+
+    def test_requires_authentication(self, api_client):
+        assert api_client.get("/api/inbox/").status_code == status.HTTP_401_UNAUTHORIZED
+        assert api_client.get("/api/inbox/unread/").status_code == status.HTTP_401_UNAUTHORIZED
+
+    def test_cursor_pagination_newest_first(self, author, replies):
+        client = client_for(author)
+        seen = []
+        url = "/api/inbox/?page_size=2"
+        response = client.get(url)
+        assert response.status_code == status.HTTP_200_OK
+        assert "count" not in response.data
+        assert len(response.data["results"]) == 2
+        while url:
+            response = client.get(url)
+            seen += [item["comment"] for item in response.data["results"]]
+            url = response.data["next"]
+        assert seen == [c.id for c in reversed(replies)]
+
+    def test_only_own_items_are_listed(self, sample_user, replies):
+        assert client_for(sample_user).get("/api/inbox/").data["results"] == []
+
+    def test_mark_some_then_all_read(self, author, replies, django_capture_on_commit_callbacks):
+        client = client_for(author)
+        assert client.get("/api/inbox/unread/").data == {"unread": 5}
+        ids = [item.id for item in InboxItem.objects.filter(recipient=author)[:2]]
+
+        with django_capture_on_commit_callbacks(execute=True):
+            response = client.post("/api/inbox/read/", {"ids": ids}, format="json")
+        assert response.data == {"marked": 2, "unread": 3}
+        assert client.post("/api/inbox/read/", {"ids": ids}, format="json").data["marked"] == 0
+        assert client.get("/api/inbox/unread/").data == {"unread": 3}
+
+        with django_capture_on_commit_callbacks(execute=True):
+            response = client.post("/api/inbox/read/", {}, format="json")
+        assert response.data == {"marked": 3, "unread": 0}
+        assert User.objects.get(pk=author.pk).unread_count == 0
+        assert all(item["read_at"] for item in client.get("/api/inbox/").data["results"])
+
+    def test_cannot_mark_someone_elses_items(self, sample_user, author, replies):
+        ids = list(InboxItem.objects.values_list("id", flat=True))
+        assert client_for(sample_user).post("/api/inbox/read/", {"ids": ids}, format="json").data["marked"] == 0
+        assert User.objects.get(pk=author.pk).unread_count == 5
+
+    def test_unread_count_is_cached(self, author, replies):
+        client = client_for(author)
+        client.get("/api/inbox/unread/")
+        with CaptureQueriesContext(connection) as queries:
+            assert client.get("/api/inbox/unread/").data == {"unread": 5}
+        assert not [q for q in queries.captured_queries if "unread_count" in q["sql"]]
@@ -0,0 +1,134 @@
+import io
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework import status
+from api import jobs
+from api.models import Community, Job, Post
+
+
+@pytest.fixture
+def queue(settings):
+    settings.JOB_QUEUE_ENABLED = True
+    settings.JOB_RETRY_BACKOFF = 10
+    settings.JOB_MAX_ATTEMPTS = 2
+
+
+@pytest.fixture
+def failing_handler():
+    calls = []
+
+    @jobs.handler('test_fail')
+    def fail(payloads):
+        calls.append(payloads)
+        raise RuntimeError("boom")
+
+    yield calls
+    jobs._handlers.pop('test_fail')
+
+
+@pytest.mark.django_db
+class TestJobQueue:
+    def test_disabled_queue_runs_inline(self, auth_client, sample_user):
+        c = Community.objects.create(creator=sample_user, name="Inline", description="desc")
+
+        auth_client.post(f"/api/communities/{c.id}/subscribe/")
+
+        c.refresh_from_db()
+        assert c.subscriber_count == 1
+        assert not Job.objects.exists()
+
+    def test_subscribe_defers_counter_update(self, auth_client, sample_user, queue):
+        c = Community.objects.create(creator=sample_user, name="Deferred", description="desc")
+
+        response = auth_client.post(f"/api/communities/{c.id}/subscribe/")
+
+        assert response.status_code == status.HTTP_201_CREATED
+        assert response.data["subscriber_count"] == 1
+        c.refresh_from_db()
+        assert c.subscriber_count == 0
+        assert Job.objects.filter(kind='counter').count() == 1
+
+        jobs.run_pending()
+
+        c.refresh_from_db()
+        assert c.subscriber_count == 1
+        assert not Job.objects.exists()
+
+    def test_deltas_for_one_object_coalesce_into_one_update(self, auth_client, sample_user, queue):
+        c = Community.objects.create(creator=sample_user, name="Comm", description="desc")
+        p = Post.objects.create(user=sample_user, community=c, title="T", content="body", post_type="text")
+        for content in ["a", "b", "c"]:
+            auth_client.post("/api/comments/", {"post": p.id, "content": content})
+
+        with CaptureQueriesContext(connection) as queries:
+            jobs.run_pending()
+
+        p.refresh_from_db()
+        assert p.comment_count == 3
+        assert len([q for q in queries if q["sql"].startswith('UPDATE "api_post"')]) == 1
+
+    def test_failed_batch_is_retried_with_backoff(self, queue, failing_handler):
+        jobs.enqueue('test_fail', {'n': 1}, key='k')
+
+        jobs.run_pending()
+
+        job = Job.objects.get()
+        assert job.status == Job.PENDING
+        assert job.attempts == 1
+        assert job.run_after > timezone.now()
+        assert "boom" in job.last_error
+        # Not runnable again until the backoff expires
+        assert jobs.run_pending() == 0
+
+        Job.objects.update(run_after=timezone.now())
+        jobs.run_pending()
+
+        job.refresh_from_db()
+        assert job.status == Job.FAILED
+        assert len(failing_handler) == 2
+
+    def test_claimed_jobs_are_not_claimed_twice(self, queue):
+        jobs.enqueue('counter', {}, key='x')
+
+        first = jobs.claim(10, 'worker-a')
+        second = jobs.claim(10, 'worker-b')
+
+        assert len(first) == 1
+        assert second == []
+
+    def test_stale_claims_are_requeued(self, queue):
+        jobs.enqueue('counter', {}, key='x')
+        jobs.claim(10, 'dead-worker')
+
+        assert jobs.requeue_stale(timeout=-1) == 1
+        assert Job.objects.get().status == Job.PENDING
+
+    def test_batch_requeued_mid_run_is_rolled_back(self, auth_client, sample_user, queue, monkeypatch):
+        c = Community.objects.create(creator=sample_user, name="Stale", description="desc")
+        auth_client.post(f"/api/communities/{c.id}/subscribe/")
+        claimed = jobs.claim(10, 'worker-a')
+        # worker-a's claim goes stale while it runs and worker-b takes the batch over.
+        jobs.requeue_stale(timeout=-1)
+        jobs.claim(10, 'worker-b')
+        monkeypatch.setattr(jobs, 'claim', lambda limit, worker: claimed)
+
+        jobs.run_pending(worker='worker-a')
+
+        c.refresh_from_db()
+        assert c.subscriber_count == 0
+        job = Job.objects.get(kind='counter')
+        assert (job.status, job.claimed_by) == (Job.RUNNING, 'worker-b')
+
+    def test_run_jobs_once_drains_queue(self, auth_client, sample_user, queue):
+        c = Community.objects.create(creator=sample_user, name="Drain", description="desc")
+        auth_client.post(f"/api/communities/{c.id}/subscribe/")
+
+        call_command('run_jobs', once=True, stdout=io.StringIO())
+
+        c.refresh_from_db()
+        assert c.subscriber_count == 1
+        assert not Job.objects.exists()
@@ -0,0 +1,168 @@
+import asyncio
+from datetime import timedelta
+
+import pytest
+from asgiref.sync import async_to_sync, sync_to_async
+from django.test import AsyncClient, Client
+from django.utils import timezone
+from rest_framework import status
+from api import live
+from api.models import Community, LiveEvent, Post
+
+
+@pytest.fixture
+def post(sample_user):
+    community = Community.objects.create(creator=sample_user, name="Live", description="desc")
+    return Post.objects.create(user=sample_user, community=community, title="T", content="body", post_type="text")
+
+
+@pytest.fixture
+def fast(settings):
+    settings.LIVE_COALESCE_INTERVAL = 0.01
+    settings.LIVE_HEARTBEAT_INTERVAL = 5
+
+
+class TestBroker:
+    def test_coalesces_keyed_events(self, fast):
+        async def scenario():
+            subscriber = live.broker.subscribe("post:1")
+            for total in range(1, 100):
+                live.broker.deliver("post:1", "vote", f'{{"vote_count":{total}}}', key="1")
+            live.broker.deliver("post:1", "comment", '{"id":1}')
+            live.broker.deliver("post:1", "comment", '{"id":2}')
+            live.broker.deliver("post:2", "vote", "{}", key="2")  # nobody listening
+            batch = await asyncio.wait_for(subscriber.queue.get(), 1)
+            live.broker.unsubscribe(subscriber)
+            return batch
+
+        batch = async_to_sync(scenario)()
+
+        assert batch == [("vote", '{"vote_count":99}'), ("comment", '{"id":1}'), ("comment", '{"id":2}')]
+        assert live.broker.channels() == []
+
+    def test_slow_subscriber_is_told_to_reconnect(self, fast, settings):
+        settings.LIVE_QUEUE_SIZE = 2
+
+        async def scenario():
+            stream = live.stream("post:1")
+            chunks = [await anext(stream)]
+            for i in range(5):
+                live.broker.deliver("post:1", "comment", f'{{"id":{i}}}')
+                live.broker.flush()
+            await asyncio.sleep(0)
+            async for chunk in stream:
+                chunks.append(chunk)
+            return chunks
+
+        chunks = async_to_sync(scenario)()
+
+        assert chunks[0].startswith("retry:")
+        assert chunks[1:] == [
+            'event: comment\ndata: {"id":0}\n\n',
+            'event: comment\ndata: {"id":1}\n\n',
+            "event: reconnect\ndata: {}\n\n",
+        ]
+        assert live.broker.channels() == []
+
+
+@pytest.mark.django_db
+class TestPublishing:
+    def test_vote_and_comment_events(self, auth_client, post, sample_user, django_capture_on_commit_callbacks, fast):
+        async def scenario():
+            post_sub = live.broker.subscribe(live.post_channel(post.id))
+            community_sub = live.broker.subscribe(live.community_channel(post.community_id))
+
+            def write():
+                with django_capture_on_commit_callbacks(execute=True):
+                    auth_client.post(f"/api/posts/{post.id}/vote/", {"vote_value": 1}, format="json")
+                    auth_client.post(f"/api/posts/{post.id}/vote/", {"vote_value": -1}, format="json")
+                    auth_client.post("/api/comments/", {"post": post.id, "content": "hi"}, format="json")
+
+            await sync_to_async(write)()
+            return (
+                await asyncio.wait_for(post_sub.queue.get(), 1),
+                await asyncio.wait_for(community_sub.queue.get(), 1),
+            )
+
+        post_batch, community_batch = async_to_sync(scenario)()
+
+        assert [event for event, _ in post_batch] == ["vote", "comment"]
+        assert '"vote_count":-1' in post_batch[0][1] and '"downvotes":1' in post_batch[0][1]
+        assert '"content":"hi"' in post_batch[1][1]
+        assert [event for event, _ in community_batch] == ["vote", "comment"]
+
+    def test_rolled_back_writes_publish_nothing(self, post, django_capture_on_commit_callbacks):
+        with django_capture_on_commit_callbacks() as callbacks:
+            live.publish(live.post_channel(post.id), "vote", {"vote_count": 1}, key=str(post.id))
+
+        assert len(callbacks) == 1  # runs only if the transaction commits
+
+
+@pytest.mark.django_db
+class TestDatabaseBackend:
+    def test_relays_new_rows_for_subscribed_channels(self):
+        backend = live.DatabaseBackend()
+        LiveEvent.objects.create(channel="post:1", event="vote", data="{}")
+        assert backend._fetch({"post:1"}) == []  # starts at the current end
+
+        backend.publish("post:1", "vote", '{"vote_count":2}', "1")
+        backend.publish("post:9", "vote", "{}", "9")
+        rows = backend._fetch({"post:1"})
+
+        assert [(row[1], row[4]) for row in rows] == [("post:1", '{"vote_count":2}')]
+        assert backend._fetch({"post:1"}) == []
+
+    def test_prune_job(self, settings):
+        settings.LIVE_EVENT_RETENTION = 0
+        LiveEvent.objects.create(channel="post:1", event="vote", data="{}")
+
+        live._prune_job([{}])
+
+        assert not LiveEvent.objects.exists()
+
+    def test_publishing_prunes_old_rows(self, settings):
+        settings.LIVE_EVENT_RETENTION = 60
+        old = LiveEvent.objects.create(channel="post:1", event="vote", data="{}")
+        LiveEvent.objects.filter(pk=old.pk).update(created_at=timezone.now() - timedelta(hours=1))
+
+        live.DatabaseBackend().publish("post:1", "vote", '{"new":1}', "1")
+
+        assert list(LiveEvent.objects.values_list("data", flat=True)) == ['{"new":1}']
+
+
+@pytest.mark.django_db
+class TestStreamEndpoint:
+    def test_requires_authentication(self, post):
+        response = async_to_sync(AsyncClient().get)(f"/api/posts/{post.id}/stream/")
+
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    def test_refused_under_wsgi(self, access_token, post):
+        response = Client().get(f"/api/posts/{post.id}/stream/", headers={"authorization": f"Bearer {access_token}"})
+
+        assert response.status_code == status.HTTP_501_NOT_IMPLEMENTED
+        assert not response.streaming
+
+    def test_unknown_post(self, access_token):
+        response = async_to_sync(AsyncClient().get)("/api/posts/999/stream/", headers={"authorization": f"Bearer {access_token}"})
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND, response.content
+
+    def test_streams_events(self, access_token, post, fast):
+        async def scenario():
+            response = await AsyncClient().get(
+                f"/api/communities/{post.community_id}/stream/", headers={"authorization": f"Bearer {access_token}"},
+            )
+            content = aiter(response.streaming_content)
+            first = await anext(content)
+            live.broker.deliver(live.community_channel(post.community_id), "vote", '{"post":1}', key="1")
+            event = await asyncio.wait_for(anext(content), 1)
+            await content.aclose()
+            return response, first, event
+
+        response, first, event = async_to_sync(scenario)()
+
+        assert response["Content-Type"] == "text/event-stream"
+        assert b": connected" in first
+        assert event == b'event: vote\ndata: {"post":1}\n\n'
+        assert live.broker.channels() == []
@@ -0,0 +1,76 @@
+import pytest
+from rest_framework import status
+from api import metrics
+
+
+@pytest.fixture
+def metrics_dir(settings, tmp_path):
+    settings.METRICS_DIR = str(tmp_path)
+    yield tmp_path
+    metrics.reset_store()
+
+
+class TestMetricsStore:
+    def test_mmap_files_are_summed_across_processes(self, metrics_dir):
+        key = metrics._sample_key('hennepin_http_requests_total', ('view', 'method', 'status'), ('v', 'GET', '200'))
+        # Two stores standing in for two forked workers
+        first = metrics._MmapStore(str(metrics_dir / 'metrics_1.db'))
+        second = metrics._MmapStore(str(metrics_dir / 'metrics_2.db'))
+        first.add(key, 2)
+        second.add(key, 3)
+
+        output = metrics.render()
+
+        assert 'hennepin_http_requests_total{view="v",method="GET",status="200"} 5.0' in output
+
+    def test_mmap_store_grows_and_reloads(self, metrics_dir):
+        path = str(metrics_dir / 'metrics_9.db')
+        store = metrics._MmapStore(path)
+        for i in range(5000):
+            store.add(f'key-{i}', i)
+
+        reopened = metrics._MmapStore(path)
+        values = dict(reopened.items())
+
+        assert len(values) == 5000
+        assert values['key-4999'] == 4999
+
+    def test_histogram_buckets_are_cumulative(self, metrics_dir):
+        hist = metrics.Histogram('test_latency_seconds', 'Test histogram.', ['view'], buckets=[0.1, 1])
+        try:
+            hist.observe(0.05, 'x')
+            hist.observe(0.5, 'x')
+            hist.observe(5, 'x')
+            output = metrics.render()
+        finally:
+            metrics.REGISTRY.pop('test_latency_seconds')
+
+        assert 'test_latency_seconds_bucket{view="x",le="0.1"} 1.0' in output
+        assert 'test_latency_seconds_bucket{view="x",le="1.0"} 2.0' in output
+        assert 'test_latency_seconds_bucket{view="x",le="+Inf"} 3.0' in output
+        assert 'test_latency_seconds_count{view="x"} 3.0' in output
+
+
+@pytest.mark.django_db
+class TestMetricsEndpoint:
+    def test_requests_are_recorded_per_view(self, auth_client, metrics_dir):
+        auth_client.get("/api/posts/")
+        response = auth_client.get("/metrics/")
+
+        assert response.status_code == status.HTTP_200_OK
+        body = response.content.decode()
+        assert 'hennepin_http_requests_total{view="api:post-list",method="GET",status="200"} 1.0' in body
+        assert 'hennepin_db_queries_per_request_count{view="api:post-list"} 1.0' in body
+
+    def test_metrics_forbidden_from_other_hosts(self, api_client, settings):
+        settings.METRICS_ALLOWED_IPS = []
+        response = api_client.get("/metrics/")
+
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    def test_metrics_token_allows_remote_scrape(self, api_client, settings, metrics_dir):
+        settings.METRICS_ALLOWED_IPS = []
+        settings.METRICS_TOKEN = "scrape-secret"
+        response = api_client.get("/metrics/", HTTP_AUTHORIZATION="Bearer scrape-secret")
+
+        assert response.status_code == status.HTTP_200_OK
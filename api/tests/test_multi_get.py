@@ -0,0 +1,97 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework import status
+from api.models import ArchivedPost, Community, Post, PostVote, Subscription, User
+
+
+@pytest.fixture
+def community(sample_user):
+    return Community.objects.create(creator=sample_user, name="Multi", description="desc")
+
+
+def make_posts(community, user, n):
+    return Post.objects.bulk_create(
+        Post(user=user, community=community, title=f"P{i}", content="b", post_type="text") for i in range(n)
+    )
+
+
+def ids(objects):
+    return ",".join(str(o.id) for o in objects)
+
+
+@pytest.mark.django_db
+class TestPostMultiGet:
+    def test_order_missing_and_viewer_state(self, auth_client, community, sample_user):
+        first, second, third = make_posts(community, sample_user, 3)
+        PostVote.objects.create(user=sample_user, post=second, vote_value=-1)
+
+        response = auth_client.get(f"/api/posts/?ids={third.id},{second.id},999,{first.id},{third.id}")
+
+        assert response.status_code == status.HTTP_200_OK
+        assert [p["id"] for p in response.data["results"]] == [third.id, second.id, first.id]
+        assert response.data["missing"] == [999]
+        assert response.data["results"][1]["user_vote"] == -1
+
+    def test_constant_queries(self, auth_client, community, sample_user):
+        posts = make_posts(community, sample_user, 50)
+
+        def count(subset):
+            with CaptureQueriesContext(connection) as queries:
+                response = auth_client.get(f"/api/posts/?ids={ids(subset)}")
+            assert len(response.data["results"]) == len(subset)
+            return len(queries)
+
+        assert count(posts) == count(posts[:5]) <= 3
+
+    def test_archived_and_deleted(self, auth_client, community, sample_user):
+        live, gone = make_posts(community, sample_user, 2)
+        Post.objects.filter(pk=gone.pk).update(deleted_at=timezone.now())
+        ArchivedPost.objects.create(
+            id=5000, community=community, title="old", content=b"old body", post_type="text",
+            votes=b"[]", created_at=timezone.now(), updated_at=timezone.now(),
+        )
+
+        response = auth_client.get(f"/api/posts/?ids=5000,{gone.id},{live.id}")
+
+        assert [p["id"] for p in response.data["results"]] == [5000, live.id]
+        assert response.data["results"][0]["archived"] is True
+        assert response.data["missing"] == [gone.id]
+
+    def test_sparse_fields(self, auth_client, community, sample_user):
+        post, = make_posts(community, sample_user, 1)
+
+        response = auth_client.get(f"/api/posts/?ids={post.id}&fields=id,title")
+
+        assert response.data["results"] == [{"id": post.id, "title": "P0"}]
+
+    @pytest.mark.parametrize("query", ["ids=", "ids=1,x", "ids=" + ",".join(map(str, range(1, 102)))])
+    def test_invalid(self, auth_client, query):
+        assert auth_client.get(f"/api/posts/?{query}").status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.django_db
+class TestOtherResources:
+    def test_communities(self, auth_client, community, sample_user):
+        other = Community.objects.create(creator=sample_user, name="Other", description="desc")
+        Subscription.objects.create(user=sample_user, community=other)
+
+        response = auth_client.get(f"/api/communities/?ids={other.id},{community.id},404")
+
+        assert [(c["id"], c["is_subscribed"]) for c in response.data["results"]] == [(other.id, True), (community.id, False)]
+        assert response.data["missing"] == [404]
+
+    def test_users(self, auth_client, sample_user):
+        other = User.objects.create(username="other")
+        deleted = User.objects.create(username="gone", deleted_at=timezone.now())
+
+        response = auth_client.get(f"/api/users/?ids={other.id},{deleted.id},{sample_user.id}")
+
+        assert [u["username"] for u in response.data["results"]] == ["other", "TestUser"]
+        assert response.data["missing"] == [deleted.id]
+
+    def test_plain_list_unchanged(self, auth_client, community):
+        response = auth_client.get("/api/communities/")
+
+        assert isinstance(response.data, list)
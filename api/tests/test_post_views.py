@@ -0,0 +1,118 @@
+import pytest
+from django.db import DatabaseError, connection
+from django.test.utils import CaptureQueriesContext
+from api import hll, post_views
+from api.models import Comment, Community, Post
+
+
+@pytest.fixture
+def post(sample_user):
+    c = Community.objects.create(creator=sample_user, name="Views", description="desc")
+    return Post.objects.create(user=sample_user, community=c, title="T", content="body", post_type="text")
+
+
+class TestHyperLogLog:
+    @pytest.mark.parametrize("n", [100, 5000, 100000])
+    def test_estimate_within_error_bound(self, n):
+        sketch = hll.new()
+        for i in range(n):
+            hll.add(sketch, f"viewer-{i}")
+
+        # Three standard errors: fails well under 1% of the time for a random hash.
+        assert abs(hll.count(sketch) - n) <= 3 * hll.STANDARD_ERROR * n
+
+    def test_merge_counts_overlap_once(self):
+        a, b = hll.new(), hll.new()
+        for i in range(0, 6000):
+            hll.add(a, i)
+        for i in range(4000, 10000):
+            hll.add(b, i)
+
+        hll.merge(a, b)
+
+        assert abs(hll.count(a) - 10000) <= 3 * hll.STANDARD_ERROR * 10000
+        assert len(a) == hll.REGISTERS
+
+
+@pytest.mark.django_db
+class TestPostViews:
+    def test_views_are_buffered_until_flush(self, auth_client, post, settings):
+        settings.POST_VIEW_FLUSH_INTERVAL = 3600
+        for _ in range(3):
+            auth_client.get(f"/api/posts/{post.id}/")
+
+        post.refresh_from_db()
+        assert post.view_count == 0
+
+        post_views.flush()
+
+        post.refresh_from_db()
+        assert post.view_count == 3
+        assert post.unique_viewers == 1
+
+    def test_flush_writes_all_posts_in_one_update(self, post, sample_user):
+        other = Post.objects.create(user=sample_user, community=post.community, title="U", content="b", post_type="text")
+        for viewer in range(50):
+            post_views.record(post.id, f"user:{viewer}")
+        post_views.record(other.id, "user:1")
+
+        with CaptureQueriesContext(connection) as queries:
+            post_views.flush()
+
+        assert len([q for q in queries if q["sql"].startswith('UPDATE "api_post"')]) == 1
+        post.refresh_from_db()
+        other.refresh_from_db()
+        assert post.view_count == 50
+        assert abs(post.unique_viewers - 50) <= 2
+        assert (other.view_count, other.unique_viewers) == (1, 1)
+
+    def test_flushes_merge_with_stored_sketch(self, post):
+        post_views.record(post.id, "user:1")
+        post_views.flush()
+        post_views.record(post.id, "user:1")
+        post_views.record(post.id, "user:2")
+        post_views.flush()
+
+        post.refresh_from_db()
+        assert post.view_count == 3
+        assert post.unique_viewers == 2
+
+    def test_buffer_size_triggers_flush(self, post, settings):
+        settings.POST_VIEW_FLUSH_INTERVAL = 3600
+        settings.POST_VIEW_BUFFER_SIZE = 1
+
+        post_views.record(post.id, "user:1")
+
+        post.refresh_from_db()
+        assert post.view_count == 1
+
+    def test_sketch_column_is_never_loaded_by_reads(self, auth_client, post):
+        with CaptureQueriesContext(connection) as queries:
+            response = auth_client.get("/api/posts/")
+
+        assert response.data[0]["view_count"] == 0
+        assert all("viewers_hll" not in q["sql"] for q in queries)
+
+    def test_comment_writes_leave_the_sketch_alone(self, auth_client, post, sample_user):
+        comment = Comment.objects.create(user=sample_user, post=post, content="c")
+        with CaptureQueriesContext(connection) as queries:
+            auth_client.post(f"/api/comments/{comment.id}/vote/", {"vote_value": 1}, format="json")
+            auth_client.delete(f"/api/comments/{comment.id}/")
+
+        assert not Comment.objects.exists()
+        assert all("viewers_hll" not in q["sql"] for q in queries)
+
+    def test_failed_flush_keeps_the_views(self, auth_client, post, settings, monkeypatch):
+        settings.POST_VIEW_FLUSH_INTERVAL = 0
+        write = post_views._write
+
+        def fail(*args):
+            raise DatabaseError("database is locked")
+
+        monkeypatch.setattr(post_views, "_write", fail)
+        assert auth_client.get(f"/api/posts/{post.id}/").status_code == 200
+        monkeypatch.setattr(post_views, "_write", write)
+
+        post_views.flush()
+        post.refresh_from_db()
+        assert (post.view_count, post.unique_viewers) == (1, 1)
@@ -0,0 +1,92 @@
+import io
+
+import pytest
+from django.core.management import call_command
+from rest_framework import status
+from api import purge
+from api.models import Comment, CommentVote, Community, Job, Post, PostVote, Subscription, User
+
+
+@pytest.fixture
+def queue(settings):
+    settings.JOB_QUEUE_ENABLED = True
+
+
+@pytest.fixture
+def community(sample_user):
+    other = User.objects.create_user(username="other", password="x")
+    c = Community.objects.create(creator=sample_user, name="Big", description="desc")
+    Subscription.objects.create(user=other, community=c)
+    for i in range(5):
+        p = Post.objects.create(user=other, community=c, title=f"P{i}", content="body", post_type="text")
+        PostVote.objects.create(user=other, post=p, vote_value=1)
+        top = Comment.objects.create(user=other, post=p, content="top")
+        reply = Comment.objects.create(user=other, post=p, parent=top, content="reply")
+        CommentVote.objects.create(user=other, comment=reply, vote_value=1)
+    return c
+
+
+@pytest.mark.django_db
+class TestPurge:
+    def test_delete_marks_and_hides_then_job_purges(self, auth_client, community, queue):
+        response = auth_client.delete(f"/api/communities/{community.id}/")
+
+        assert response.status_code == status.HTTP_204_NO_CONTENT
+        community.refresh_from_db()
+        assert community.deleted_at is not None
+        assert Post.objects.filter(community=community).count() == 5
+        assert auth_client.get(f"/api/communities/{community.id}/").status_code == status.HTTP_404_NOT_FOUND
+        assert auth_client.get("/api/posts/").data == []
+        assert Job.objects.filter(kind='purge').count() == 1
+
+    @pytest.mark.parametrize("root", ["community", "post"])
+    def test_comments_under_a_marked_root_are_hidden(self, auth_client, community, queue, root):
+        post = community.posts.order_by("pk").first()
+        comment = post.comments.order_by("pk").first()
+        purge.mark_deleted(community if root == "community" else post)
+
+        assert comment.pk not in [c["id"] for c in auth_client.get("/api/comments/").data]
+        assert auth_client.get(f"/api/comments/{comment.pk}/").status_code == status.HTTP_404_NOT_FOUND
+        vote = auth_client.post(f"/api/comments/{comment.pk}/vote/", {"vote_value": 1}, format="json")
+        assert vote.status_code == status.HTTP_404_NOT_FOUND
+        bulk = auth_client.post("/api/votes/bulk/", {"votes": [
+            {"type": "comment", "id": comment.pk, "vote_value": 1},
+        ]}, format="json")
+        assert bulk.data["results"][0]["error"] == "not_found"
+        reply = auth_client.post("/api/comments/", {"post": post.pk, "content": "late"}, format="json")
+        assert reply.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_purge_removes_tree_in_chunks(self, community):
+        counts = purge.purge(Community, community.pk, chunk_size=2)
+
+        assert counts == {
+            'api.Community': 1, 'api.Subscription': 1, 'api.Post': 5, 'api.PostVote': 5,
+            'api.Comment': 10, 'api.CommentVote': 5,
+        }
+        assert not Community.objects.exists()
+        assert not Comment.objects.exists()
+        assert not CommentVote.objects.exists()
+        assert User.objects.filter(username="other").exists()
+
+    def test_deleted_user_content_is_detached_not_removed(self, sample_user):
+        other = User.objects.create_user(username="other", password="x")
+        c = Community.objects.create(creator=other, name="Kept", description="desc")
+        p = Post.objects.create(user=sample_user, community=c, title="T", content="b", post_type="text")
+
+        purge.purge(User, sample_user.pk)
+
+        p.refresh_from_db()
+        assert p.user_id is None
+        assert not User.objects.filter(pk=sample_user.pk).exists()
+
+    def test_purge_deleted_command_reports_progress(self, community, queue):
+        purge.mark_deleted(community)
+        out = io.StringIO()
+
+        call_command('purge_deleted', chunk_size=3, verbosity=2, stdout=out)
+
+        output = out.getvalue()
+        assert f"Purging api.Community {community.pk}" in output
+        assert "api.Comment: 10 removed" in output
+        assert "Purged 1 deleted object(s)." in output
+        assert not Community.objects.exists()
@@ -0,0 +1,131 @@
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from rest_framework import status
+from api import ranking
+from api.models import Comment, CommentVote, Community, Post, User
+
+
+@pytest.fixture
+def post(sample_user):
+    community = Community.objects.create(creator=sample_user, name="Ranked", description="desc")
+    return Post.objects.create(user=sample_user, community=community, title="T", content="body", post_type="text")
+
+
+def make_comment(post, user, ups, downs):
+    return Comment.objects.create(
+        post=post, user=user, content=f"{ups}/{downs}",
+        upvotes=ups, downvotes=downs, vote_count=ups - downs,
+    )
+
+
+@pytest.mark.django_db
+class TestScores:
+    @pytest.mark.parametrize("ups,downs", [(0, 0), (1, 0), (0, 3), (10, 2), (5, 5), (3, 40)])
+    def test_sql_matches_python(self, post, sample_user, ups, downs):
+        comment = make_comment(post, sample_user, ups, downs)
+        ranking.refresh_scores(Comment.objects.filter(pk=comment.pk))
+        comment.refresh_from_db()
+
+        assert comment.best_score == pytest.approx(ranking.wilson_lower_bound(ups, downs))
+        assert comment.controversy == pytest.approx(ranking.controversy(ups, downs))
+
+    def test_wilson_prefers_more_evidence(self):
+        assert ranking.wilson_lower_bound(100, 10) > ranking.wilson_lower_bound(10, 1) > ranking.wilson_lower_bound(1, 0)
+
+    def test_controversy_prefers_balanced(self):
+        assert ranking.controversy(50, 50) > ranking.controversy(90, 10) > ranking.controversy(100, 0) == 0
+
+    def test_sort_indexes_exist(self):
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(cursor, Comment._meta.db_table)
+        for name in ('comment_post_best_idx', 'comment_post_controversy_idx', 'comment_post_top_idx', 'comment_post_new_idx'):
+            assert name in constraints
+
+
+@pytest.mark.django_db
+class TestCommentVotes:
+    def test_vote_updates_totals_and_scores(self, auth_client, post, sample_user):
+        comment = Comment.objects.create(post=post, user=sample_user, content="c")
+        url = f"/api/comments/{comment.id}/vote/"
+
+        created = auth_client.post(url, {"vote_value": 1}, format="json")
+        assert created.status_code == status.HTTP_201_CREATED
+        assert (created.data["vote_count"], created.data["upvotes"], created.data["downvotes"]) == (1, 1, 0)
+
+        switched = auth_client.post(url, {"vote_value": -1}, format="json")
+        assert switched.status_code == status.HTTP_200_OK
+        assert (switched.data["vote_count"], switched.data["upvotes"], switched.data["downvotes"]) == (-1, 0, 1)
+
+        comment.refresh_from_db()
+        assert comment.best_score == 0
+        assert comment.downvotes == 1
+
+        removed = auth_client.delete(url)
+        assert removed.data["user_vote"] is None
+        assert (removed.data["vote_count"], removed.data["upvotes"], removed.data["downvotes"]) == (0, 0, 0)
+        assert auth_client.delete(url).status_code == status.HTTP_404_NOT_FOUND
+
+    def test_post_vote_tracks_split(self, auth_client, post):
+        response = auth_client.post(f"/api/posts/{post.id}/vote/", {"vote_value": -1}, format="json")
+
+        assert response.data["downvotes"] == 1
+        post.refresh_from_db()
+        assert (post.vote_count, post.upvotes, post.downvotes) == (-1, 0, 1)
+
+    def test_invalid_value(self, auth_client, post, sample_user):
+        comment = Comment.objects.create(post=post, user=sample_user, content="c")
+
+        response = auth_client.post(f"/api/comments/{comment.id}/vote/", {"vote_value": 2}, format="json")
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.django_db
+class TestCommentSorting:
+    @pytest.fixture
+    def comments(self, post, sample_user):
+        made = {
+            "lucky": make_comment(post, sample_user, 1, 0),
+            "solid": make_comment(post, sample_user, 40, 4),
+            "split": make_comment(post, sample_user, 20, 19),
+            "buried": make_comment(post, sample_user, 0, 9),
+        }
+        ranking.refresh_scores(Comment.objects.all())
+        return made
+
+    def titles(self, response, comments):
+        by_id = {c.id: name for name, c in comments.items()}
+        return [by_id[c["id"]] for c in response.data]
+
+    def test_sorts(self, auth_client, post, comments):
+        url = f"/api/posts/{post.id}/comments/"
+
+        assert self.titles(auth_client.get(url + "?sort=best"), comments) == ["solid", "split", "lucky", "buried"]
+        assert self.titles(auth_client.get(url + "?sort=controversial"), comments)[0] == "split"
+        assert self.titles(auth_client.get(url + "?sort=top"), comments) == ["solid", "split", "lucky", "buried"]
+        assert self.titles(auth_client.get(url + "?sort=new"), comments) == ["buried", "split", "solid", "lucky"]
+        assert self.titles(auth_client.get(url), comments) == ["lucky", "solid", "split", "buried"]
+
+    def test_invalid_sort(self, auth_client, post, comments):
+        response = auth_client.get(f"/api/posts/{post.id}/comments/?sort=hot")
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.django_db
+def test_backfill_vote_totals(post, sample_user):
+    other = User.objects.create_user(username="other", email="o@example.com", password="pw")
+    comment = Comment.objects.create(post=post, user=sample_user, content="c")
+    CommentVote.objects.create(comment=comment, user=sample_user, vote_value=1)
+    CommentVote.objects.create(comment=comment, user=other, vote_value=-1)
+    post.votes.create(user=other, vote_value=1)
+
+    call_command("backfill_vote_totals", chunk_size=1, stdout=open("/dev/null", "w"))
+
+    comment.refresh_from_db()
+    post.refresh_from_db()
+    assert (comment.upvotes, comment.downvotes) == (1, 1)
+    assert comment.controversy == pytest.approx(2.0)
+    assert comment.best_score == pytest.approx(ranking.wilson_lower_bound(1, 1))
+    assert (post.upvotes, post.downvotes) == (1, 0)
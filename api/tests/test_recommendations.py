@@ -0,0 +1,110 @@
+import pytest
+
+# The batch job's optional dependencies (see README)
+pytest.importorskip("numpy")
+pytest.importorskip("scipy")
+
+from django.core.management import call_command
+from rest_framework import status
+from api import recommendations, similarity
+from api.models import Community, CommunitySimilarity, Subscription, User
+
+
+@pytest.fixture
+def world(sample_user):
+    """Readers of a and b overlap heavily, b and c a little, d stands alone."""
+    communities = {
+        name: Community.objects.create(creator=sample_user, name=name, description="desc")
+        for name in "abcd"
+    }
+    memberships = {
+        "u1": "ab", "u2": "ab", "u3": "ab", "u4": "abc", "u5": "bc", "u6": "c", "u7": "d", "u8": "d",
+    }
+    for username, names in memberships.items():
+        user = User.objects.create(username=username)
+        for name in names:
+            Subscription.objects.create(user=user, community=communities[name])
+    return communities
+
+
+def neighbours(community):
+    return list(
+        CommunitySimilarity.objects.filter(community=community)
+        .order_by("-score").values_list("similar__name", flat=True)
+    )
+
+
+class TestSimilarity:
+    def test_top_neighbours_cosine_and_top_k(self):
+        matrix, ids = similarity.subscription_matrix(
+            [(1, 10), (1, 20), (2, 10), (2, 20), (3, 10), (3, 30), (4, 30)]
+        )
+        blocks = list(similarity.top_neighbours(matrix, top_k=1, block_size=2))
+        rows, cols, scores = (sum((list(block[i]) for block in blocks), []) for i in range(3))
+
+        pairs = {(int(ids[r]), int(ids[c])): round(s, 4) for r, c, s in zip(rows, cols, scores)}
+        # 10 has 3 readers, 20 has 2 (both shared), 30 has 2 (one shared)
+        assert pairs == {(10, 20): round(2 / (3 ** 0.5 * 2 ** 0.5), 4), (20, 10): 0.8165, (30, 10): 0.4082}
+
+    def test_empty(self):
+        matrix, ids = similarity.subscription_matrix([])
+
+        assert list(similarity.top_neighbours(matrix, top_k=5)) == []
+        assert len(ids) == 0
+
+
+@pytest.mark.django_db
+class TestCompute:
+    def test_stores_neighbours(self, world):
+        communities, stored = recommendations.compute(top_k=5, min_overlap=1, block_size=1)
+
+        assert communities == 4
+        assert neighbours(world["a"]) == ["b", "c"]
+        assert neighbours(world["c"]) == ["b", "a"]
+        assert neighbours(world["d"]) == []
+        assert stored == CommunitySimilarity.objects.count() == 6
+
+    def test_min_overlap_and_rebuild(self, world):
+        recommendations.compute(top_k=5, min_overlap=1)
+        call_command("compute_recommendations", min_overlap=2, stdout=open("/dev/null", "w"))
+
+        assert neighbours(world["a"]) == ["b"]
+        assert neighbours(world["c"]) == ["b"]
+
+    def test_ignores_deleted_communities(self, world):
+        Community.objects.filter(pk=world["b"].pk).update(deleted_at="2020-01-01T00:00Z")
+
+        recommendations.compute(top_k=5, min_overlap=1)
+
+        assert neighbours(world["a"]) == ["c"]
+
+
+@pytest.mark.django_db
+class TestEndpoints:
+    def test_similar(self, auth_client, world):
+        recommendations.compute(top_k=5, min_overlap=1)
+
+        response = auth_client.get(f"/api/communities/{world['a'].id}/similar/")
+
+        assert response.status_code == status.HTTP_200_OK
+        assert [c["name"] for c in response.data] == ["b", "c"]
+        assert response.data[0]["score"] > response.data[1]["score"]
+        assert "is_subscribed" in response.data[0]
+
+    def test_recommended_excludes_subscribed(self, auth_client, world, sample_user):
+        Subscription.objects.create(user=sample_user, community=world["a"])
+        recommendations.compute(top_k=5, min_overlap=1)
+
+        response = auth_client.get("/api/communities/recommended/?limit=1")
+
+        assert [c["name"] for c in response.data] == ["b"]
+
+    def test_recommended_without_subscriptions(self, auth_client, world):
+        recommendations.compute(top_k=5, min_overlap=1)
+
+        assert auth_client.get("/api/communities/recommended/").data == []
+
+    def test_invalid_limit(self, auth_client, world):
+        response = auth_client.get(f"/api/communities/{world['a'].id}/similar/?limit=500")
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
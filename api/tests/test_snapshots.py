@@ -0,0 +1,98 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from api import archive, jobs, snapshots
+from api.models import Community, CommunitySnapshot, Job, Post, PostVote, Subscription
+
+
+@pytest.fixture
+def community(sample_user):
+    c = Community.objects.create(creator=sample_user, name="Front", description="desc")
+    for i, votes in enumerate([1, 5, 3]):
+        Post.objects.create(user=sample_user, community=c, title=f"P{i}", content="body", post_type="text", vote_count=votes)
+    return c
+
+
+@pytest.mark.django_db
+class TestCommunitySnapshots:
+    def test_sorts_and_personalizes(self, auth_client, community, sample_user):
+        top = Post.objects.get(title="P1")
+        PostVote.objects.create(user=sample_user, post=top, vote_value=1)
+        Subscription.objects.create(user=sample_user, community=community)
+
+        new = auth_client.get(f"/api/communities/{community.id}/posts/?sort=new")
+        best = auth_client.get(f"/api/communities/{community.id}/posts/?sort=top")
+
+        assert [p["title"] for p in new.data] == ["P2", "P1", "P0"]
+        assert [p["title"] for p in best.data] == ["P1", "P2", "P0"]
+        assert best.data[0]["user_vote"] == 1
+        assert best.data[1]["user_vote"] is None
+        assert best.data[0]["community"]["is_subscribed"] is True
+        assert "user_vote" not in CommunitySnapshot.objects.get(sort="top").payload
+
+    def test_fresh_snapshot_skips_post_query(self, auth_client, community):
+        auth_client.get(f"/api/communities/{community.id}/posts/")
+
+        with CaptureQueriesContext(connection) as queries:
+            response = auth_client.get(f"/api/communities/{community.id}/posts/")
+
+        assert len(response.data) == 3
+        assert not any('FROM "api_post"' in q["sql"] for q in queries)
+
+    def test_unknown_sort_is_rejected(self, auth_client, community):
+        response = auth_client.get(f"/api/communities/{community.id}/posts/?sort=hot")
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_new_post_regenerates_inline_without_queue(self, auth_client, community):
+        auth_client.get(f"/api/communities/{community.id}/posts/")
+
+        auth_client.post("/api/posts/", {"community_id": community.id, "title": "Fresh", "content": "b", "post_type": "text"})
+
+        response = auth_client.get(f"/api/communities/{community.id}/posts/")
+        assert response.data[0]["title"] == "Fresh"
+
+    def test_votes_leave_the_rebuild_to_the_next_read(self, auth_client, community):
+        auth_client.get(f"/api/communities/{community.id}/posts/?sort=top")
+        post = Post.objects.get(title="P0")
+
+        with CaptureQueriesContext(connection) as queries:
+            auth_client.post(f"/api/posts/{post.id}/vote/", {"vote_value": 1}, format="json")
+
+        assert not any('UPDATE "api_communitysnapshot" SET "payload"' in q["sql"] for q in queries)
+        with CaptureQueriesContext(connection) as queries:
+            response = auth_client.get(f"/api/communities/{community.id}/posts/?sort=top")
+        assert [p["vote_count"] for p in response.data] == [5, 3, 2]
+        assert not any('"api_job"' in q["sql"] for q in queries)
+
+    def test_archive_and_restore_refresh_the_front_page(self, auth_client, community):
+        url = f"/api/communities/{community.id}/posts/"
+        auth_client.get(url)
+        post = Post.objects.get(title="P2")
+
+        archive._archive_batch([post.pk], compress=False)
+        assert [p["title"] for p in auth_client.get(url).data] == ["P1", "P0"]
+
+        archive.restore_post(post.pk)
+        assert [p["title"] for p in auth_client.get(url).data] == ["P2", "P1", "P0"]
+
+    def test_stale_snapshot_is_served_while_job_pending(self, auth_client, community, settings):
+        settings.JOB_QUEUE_ENABLED = True
+        auth_client.get(f"/api/communities/{community.id}/posts/?sort=top")
+        post = Post.objects.get(title="P0")
+
+        auth_client.post(f"/api/posts/{post.id}/vote/", {"vote_value": 1}, format="json")
+        stale = [auth_client.get(f"/api/communities/{community.id}/posts/?sort=top") for _ in range(3)]
+
+        assert [p["vote_count"] for p in stale[-1].data] == [5, 3, 1]
+        assert Job.objects.filter(kind="community_snapshot").count() == 1
+        jobs.run_pending()
+        fresh = auth_client.get(f"/api/communities/{community.id}/posts/?sort=top")
+        assert [p["vote_count"] for p in fresh.data] == [5, 3, 2]
+
+    def test_claimed_rebuild_is_not_repeated(self, community):
+        snapshots.get(community.id, "new")
+        CommunitySnapshot.objects.update(regenerating_since=snapshots.timezone.now())
+
+        assert snapshots.regenerate(community.id, "new") is False
@@ -0,0 +1,123 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.serializers import ModelSerializer
+from api.models import Community, Post, Comment, PostVote, Subscription
+from api.serializers import PostSerializer, UserSerializer, clear_field_cache
+
+
+@pytest.fixture
+def posts(sample_user):
+    c = Community.objects.create(creator=sample_user, name="Feed", description="desc")
+    return [
+        Post.objects.create(user=sample_user, community=c, title=f"Post {i}", content="x" * 500, post_type="text")
+        for i in range(5)
+    ]
+
+
+@pytest.mark.django_db
+class TestSparseFieldsets:
+    def test_fields_narrow_payload_and_columns(self, auth_client, posts):
+        with CaptureQueriesContext(connection) as queries:
+            response = auth_client.get("/api/posts/?fields=title,vote_count")
+
+        assert response.status_code == status.HTTP_200_OK
+        assert set(response.data[0]) == {"id", "title", "vote_count"}
+        post_query = next(q["sql"] for q in queries if 'FROM "api_post"' in q["sql"])
+        assert '"api_post"."content"' not in post_query
+        assert "api_user" not in post_query
+
+    def test_relations_collapse_to_ids_unless_expanded(self, auth_client, posts, sample_user):
+        collapsed = auth_client.get("/api/posts/?fields=title,user,community")
+        expanded = auth_client.get("/api/posts/?fields=title,user,community&expand=user")
+
+        assert collapsed.data[0]["user"] == sample_user.id
+        assert collapsed.data[0]["community"] == posts[0].community_id
+        assert expanded.data[0]["user"]["username"] == sample_user.username
+        assert expanded.data[0]["community"] == posts[0].community_id
+
+    def test_excerpt_truncates_content_in_database(self, auth_client, posts):
+        with CaptureQueriesContext(connection) as queries:
+            response = auth_client.get(f"/api/posts/{posts[0].id}/?fields=title,content&excerpt=20")
+
+        assert response.data["content"] == "x" * 20
+        assert any("SUBSTR" in q["sql"].upper() for q in queries)
+
+    def test_unknown_field_is_rejected(self, auth_client, posts):
+        response = auth_client.get("/api/posts/?fields=title,bogus&expand=title")
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert "fields" in response.data
+        assert "expand" in response.data
+
+    def test_no_params_renders_full_payload(self, auth_client, posts):
+        response = auth_client.get("/api/posts/")
+
+        assert isinstance(response.data[0]["user"], dict)
+        assert isinstance(response.data[0]["community"], dict)
+        assert response.data[0]["content"] == "x" * 500
+
+    def test_comment_fields(self, auth_client, posts, sample_user):
+        Comment.objects.create(user=sample_user, post=posts[0], content="hello")
+
+        response = auth_client.get(f"/api/posts/{posts[0].id}/comments/?fields=content")
+        listing = auth_client.get("/api/comments/?fields=content,user")
+
+        assert response.data == [{"id": response.data[0]["id"], "content": "hello"}]
+        assert listing.data[0]["user"] == sample_user.id
+
+
+@pytest.mark.django_db
+class TestBatchedViewerState:
+    def test_list_query_count_is_constant(self, auth_client, posts, sample_user, django_assert_num_queries):
+        PostVote.objects.create(user=sample_user, post=posts[1], vote_value=1)
+        Subscription.objects.create(user=sample_user, community=posts[0].community)
+
+        # posts (joined with user and community) + votes + subscriptions
+        with django_assert_num_queries(3):
+            response = auth_client.get("/api/posts/")
+
+        by_id = {p["id"]: p for p in response.data}
+        assert by_id[posts[1].id]["user_vote"] == 1
+        assert by_id[posts[0].id]["user_vote"] is None
+        assert all(p["community"]["is_subscribed"] for p in response.data)
+
+    def test_community_list_resolves_subscriptions_once(self, auth_client, sample_user, django_assert_num_queries):
+        subscribed = Community.objects.create(creator=sample_user, name="A", description="d")
+        Community.objects.create(creator=sample_user, name="B", description="d")
+        Subscription.objects.create(user=sample_user, community=subscribed)
+
+        with django_assert_num_queries(2):
+            response = auth_client.get("/api/communities/")
+
+        assert {c["name"]: c["is_subscribed"] for c in response.data} == {"A": True, "B": False}
+
+
+class TestCachedFieldMaps:
+    def test_field_map_is_built_once_per_class(self, monkeypatch):
+        calls = []
+        original = ModelSerializer.get_fields
+
+        def counting(self):
+            calls.append(type(self))
+            return original(self)
+
+        monkeypatch.setattr(ModelSerializer, 'get_fields', counting)
+        clear_field_cache()
+
+        first, second = PostSerializer(), PostSerializer()
+
+        assert set(first.fields) == set(second.fields)
+        assert calls.count(PostSerializer) == 1
+        assert first.fields['title'] is not second.fields['title']
+        assert second.fields['title'].parent is second
+
+    def test_sparse_narrowing_does_not_leak_into_cache(self):
+        sparse = {'fields': {'title'}, 'expand': set(), 'excerpt': None}
+
+        narrowed = PostSerializer(context={'sparse': sparse})
+
+        assert set(narrowed.fields) == {'id', 'title', 'community_id'}
+        assert 'content' in PostSerializer().fields
+        assert isinstance(PostSerializer().fields['user'], UserSerializer)
@@ -0,0 +1,152 @@
+import pytest
+from django.core.cache import caches
+from rest_framework import status
+from api import throttling
+from api.models import Community, Post
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [6000.0]  # the start of a one-minute window
+    monkeypatch.setattr(throttling.SlidingWindowThrottle, "timer", lambda self: now[0])
+    return now
+
+
+@pytest.fixture
+def post(sample_user):
+    community = Community.objects.create(creator=sample_user, name="Throttle", description="desc")
+    return Post.objects.create(user=sample_user, community=community, title="T", content="c", post_type="text")
+
+
+class CountingCache:
+    """Wraps a cache and counts calls."""
+
+    def __init__(self, cache):
+        self.cache = cache
+        self.calls = []
+
+    def __getattr__(self, name):
+        method = getattr(self.cache, name)
+
+        def call(*args, **kwargs):
+            self.calls.append(name)
+            return method(*args, **kwargs)
+        return call
+
+
+@pytest.mark.django_db
+class TestSlidingWindow:
+    def test_scoped_limit_and_retry_after(self, settings, clock, auth_client, post):
+        settings.THROTTLE_RATES = {**settings.THROTTLE_RATES, "vote": "3/min"}
+        for _ in range(3):
+            assert auth_client.post(f"/api/posts/{post.id}/vote/", {"vote_value": 1}, format="json").status_code < 400
+        clock[0] += 15
+        response = auth_client.post(f"/api/posts/{post.id}/vote/", {"vote_value": 1}, format="json")
+        assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+        # 3 in this window: the 4th fits once the window has slid, 45s left,
+        # plus a third of the next window (3 * (1 - 2/3) of it).
+        assert response["Retry-After"] == "65"
+
+        # Other scopes are counted separately.
+        assert auth_client.get(f"/api/posts/{post.id}/").status_code == status.HTTP_200_OK
+
+        clock[0] += 65
+        assert auth_client.post(f"/api/posts/{post.id}/vote/", {"vote_value": 1}, format="json").status_code < 400
+
+    def test_previous_window_slides_out(self, settings, clock, auth_client, post):
+        settings.THROTTLE_RATES = {**settings.THROTTLE_RATES, "vote": "4/min"}
+        url = f"/api/posts/{post.id}/vote/"
+        clock[0] += 50
+        for _ in range(4):
+            auth_client.post(url, {"vote_value": 1}, format="json")
+        clock[0] += 25  # 15s into the next window: 3/4 of the previous 4 still count
+        assert auth_client.post(url, {"vote_value": 1}, format="json").status_code < 400
+        response = auth_client.post(url, {"vote_value": 1}, format="json")
+        assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+        # Room for 2 more once the previous window weighs 2/4 or less, at 30s.
+        assert response["Retry-After"] == "15"
+        clock[0] += 15
+        assert auth_client.post(url, {"vote_value": 1}, format="json").status_code < 400
+
+    def test_rejected_requests_do_not_extend_the_wait(self, settings, clock, auth_client, post):
+        settings.THROTTLE_RATES = {**settings.THROTTLE_RATES, "vote": "2/min"}
+        url = f"/api/posts/{post.id}/vote/"
+        auth_client.post(url, {"vote_value": 1}, format="json")
+        auth_client.post(url, {"vote_value": 1}, format="json")
+        waits = {auth_client.post(url, {"vote_value": 1}, format="json")["Retry-After"] for _ in range(5)}
+        assert waits == {"90"}
+
+    def test_bulk_votes_are_charged_per_vote(self, settings, clock, auth_client, post):
+        settings.THROTTLE_RATES = {**settings.THROTTLE_RATES, "vote": "5/min"}
+        url = "/api/votes/bulk/"
+        batch = {"votes": [{"type": "post", "id": post.id, "vote_value": 1}] * 3}
+        assert auth_client.post(url, batch, format="json").status_code == status.HTTP_200_OK
+        response = auth_client.post(url, batch, format="json")
+        assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+        # 3 more fit once the previous 3 weigh 2 or less: 20s into the next window.
+        assert response["Retry-After"] == "80"
+        # Two single votes still fit.
+        for _ in range(2):
+            assert auth_client.post(f"/api/posts/{post.id}/vote/", {"vote_value": 1}, format="json").status_code < 400
+        too_big = {"votes": [{"type": "post", "id": post.id, "vote_value": 1}] * 6}
+        clock[0] += 600
+        response = auth_client.post(url, too_big, format="json")
+        assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+        assert "Retry-After" not in response
+
+    def test_anonymous_clients_are_limited_per_ip(self, settings, clock, api_client):
+        settings.THROTTLE_RATES = {**settings.THROTTLE_RATES, "register": "2/hour"}
+        for i in range(2):
+            data = {"username": f"u{i}", "email": f"u{i}@x.io", "password": "Sup3r-secret!", "password2": "Sup3r-secret!"}
+            assert api_client.post("/api/auth/register/", data, format="json").status_code == status.HTTP_201_CREATED
+        data = {"username": "u3", "email": "u3@x.io", "password": "Sup3r-secret!", "password2": "Sup3r-secret!"}
+        assert api_client.post("/api/auth/register/", data, format="json").status_code == status.HTTP_429_TOO_MANY_REQUESTS
+        response = api_client.post("/api/auth/register/", data, format="json", REMOTE_ADDR="10.0.0.9")
+        assert response.status_code == status.HTTP_201_CREATED
+
+    def test_spoofed_forwarded_for_is_ignored(self, settings, clock, api_client):
+        settings.THROTTLE_RATES = {**settings.THROTTLE_RATES, "login": "2/min"}
+        data = {"username": "nobody", "password": "wrong"}
+        codes = [
+            api_client.post("/api/token/", data, format="json", HTTP_X_FORWARDED_FOR=f"10.0.0.{i}").status_code
+            for i in range(3)
+        ]
+        assert codes[-1] == status.HTTP_429_TOO_MANY_REQUESTS
+
+    def test_forwarded_for_behind_a_proxy(self, settings, clock, api_client):
+        settings.REST_FRAMEWORK = {**settings.REST_FRAMEWORK, "NUM_PROXIES": 1}
+        settings.THROTTLE_RATES = {**settings.THROTTLE_RATES, "login": "2/min"}
+        data = {"username": "nobody", "password": "wrong"}
+        # The proxy appends the real client address; anything before it is the client's say-so.
+        for i in range(2):
+            api_client.post("/api/token/", data, format="json", HTTP_X_FORWARDED_FOR=f"6.6.6.{i}, 10.0.0.1")
+        response = api_client.post("/api/token/", data, format="json", HTTP_X_FORWARDED_FOR="6.6.6.9, 10.0.0.1")
+        assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+        response = api_client.post("/api/token/", data, format="json", HTTP_X_FORWARDED_FOR="10.0.0.2")
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    def test_empty_rate_disables_a_scope(self, settings, clock, auth_client, post):
+        settings.THROTTLE_RATES = {**settings.THROTTLE_RATES, "read": "1/min"}
+        auth_client.get(f"/api/posts/{post.id}/")
+        assert auth_client.get(f"/api/posts/{post.id}/").status_code == status.HTTP_429_TOO_MANY_REQUESTS
+        settings.THROTTLE_RATES = {**settings.THROTTLE_RATES, "read": ""}
+        assert auth_client.get(f"/api/posts/{post.id}/").status_code == status.HTTP_200_OK
+
+    def test_allowed_request_is_one_cache_call(self, monkeypatch, clock, auth_client, post):
+        counting = CountingCache(caches["default"])
+        monkeypatch.setattr(throttling, "caches", {"default": counting})
+        auth_client.get(f"/api/posts/{post.id}/")
+        counting.calls.clear()
+        auth_client.get(f"/api/posts/{post.id}/")
+        assert counting.calls == ["incr"]
+
+    def test_file_cache_backend(self, settings, clock, tmp_path, auth_client, post):
+        settings.CACHES = {
+            **settings.CACHES,
+            "throttle": {"BACKEND": "django.core.cache.backends.filebased.FileBasedCache", "LOCATION": str(tmp_path)},
+        }
+        settings.THROTTLE_CACHE = "throttle"
+        settings.THROTTLE_RATES = {**settings.THROTTLE_RATES, "read": "2/min"}
+        assert auth_client.get(f"/api/posts/{post.id}/").status_code == status.HTTP_200_OK
+        assert auth_client.get(f"/api/posts/{post.id}/").status_code == status.HTTP_200_OK
+        assert auth_client.get(f"/api/posts/{post.id}/").status_code == status.HTTP_429_TOO_MANY_REQUESTS
@@ -0,0 +1,78 @@
+from datetime import timedelta
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework import status
+from api import activity, trending
+from api.models import Community
+
+
+@pytest.fixture
+def communities(sample_user):
+    made = {
+        name: Community.objects.create(creator=sample_user, name=name, description="desc", subscriber_count=size)
+        for name, size in (("big", 1000), ("rising", 10), ("quiet", 50))
+    }
+    today = timezone.localdate()
+    activity.apply([
+        ["community", made["big"].pk, today - timedelta(days=6), {"subscribers": 40, "posts": 10}],
+        ["community", made["rising"].pk, today, {"subscribers": 10, "posts": 3, "comments": 20}],
+        ["community", made["quiet"].pk, today - timedelta(days=30), {"posts": 100}],  # outside the window
+    ])
+    return made
+
+
+def names(response):
+    return [c["name"] for c in response.data]
+
+
+@pytest.mark.django_db
+class TestTrending:
+    def test_scores_decay_with_age(self, communities, settings):
+        scores = trending.scores()
+
+        rising = 10 * 3 + 3 * 2 + 20 * 1
+        big = (40 * 3 + 10 * 2) * 0.5 ** (6 / settings.TRENDING_HALF_LIFE_DAYS)
+        assert scores == {communities["rising"].pk: pytest.approx(rising), communities["big"].pk: pytest.approx(big)}
+
+    def test_compute_resets_stale_scores(self, communities):
+        Community.objects.filter(pk=communities["quiet"].pk).update(trending_score=99)
+
+        call_command("compute_trending", stdout=open("/dev/null", "w"))
+
+        communities["quiet"].refresh_from_db()
+        communities["rising"].refresh_from_db()
+        assert communities["quiet"].trending_score == 0
+        assert communities["rising"].trending_score > 0
+
+
+@pytest.mark.django_db
+class TestCommunitySorts:
+    def test_sorts(self, auth_client, communities):
+        trending.compute()
+
+        assert names(auth_client.get("/api/communities/?sort=trending")) == ["rising", "big", "quiet"]
+        assert names(auth_client.get("/api/communities/?sort=largest")) == ["big", "quiet", "rising"]
+        assert names(auth_client.get("/api/communities/?sort=newest")) == ["quiet", "rising", "big"]
+
+    def test_trending_is_a_plain_ordered_read(self, auth_client, communities):
+        trending.compute()
+
+        with CaptureQueriesContext(connection) as queries:
+            auth_client.get("/api/communities/?sort=trending")
+
+        listing = next(q["sql"] for q in queries.captured_queries if 'FROM "api_community"' in q["sql"])
+        assert "ORDER BY" in listing and "trending_score" in listing
+        assert "api_communityactivity" not in listing and "GROUP BY" not in listing
+
+    def test_invalid_sort(self, auth_client, communities):
+        assert auth_client.get("/api/communities/?sort=hot").status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_indexes_exist(self):
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(cursor, Community._meta.db_table)
+        for name in ("community_trending_idx", "community_largest_idx", "community_newest_idx"):
+            assert name in constraints
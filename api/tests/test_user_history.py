@@ -0,0 +1,131 @@
+from datetime import timedelta
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework import status
+from api.models import Comment, CommentVote, Community, Post, PostVote, User
+
+
+@pytest.fixture
+def community(sample_user):
+    return Community.objects.create(creator=sample_user, name="History", description="desc")
+
+
+def make_posts(user, community, n):
+    start = timezone.now() - timedelta(days=1)
+    posts = Post.objects.bulk_create(
+        Post(user=user, community=community, title=f"P{i}", content="c", post_type="text") for i in range(n)
+    )
+    # Several share a timestamp, so pages must break ties on id.
+    for i, post in enumerate(posts):
+        Post.objects.filter(pk=post.pk).update(created_at=start + timedelta(minutes=i // 3))
+    return posts
+
+
+def walk(client, url):
+    ids = []
+    while url:
+        response = client.get(url)
+        assert response.status_code == status.HTTP_200_OK, response.data
+        ids += [item["id"] for item in response.data["results"]]
+        url = response.data["next"]
+    return ids
+
+
+@pytest.mark.django_db
+class TestUserPosts:
+    def test_pages_newest_first_without_gaps(self, auth_client, sample_user, community):
+        posts = make_posts(sample_user, community, 11)
+        other = User.objects.create(username="Other")
+        make_posts(other, community, 2)
+        Post.objects.filter(pk=posts[0].pk).update(deleted_at=timezone.now())
+
+        ids = walk(auth_client, f"/api/users/{sample_user.id}/posts/?page_size=4")
+        assert ids == [p.id for p in reversed(posts[1:])]
+
+    def test_viewer_state_is_batched(self, auth_client, sample_user, community):
+        def queries_for(n):
+            Post.objects.all().delete()
+            posts = make_posts(sample_user, community, n)
+            PostVote.objects.create(user=sample_user, post=posts[0], vote_value=1)
+            with CaptureQueriesContext(connection) as queries:
+                response = auth_client.get(f"/api/users/{sample_user.id}/posts/?page_size=50")
+            assert response.data["results"][-1]["user_vote"] == 1
+            return len(queries)
+
+        assert queries_for(3) == queries_for(30)
+
+    def test_unknown_user(self, auth_client):
+        assert auth_client.get("/api/users/9999/posts/").status_code == status.HTTP_404_NOT_FOUND
+
+    def test_query_uses_the_user_index(self, sample_user, community):
+        if connection.vendor != "sqlite":
+            pytest.skip("checks SQLite's plan")
+        plan = Post.objects.filter(user=sample_user).order_by("-created_at", "-id")[:25].explain()
+        assert "post_user_new_idx" in plan
+
+
+@pytest.mark.django_db
+class TestUserComments:
+    def test_lists_own_comments(self, auth_client, sample_user, community):
+        post = make_posts(sample_user, community, 1)[0]
+        other = User.objects.create(username="Other")
+        mine = [Comment.objects.create(user=sample_user, post=post, content=f"c{i}") for i in range(3)]
+        Comment.objects.create(user=other, post=post, content="theirs")
+        ids = walk(auth_client, f"/api/users/{sample_user.id}/comments/?page_size=2")
+        assert ids == [c.id for c in reversed(mine)]
+
+    def test_hides_comments_on_deleted_posts_and_communities(self, auth_client, sample_user, community):
+        live, gone = make_posts(sample_user, community, 2)
+        elsewhere = Community.objects.create(creator=sample_user, name="Gone", description="desc")
+        hidden = make_posts(sample_user, elsewhere, 1)[0]
+        kept = Comment.objects.create(user=sample_user, post=live, content="kept")
+        for post in (gone, hidden):
+            Comment.objects.create(user=sample_user, post=post, content="hidden")
+        Post.objects.filter(pk=gone.pk).update(deleted_at=timezone.now())
+        Community.objects.filter(pk=elsewhere.pk).update(deleted_at=timezone.now())
+
+        assert walk(auth_client, f"/api/users/{sample_user.id}/comments/") == [kept.id]
+
+
+@pytest.mark.django_db
+class TestUserVotes:
+    def test_post_votes_with_their_posts(self, auth_client, sample_user, community):
+        posts = make_posts(sample_user, community, 3)
+        for post, value in zip(posts, (1, -1, 1)):
+            PostVote.objects.create(user=sample_user, post=post, vote_value=value)
+        Post.objects.filter(pk=posts[2].pk).update(deleted_at=timezone.now())
+
+        response = auth_client.get(f"/api/users/{sample_user.id}/votes/")
+        results = response.data["results"]
+        assert [(r["type"], r["vote_value"]) for r in results] == [("post", 1), ("post", -1), ("post", 1)]
+        assert results[0]["post"] is None  # deleted since
+        assert (results[1]["post"]["id"], results[1]["post"]["user_vote"]) == (posts[1].id, -1)
+
+    def test_comment_votes(self, auth_client, sample_user, community):
+        post = make_posts(sample_user, community, 1)[0]
+        comment = Comment.objects.create(user=sample_user, post=post, content="c")
+        CommentVote.objects.create(user=sample_user, comment=comment, vote_value=1)
+        PostVote.objects.create(user=sample_user, post=post, vote_value=1)
+
+        results = auth_client.get(f"/api/users/{sample_user.id}/votes/?type=comment").data["results"]
+        assert [(r["type"], r["comment"]["id"]) for r in results] == [("comment", comment.id)]
+
+    def test_comment_votes_on_deleted_posts_render_as_null(self, auth_client, sample_user, community):
+        post = make_posts(sample_user, community, 1)[0]
+        comment = Comment.objects.create(user=sample_user, post=post, content="c")
+        CommentVote.objects.create(user=sample_user, comment=comment, vote_value=1)
+        Post.objects.filter(pk=post.pk).update(deleted_at=timezone.now())
+
+        results = auth_client.get(f"/api/users/{sample_user.id}/votes/?type=comment").data["results"]
+        assert [(r["type"], r["comment"]) for r in results] == [("comment", None)]
+
+    def test_votes_are_private(self, auth_client, sample_user):
+        other = User.objects.create(username="Other")
+        assert auth_client.get(f"/api/users/{other.id}/votes/").status_code == status.HTTP_403_FORBIDDEN
+
+    def test_unknown_type(self, auth_client, sample_user):
+        response = auth_client.get(f"/api/users/{sample_user.id}/votes/?type=user")
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
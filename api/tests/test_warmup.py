@@ -0,0 +1,42 @@
+import io
+import sys
+
+from django.core.management import call_command
+from django.urls import get_resolver
+from app import lazy_imports
+from app.warmup import warm_up
+
+
+def test_warm_up_populates_lazy_state():
+    warm_up(freeze=False)
+
+    assert get_resolver()._populated
+
+
+def test_deferred_import_runs_on_first_attribute_access(tmp_path, monkeypatch):
+    (tmp_path / 'deferred_probe.py').write_text("import sys\nsys.deferred_probe_loaded = True\nVALUE = 42\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    lazy_imports.register('deferred_probe')
+    try:
+        import deferred_probe
+
+        assert not hasattr(sys, 'deferred_probe_loaded')
+        assert deferred_probe.VALUE == 42
+        assert sys.deferred_probe_loaded
+    finally:
+        lazy_imports._registry.discard('deferred_probe')
+        sys.modules.pop('deferred_probe', None)
+        if hasattr(sys, 'deferred_probe_loaded'):
+            del sys.deferred_probe_loaded
+
+
+def test_startup_profile_reports_phases():
+    out = io.StringIO()
+
+    call_command('startup_profile', top=3, stdout=out)
+
+    output = out.getvalue()
+    assert 'django.setup()' in output
+    assert 'api.ready()' in output
+    assert 'URLconf loading' in output
+    assert 'Import cost by top-level package' in output
@@ -0,0 +1,114 @@
+"""
+Per-user (or per-IP) request throttling shared across workers.
+
+``SlidingWindowThrottle`` limits each client to the rate configured for the
+view's scope in ``THROTTLE_RATES`` (``{'vote': '30/min', ...}``). A view picks
+its scope with ``throttle_scope``, set on the class, passed to ``@action``
+for one action, or to ``as_view()``. Views without one use ``read`` for
+safe methods and ``write`` otherwise. A view whose requests stand for several
+actions (bulk votes) defines ``throttle_cost(request)`` to be charged that
+many.
+
+Counts live in the ``THROTTLE_CACHE`` cache, so every worker sees the same
+totals. Each key counts one fixed window; the sliding estimate weights the
+previous window's count by how much of it still overlaps the last
+``duration`` seconds. A finished window never changes, so its count is kept
+per worker and an allowed request costs one ``incr``; rejected requests are
+taken back out so retrying too early doesn't extend the wait.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.throttling import BaseThrottle
+
+from .caches import LocalCache
+
+DURATIONS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+# (scope, ident, window) -> that finished window's count, kept while it
+# still overlaps the sliding window
+finished_windows = LocalCache('throttle_windows', maxsize=settings.THROTTLE_WINDOW_CACHE_SIZE)
+
+
+def parse_rate(rate):
+    """``'30/min'`` -> ``(30, 60)``; no rate means unthrottled."""
+    if rate is None:
+        return None, None
+    num, period = rate.split('/')
+    return int(num), DURATIONS[period[0]]
+
+
+class SlidingWindowThrottle(BaseThrottle):
+    timer = time.time
+
+    def get_scope(self, request, view):
+        scope = getattr(view, 'throttle_scope', None)
+        if scope:
+            return scope
+        return 'read' if request.method in SAFE_METHODS else 'write'
+
+    def get_ident(self, request):
+        if request.user and request.user.is_authenticated:
+            return f'user:{request.user.pk}'
+        return f'ip:{super().get_ident(request)}'
+
+    def get_cost(self, request, view):
+        cost = getattr(view, 'throttle_cost', None)
+        return cost(request) if cost else 1
+
+    def _count(self, cache, key, timeout, cost):
+        try:
+            return cache.incr(key, cost)
+        except ValueError:
+            if cache.add(key, cost, timeout):
+                return cost
+            return cache.incr(key, cost)
+
+    def _previous(self, cache, scope, ident, window):
+        slot = (scope, ident, window)
+        count = finished_windows.get(slot)
+        if count is None:
+            count = cache.get(f'throttle:{scope}:{ident}:{window}', 0)
+            finished_windows.set(slot, count, ttl=self.duration)
+        return count
+
+    def allow_request(self, request, view):
+        scope = self.get_scope(request, view)
+        self.limit, self.duration = parse_rate(settings.THROTTLE_RATES.get(scope) or None)
+        if self.limit is None:
+            return True
+
+        cache = caches[settings.THROTTLE_CACHE]
+        ident = self.get_ident(request)
+        now = self.timer()
+        window, self.elapsed = divmod(now, self.duration)
+        window = int(window)
+        key = f'throttle:{scope}:{ident}:{window}'
+
+        self.cost = self.get_cost(request, view)
+        self.current = self._count(cache, key, self.duration * 2, self.cost)
+        self.previous = self._previous(cache, scope, ident, window - 1)
+        weight = (self.duration - self.elapsed) / self.duration
+        if self.previous * weight + self.current <= self.limit:
+            return True
+        cache.decr(key, self.cost)
+        self.current -= self.cost
+        return False
+
+    def wait(self):
+        """
+        Seconds until the same request fits, if no others arrive meanwhile;
+        None if it never will (it costs more than the whole limit).
+        """
+        if self.cost > self.limit:
+            return None
+        room = self.limit - self.current - self.cost
+        if room >= 0:
+            # It fits later in this window, once enough of the previous one
+            # has slid out (the previous count is non-zero, or we'd be in).
+            return self.duration * (1 - room / self.previous) - self.elapsed
+        remaining = self.duration - self.elapsed
+        # Next window, once enough of this one has slid out.
+        return remaining + self.duration * (1 - (self.limit - self.cost) / self.current)
@@ -0,0 +1,67 @@
+"""
+Trending communities.
+
+``compute()`` reads the last ``TRENDING_WINDOW_DAYS`` days of
+``CommunityActivity`` rollups and stores a velocity score in
+``Community.trending_score``: new subscribers, posts and comments, weighted
+by ``TRENDING_WEIGHTS`` and decayed with a half-life of
+``TRENDING_HALF_LIFE_DAYS`` so today counts most. ``?sort=trending`` on the
+community list is then a scan of the ``(-trending_score, -id)`` index.
+Run it from the ``trending`` job (e.g. ``JOB_SCHEDULE="trending=300"``).
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, FloatField, Sum, Value, When
+from django.utils import timezone
+
+from . import jobs
+from .models import Community, CommunityActivity
+
+UPDATE_BATCH_SIZE = 500
+
+
+def _decay(today):
+    """``day`` -> weight, 1.0 today, halving every half-life."""
+    return Case(
+        *[
+            When(day=today - timedelta(days=age), then=Value(0.5 ** (age / settings.TRENDING_HALF_LIFE_DAYS)))
+            for age in range(settings.TRENDING_WINDOW_DAYS)
+        ],
+        default=Value(0.0),
+        output_field=FloatField(),
+    )
+
+
+def scores(today=None):
+    """``{community_id: score}`` for communities with activity in the window."""
+    today = today or timezone.localdate()
+    weights = settings.TRENDING_WEIGHTS
+    activity = sum(
+        (F(field) * Value(float(weights.get(field, 0))) for field in ('subscribers', 'posts', 'comments')),
+        Value(0.0),
+    )
+    rows = (
+        CommunityActivity.objects
+        .filter(day__gt=today - timedelta(days=settings.TRENDING_WINDOW_DAYS), day__lte=today)
+        .values('community_id')
+        .annotate(score=Sum(activity * _decay(today), output_field=FloatField()))
+        .values_list('community_id', 'score')
+    )
+    return {community_id: max(score or 0.0, 0.0) for community_id, score in rows}
+
+
+def compute(today=None):
+    """Store fresh trending scores. Returns the number of communities scored."""
+    computed = scores(today)
+    communities = [Community(pk=pk, trending_score=score) for pk, score in sorted(computed.items())]
+    with transaction.atomic():
+        Community.objects.exclude(trending_score=0).update(trending_score=0)
+        Community.objects.bulk_update(communities, ['trending_score'], batch_size=UPDATE_BATCH_SIZE)
+    return len(communities)
+
+
+@jobs.handler('trending', atomic=False)
+def _compute_job(payloads):
+    compute()
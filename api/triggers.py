@@ -0,0 +1,130 @@
+"""
+Counter columns maintained by database triggers (optional, SQLite and MySQL).
+
+By default the views keep ``vote_count``, ``upvotes``, ``downvotes``,
+``comment_count`` and ``subscriber_count`` in step through ``api.counters``,
+an extra ``UPDATE`` after each write, and any path that writes the rows
+directly (bulk scripts, the admin, purges) skips them. With
+``COUNTER_TRIGGERS`` on, ``AFTER INSERT/UPDATE/DELETE`` triggers on the vote,
+comment and subscription tables apply the change inside the writing
+statement instead, comment sort keys included, and ``counters.adjust*``
+leave those columns alone.
+
+Triggers are installed by migration when the setting is on at ``migrate``
+time; ``manage.py counter_triggers install|drop|status`` switches an
+existing database. Turn the setting and the triggers on or off together.
+
+Comment and subscription rows never move between posts or communities, so
+only the vote tables get ``UPDATE`` triggers. The SQL names tables directly
+(no model imports) so the migration can use it.
+"""
+from django.conf import settings
+from django.db import NotSupportedError
+
+VENDORS = ('sqlite', 'mysql')
+
+# Model label -> columns the triggers maintain
+MAINTAINED = {
+    'api.Post': ('vote_count', 'upvotes', 'downvotes', 'comment_count'),
+    'api.Comment': ('vote_count', 'upvotes', 'downvotes'),
+    'api.Community': ('subscriber_count',),
+}
+
+VOTE_DELTAS = {
+    'vote_count': '{row}.vote_value',
+    'upvotes': '({row}.vote_value = 1)',
+    'downvotes': '({row}.vote_value = -1)',
+}
+
+
+def _scores():
+    """``best_score`` and ``controversy`` assignments: api.ranking's formulas in SQL."""
+    from .ranking import Z
+
+    n = '((upvotes + downvotes) * 1.0)'
+    p = f'(upvotes * 1.0 / {n})'
+    z2 = repr(Z * Z)
+    return (
+        f'best_score = CASE WHEN upvotes + downvotes = 0 THEN 0.0 ELSE '
+        f'({p} + {z2} / (2.0 * {n}) - {Z!r} * SQRT(({p} * (1.0 - {p}) + {z2} / (4.0 * {n})) / {n})) '
+        f'/ (1.0 + {z2} / {n}) END, '
+        f'controversy = CASE WHEN upvotes <= 0 OR downvotes <= 0 THEN 0.0 '
+        f'WHEN upvotes > downvotes THEN POWER(upvotes + downvotes, downvotes * 1.0 / upvotes) '
+        f'ELSE POWER(upvotes + downvotes, upvotes * 1.0 / downvotes) END'
+    )
+
+
+# (source table, target table, foreign key, {column: delta}, also refresh scores, UPDATE trigger)
+SOURCES = [
+    ('api_postvote', 'api_post', 'post_id', VOTE_DELTAS, False, True),
+    ('api_commentvote', 'api_comment', 'comment_id', VOTE_DELTAS, True, True),
+    ('api_comment', 'api_post', 'post_id', {'comment_count': '1'}, False, False),
+    ('api_subscription', 'api_community', 'community_id', {'subscriber_count': '1'}, False, False),
+]
+
+
+def enabled():
+    return settings.COUNTER_TRIGGERS
+
+
+def maintains(model, field):
+    """Whether triggers, not ``api.counters``, keep ``model.field`` up to date."""
+    return enabled() and field in MAINTAINED.get(model._meta.label, ())
+
+
+def _apply(target, fk, deltas, scores, row, sign):
+    changes = ', '.join(f'{column} = {column} {sign} {delta.format(row=row)}' for column, delta in deltas.items())
+    statements = [f'UPDATE {target} SET {changes} WHERE id = {row}.{fk};']
+    if scores:
+        statements.append(f'UPDATE {target} SET {_scores()} WHERE id = {row}.{fk};')
+    return statements
+
+
+def definitions():
+    """``[(trigger name, CREATE TRIGGER statement)]``; the same SQL suits both vendors."""
+    result = []
+    for source, target, fk, deltas, scores, on_update in SOURCES:
+        events = [('insert', 'INSERT', _apply(target, fk, deltas, scores, 'NEW', '+'))]
+        events.append(('delete', 'DELETE', _apply(target, fk, deltas, scores, 'OLD', '-')))
+        if on_update:
+            body = _apply(target, fk, deltas, scores, 'OLD', '-') + _apply(target, fk, deltas, scores, 'NEW', '+')
+            events.append(('update', 'UPDATE', body))
+        for suffix, event, body in events:
+            name = f'{source}_counters_{suffix}'
+            result.append((
+                name,
+                f"CREATE TRIGGER {name} AFTER {event} ON {source} FOR EACH ROW BEGIN {' '.join(body)} END",
+            ))
+    return result
+
+
+def _check_vendor(connection):
+    if connection.vendor not in VENDORS:
+        raise NotSupportedError(f"Counter triggers support {' and '.join(VENDORS)}, not {connection.vendor}.")
+
+
+def installed(connection):
+    """Names of the counter triggers present in ``connection``'s database."""
+    _check_vendor(connection)
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")
+        else:
+            cursor.execute("SELECT trigger_name FROM information_schema.triggers WHERE trigger_schema = DATABASE()")
+        present = {row[0] for row in cursor.fetchall()}
+    return [name for name, _ in definitions() if name in present]
+
+
+def drop(connection):
+    _check_vendor(connection)
+    with connection.cursor() as cursor:
+        for name, _ in definitions():
+            cursor.execute(f'DROP TRIGGER IF EXISTS {name}')
+
+
+def install(connection):
+    """(Re)create every counter trigger."""
+    drop(connection)
+    with connection.cursor() as cursor:
+        for _, sql in definitions():
+            cursor.execute(sql)
@@ -1,12 +1,22 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
+from .streams import community_stream, post_stream
 from .views import (
     UserList,
     UserDetail,
+    UserActivityView,
+    UserPostList,
+    UserCommentList,
+    UserVoteList,
     CommunityViewSet,
     PostViewSet,
     CommentList,
     CommentDetail,
+    CommentVoteView,
+    BulkVoteView,
+    InboxList,
+    InboxUnreadView,
+    InboxReadView,
     RegisterView,
 )
 
@@ -20,8 +30,19 @@ router.register(r'posts', PostViewSet, basename='post')
 urlpatterns = [
     path('users/', UserList.as_view(), name='user-list'),
     path('users/<int:pk>/', UserDetail.as_view(), name='user-detail'),
+    path('users/<int:pk>/activity/', UserActivityView.as_view(), name='user-activity'),
+    path('users/<int:pk>/posts/', UserPostList.as_view(), name='user-posts'),
+    path('users/<int:pk>/comments/', UserCommentList.as_view(), name='user-comments'),
+    path('users/<int:pk>/votes/', UserVoteList.as_view(), name='user-votes'),
     path('comments/', CommentList.as_view(), name='comment-list'),
     path('comments/<int:pk>/', CommentDetail.as_view(), name='comment-detail'),
+    path('comments/<int:pk>/vote/', CommentVoteView.as_view(), name='comment-vote'),
+    path('votes/bulk/', BulkVoteView.as_view(), name='vote-bulk'),
+    path('inbox/', InboxList.as_view(), name='inbox'),
+    path('inbox/unread/', InboxUnreadView.as_view(), name='inbox-unread'),
+    path('inbox/read/', InboxReadView.as_view(), name='inbox-read'),
+    path('posts/<int:pk>/stream/', post_stream, name='post-stream'),
+    path('communities/<int:pk>/stream/', community_stream, name='community-stream'),
     path("auth/register/", RegisterView.as_view(), name="auth_register"),
 
     path('', include(router.urls))
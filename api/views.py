@@ -1,37 +1,432 @@
-from rest_framework import generics, status, viewsets
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.http import Http404
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.db.models.functions import Substr
+from django.utils import timezone
+from rest_framework import generics, pagination, serializers, status, viewsets
+from rest_framework.exceptions import PermissionDenied, ValidationError
+from rest_framework.permissions import AllowAny, IsAuthenticated, SAFE_METHODS
 from rest_framework.response import Response
-from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework.decorators import action
-from django.db.models import F
-from .models import User, Community, Post, Comment, PostVote, Subscription
+from rest_framework_simplejwt.views import TokenObtainPairView
+from . import activity, archive, counters, inbox, live, post_views, purge, recommendations, snapshots, votes
+from .authentication import ClaimsRefreshToken, forget_deleted_user
+from .models import User, Community, CommunityActivity, UserActivity, Post, Comment, PostVote, CommentVote, Subscription, ArchivedPost, ArchivedComment, InboxItem
 from .serializers import (
     UserSerializer,
     CommunitySerializer,
     PostSerializer,
     CommentSerializer,
     RegistrationSerializer,
+    ArchivedPostSerializer,
+    ArchivedCommentSerializer,
+    BulkVoteSerializer,
+    InboxItemSerializer,
+    InboxReadSerializer,
 )
 
-class UserList(generics.ListCreateAPIView):
-    queryset = User.objects.all()
+MAX_EXCERPT_LENGTH = 1000
+
+def parse_sparse(request, serializer_class):
+    """
+    Validate ``?fields=``, ``?expand=`` and ``?excerpt=`` against
+    ``serializer_class``. Returns None when none of them were given.
+    """
+    params = request.query_params
+    if not any(name in params for name in ('fields', 'expand', 'excerpt')):
+        return None
+
+    full = serializer_class(context={'request': request}).fields
+    readable = {name for name, field in full.items() if not field.write_only}
+    expandable = {name for name in readable if isinstance(full[name], serializers.BaseSerializer)}
+
+    def names(param):
+        return {name.strip() for name in params.get(param, '').split(',') if name.strip()}
+
+    errors = {}
+    fields = names('fields') if 'fields' in params else None
+    if fields is not None and fields - readable:
+        errors['fields'] = [f"Unknown field(s): {', '.join(sorted(fields - readable))}"]
+    expand = names('expand')
+    if expand - expandable:
+        errors['expand'] = [f"Cannot expand: {', '.join(sorted(expand - expandable))}"]
+    excerpt = None
+    if 'excerpt' in params:
+        try:
+            excerpt = int(params['excerpt'])
+        except ValueError:
+            excerpt = 0
+        if not 0 < excerpt <= MAX_EXCERPT_LENGTH:
+            errors['excerpt'] = [f"Must be an integer between 1 and {MAX_EXCERPT_LENGTH}."]
+    if errors:
+        raise ValidationError(errors)
+    return {'fields': fields, 'expand': expand, 'excerpt': excerpt}
+
+
+def _concrete(model, name):
+    try:
+        field = model._meta.get_field(name)
+    except FieldDoesNotExist:
+        return False
+    return field.concrete and not field.many_to_many
+
+
+def sparse_queryset(queryset, serializer):
+    """Load only the columns (and joins) a narrowed serializer will render."""
+    model = queryset.model
+    columns = {'id'}
+    related = []
+    for field in serializer.fields.values():
+        if field.write_only:
+            continue
+        if isinstance(field, serializers.BaseSerializer):
+            related.append(field.source)
+            columns.add(field.source)
+            nested_model = field.Meta.model
+            columns.update(
+                f'{field.source}__{sub.source}' for sub in field.fields.values()
+                if not sub.write_only and _concrete(nested_model, sub.source)
+            )
+        elif _concrete(model, field.source):
+            columns.add(field.source)
+
+    excerpt = serializer.context['sparse']['excerpt']
+    if excerpt:
+        queryset = queryset.annotate(content_excerpt=Substr('content', 1, excerpt))
+    queryset = queryset.select_related(None)
+    if related:
+        queryset = queryset.select_related(*related)
+    return queryset.only(*columns)
+
+
+def limit_param(request, default=10, maximum=50):
+    """``?limit=`` as an int in ``1..maximum``."""
+    try:
+        limit = int(request.query_params.get('limit', default))
+    except ValueError:
+        raise ValidationError({'limit': ["Must be an integer."]})
+    if not 1 <= limit <= maximum:
+        raise ValidationError({'limit': [f"Must be between 1 and {maximum}."]})
+    return limit
+
+
+def activity_series(request, queryset):
+    """
+    Rollup buckets for ``?since=``/``?until=`` (ISO dates, default the last
+    30 days) and ``?bucket=day|week|month``.
+    """
+    params = request.query_params
+    errors = {}
+    today = timezone.localdate()
+    dates = {}
+    for name, default in (('since', today - timedelta(days=29)), ('until', today)):
+        try:
+            dates[name] = date.fromisoformat(params[name]) if name in params else default
+        except ValueError:
+            errors[name] = ["Use YYYY-MM-DD."]
+    bucket = params.get('bucket', 'day')
+    if bucket not in activity.BUCKETS:
+        errors['bucket'] = [f"Choose one of: {', '.join(activity.BUCKETS)}."]
+    if not errors:
+        span = (dates['until'] - dates['since']).days
+        if span < 0:
+            errors['until'] = ["Must not be before since."]
+        elif span >= settings.ACTIVITY_MAX_DAYS:
+            errors['since'] = [f"At most {settings.ACTIVITY_MAX_DAYS} days per request."]
+    if errors:
+        raise ValidationError(errors)
+    return activity.series(queryset, dates['since'], dates['until'], bucket)
+
+
+COMMUNITY_SORTS = {
+    'trending': ('-trending_score', '-id'),
+    'largest': ('-subscriber_count', '-id'),
+    'newest': ('-created_at', '-id'),
+}
+
+COMMENT_SORTS = {
+    'best': ('-best_score', '-id'),
+    'controversial': ('-controversy', '-id'),
+    'top': ('-vote_count', '-id'),
+    'new': ('-created_at', '-id'),
+}
+
+
+def comment_ordering(request):
+    """Ordering for ``?sort=``; oldest first when it is not given."""
+    sort = request.query_params.get('sort')
+    if sort is None:
+        return ('created_at',)
+    if sort not in COMMENT_SORTS:
+        raise ValidationError({'sort': [f"Choose one of: {', '.join(COMMENT_SORTS)}."]})
+    return COMMENT_SORTS[sort]
+
+
+def cast_vote(request, target):
+    """
+    Handle POST (vote/toggle/switch) and DELETE of the requesting user's vote
+    on ``target`` (a post or comment), updating its vote totals.
+    """
+    existing_vote = target.votes.filter(user=request.user).first()
+    old_value = existing_vote.vote_value if existing_vote else None
+
+    if request.method == 'POST':
+        vote_value = request.data.get('vote_value')
+        if vote_value not in [1, -1]:
+            return Response(
+                {'error': 'vote_value must be 1 or -1'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if existing_vote:
+            if existing_vote.vote_value == vote_value:
+                # Toggle off - remove vote
+                existing_vote.delete()
+                user_vote = None
+                message = 'Vote removed'
+            else:
+                # Switch vote
+                existing_vote.vote_value = vote_value
+                existing_vote.save()
+                user_vote = vote_value
+                message = 'Vote updated'
+            response_status = status.HTTP_200_OK
+        else:
+            # New vote
+            target.votes.create(user=request.user, vote_value=vote_value)
+            user_vote = vote_value
+            message = 'Vote created'
+            response_status = status.HTTP_201_CREATED
+
+    else:  # DELETE
+        if not existing_vote:
+            return Response(
+                {'error': 'No vote to remove'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        existing_vote.delete()
+        user_vote = None
+        message = 'Vote removed'
+        response_status = status.HTTP_200_OK
+
+    totals = counters.adjust_many(target, {
+        'vote_count': (user_vote or 0) - (old_value or 0),
+        'upvotes': (user_vote == 1) - (old_value == 1),
+        'downvotes': (user_vote == -1) - (old_value == -1),
+    }, refresh=True)
+    return Response({
+        'message': message,
+        'vote_count': totals['vote_count'],
+        'upvotes': totals['upvotes'],
+        'downvotes': totals['downvotes'],
+        'user_vote': user_vote
+    }, status=response_status)
+
+
+class SparseFieldsetMixin:
+    """
+    Adds ``?fields=``, ``?expand=`` and ``?excerpt=`` to a view's read
+    responses and narrows its queryset to match.
+    """
+    sparse_actions = None
+
+    def get_sparse(self):
+        if not hasattr(self, '_sparse'):
+            request = self.request
+            applies = (
+                request is not None
+                and request.method in SAFE_METHODS
+                and (self.sparse_actions is None or getattr(self, 'action', None) in self.sparse_actions)
+            )
+            self._sparse = parse_sparse(request, self.get_serializer_class()) if applies else None
+        return self._sparse
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['sparse'] = self.get_sparse()
+        return context
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.get_sparse():
+            queryset = sparse_queryset(queryset, self.get_serializer())
+        return queryset
+
+
+def ids_param(request):
+    """``?ids=3,1,2`` as a list of distinct ints, in the order given."""
+    try:
+        ids = [int(part) for part in request.query_params['ids'].split(',') if part.strip()]
+    except ValueError:
+        raise ValidationError({'ids': ["Must be a comma-separated list of integers."]})
+    ids = list(dict.fromkeys(ids))
+    if not ids:
+        raise ValidationError({'ids': ["Give at least one id."]})
+    if len(ids) > settings.MULTI_GET_MAX_IDS:
+        raise ValidationError({'ids': [f"At most {settings.MULTI_GET_MAX_IDS} ids per request."]})
+    return ids
+
+
+class MultiGetMixin:
+    """
+    ``?ids=`` on a list view: those objects, in the order requested, from
+    one ``IN`` query, plus the ids that were not found.
+    """
+
+    def get_missing(self, ids):
+        """Serialized fallbacks for ids the queryset doesn't have: ``{id: data}``."""
+        return {}
+
+    def list(self, request, *args, **kwargs):
+        if 'ids' not in request.query_params:
+            return super().list(request, *args, **kwargs)
+        ids = ids_param(request)
+        found = self.filter_queryset(self.get_queryset()).in_bulk(ids)
+        data = dict(zip(
+            [pk for pk in ids if pk in found],
+            self.get_serializer([found[pk] for pk in ids if pk in found], many=True).data,
+        ))
+        missing = [pk for pk in ids if pk not in found]
+        if missing:
+            data.update(self.get_missing(missing))
+        return Response({
+            'results': [data[pk] for pk in ids if pk in data],
+            'missing': [pk for pk in ids if pk not in data],
+        })
+
+
+class NewestFirstPagination(pagination.CursorPagination):
+    """
+    Keyset cursors over ``(created_at, id)``: each page seeks in a
+    ``(owner, -created_at, -id)`` index, so page 1000 costs what page 1 does.
+    """
+    page_size = settings.HISTORY_PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = ('-created_at', '-id')
+
+
+class UserList(MultiGetMixin, generics.ListCreateAPIView):
+    queryset = User.objects.filter(deleted_at__isnull=True)
     serializer_class = UserSerializer
     permission_classes = [IsAuthenticated]
 
 class UserDetail(generics.RetrieveUpdateDestroyAPIView):
-    queryset = User.objects.all()
+    queryset = User.objects.filter(deleted_at__isnull=True)
     serializer_class = UserSerializer
     permission_classes = [IsAuthenticated]
 
+    def perform_destroy(self, instance):
+        User.objects.filter(pk=instance.pk).update(is_active=False)
+        purge.mark_deleted(instance)
+        forget_deleted_user(instance.pk)
+
+class UserActivityView(generics.GenericAPIView):
+    queryset = User.objects.filter(deleted_at__isnull=True)
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        user = self.get_object()
+        return Response(activity_series(request, UserActivity.objects.filter(user=user)))
+
+class UserHistoryMixin:
+    """A list of one user's rows, newest first (``users/<pk>/...``)."""
+    permission_classes = [IsAuthenticated]
+    pagination_class = NewestFirstPagination
+
+    def get_user_id(self):
+        pk = self.kwargs['pk']
+        if not User.objects.filter(pk=pk, deleted_at__isnull=True).exists():
+            raise Http404
+        return pk
+
+class UserPostList(UserHistoryMixin, generics.ListAPIView):
+    serializer_class = PostSerializer
+
+    def get_queryset(self):
+        posts = Post.objects.filter(
+            user=self.get_user_id(), deleted_at__isnull=True, community__deleted_at__isnull=True,
+        ).select_related('user', 'community')
+        return counters.annotate_pending(posts)
+
+class UserCommentList(UserHistoryMixin, generics.ListAPIView):
+    serializer_class = CommentSerializer
+
+    def get_queryset(self):
+        return Comment.objects.filter(
+            user=self.get_user_id(), deleted_at__isnull=True,
+            post__deleted_at__isnull=True, post__community__deleted_at__isnull=True,
+        ).select_related('user')
+
+# ?type= -> (vote model, target field, live targets, target serializer)
+VOTE_HISTORY = {
+    'post': (
+        PostVote, 'post',
+        Post.objects.filter(deleted_at__isnull=True, community__deleted_at__isnull=True).select_related('user', 'community'),
+        PostSerializer,
+    ),
+    'comment': (
+        CommentVote, 'comment',
+        Comment.objects.filter(
+            deleted_at__isnull=True, post__deleted_at__isnull=True, post__community__deleted_at__isnull=True,
+        ).select_related('user'),
+        CommentSerializer,
+    ),
+}
+
+class UserVoteList(UserHistoryMixin, generics.ListAPIView):
+    """
+    The requesting user's own votes (``?type=post`` or ``comment``), each
+    with the voted object. Targets render in one batch, like a feed page.
+    """
+
+    def get_vote_type(self):
+        kind = self.request.query_params.get('type', 'post')
+        if kind not in VOTE_HISTORY:
+            raise ValidationError({'type': [f"Must be one of: {', '.join(VOTE_HISTORY)}."]})
+        return kind
+
+    def get_queryset(self):
+        vote_model = VOTE_HISTORY[self.get_vote_type()][0]
+        return vote_model.objects.filter(user=self.request.user)
+
+    def list(self, request, *args, **kwargs):
+        if self.kwargs['pk'] != request.user.pk:
+            raise PermissionDenied("Votes are private.")
+        kind = self.get_vote_type()
+        _, field, targets, serializer_class = VOTE_HISTORY[kind]
+        page = self.paginate_queryset(self.get_queryset())
+        found = counters.annotate_pending(targets).in_bulk([getattr(vote, f'{field}_id') for vote in page])
+        rendered = serializer_class(list(found.values()), many=True, context=self.get_serializer_context()).data
+        rendered = dict(zip(found, rendered))
+        return self.get_paginated_response([
+            {
+                'id': vote.pk,
+                'type': kind,
+                'vote_value': vote.vote_value,
+                'created_at': vote.created_at,
+                field: rendered.get(getattr(vote, f'{field}_id')),
+            }
+            for vote in page
+        ])
+
+class LoginView(TokenObtainPairView):
+    throttle_scope = 'login'
+
 class RegisterView(generics.CreateAPIView):
     permission_classes = [AllowAny]
+    throttle_scope = 'register'
     serializer_class = RegistrationSerializer
 
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         user = serializer.save()
-        refresh = RefreshToken.for_user(user)
+        refresh = ClaimsRefreshToken.for_user(user)
         data = {
             "user": UserSerializer(user).data,
             "refresh": str(refresh),
@@ -40,11 +435,77 @@ class RegisterView(generics.CreateAPIView):
         headers = self.get_success_headers(serializer.data)
         return Response(data, status=status.HTTP_201_CREATED, headers=headers)
 
-class CommunityViewSet(viewsets.ModelViewSet):
-    queryset = Community.objects.all()
+class CommunityViewSet(MultiGetMixin, viewsets.ModelViewSet):
+    queryset = Community.objects.filter(deleted_at__isnull=True)
     serializer_class = CommunitySerializer
     permission_classes = [IsAuthenticated]
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == 'list' and 'sort' in self.request.query_params:
+            sort = self.request.query_params['sort']
+            if sort not in COMMUNITY_SORTS:
+                raise ValidationError({'sort': [f"Choose one of: {', '.join(COMMUNITY_SORTS)}."]})
+            queryset = queryset.order_by(*COMMUNITY_SORTS[sort])
+        return counters.annotate_pending(queryset)
+
+    def _save(self, serializer):
+        # validate_name can't see a concurrent create or rename; the unique name_key index can.
+        try:
+            with transaction.atomic():
+                serializer.save()
+        except IntegrityError:
+            name = serializer.validated_data.get('name')
+            if name is None or not Community.objects.filter(name_key=Community.normalize_name(name)).exists():
+                raise
+            raise ValidationError({'name': ["A community with this name already exists."]})
+
+    def perform_create(self, serializer):
+        self._save(serializer)
+
+    def perform_update(self, serializer):
+        self._save(serializer)
+
+    def perform_destroy(self, instance):
+        purge.mark_deleted(instance)
+
+    @action(detail=False, url_path=r'by-name/(?P<name>[^/]+)')
+    def by_name(self, request, name=None):
+        community = self.get_queryset().filter(name_key=Community.normalize_name(name)).first()
+        if community is None:
+            raise Http404
+        self.check_object_permissions(request, community)
+        return Response(self.get_serializer(community).data)
+
+    @action(detail=True, methods=['get'])
+    def posts(self, request, pk=None):
+        sort = request.query_params.get('sort', 'new')
+        if sort not in snapshots.SORTS:
+            raise ValidationError({'sort': [f"Choose one of: {', '.join(snapshots.SORTS)}."]})
+        community = self.get_object()
+        posts = snapshots.get(community.pk, sort)
+        return Response(snapshots.personalize(posts, request.user, community.pk))
+
+    def scored(self, communities):
+        data = self.get_serializer(communities, many=True).data
+        for item, community in zip(data, communities):
+            item['score'] = community.score
+        return Response(data)
+
+    @action(detail=True, methods=['get'])
+    def similar(self, request, pk=None):
+        community = self.get_object()
+        return self.scored(recommendations.similar(community.pk, limit_param(request)))
+
+    @action(detail=False, methods=['get'])
+    def recommended(self, request):
+        return self.scored(recommendations.recommended(request.user, limit_param(request)))
+
+    @action(detail=True, methods=['get'], url_path='activity')
+    def daily_activity(self, request, pk=None):
+        community = self.get_object()
+        return Response(activity_series(request, CommunityActivity.objects.filter(community=community)))
+
     @action(detail=True, methods=['post'])
     def subscribe(self, request, pk=None):
         community = self.get_object()
@@ -54,13 +515,11 @@ class CommunityViewSet(viewsets.ModelViewSet):
         )
         
         if created:
-            # Update subscriber count
-            community.subscriber_count = F('subscriber_count') + 1
-            community.save(update_fields=['subscriber_count'])
-            community.refresh_from_db()
+            subscriber_count = counters.adjust(community, 'subscriber_count', 1, refresh=True)
+            activity.record(community=community.pk, subscribers=1)
             return Response({
                 'message': 'Subscribed',
-                'subscriber_count': community.subscriber_count,
+                'subscriber_count': subscriber_count,
                 'is_subscribed': True
             }, status=status.HTTP_201_CREATED)
         else:
@@ -84,113 +543,209 @@ class CommunityViewSet(viewsets.ModelViewSet):
             }, status=status.HTTP_404_NOT_FOUND)
         
         subscription.delete()
-        community.subscriber_count = F('subscriber_count') - 1
-        community.save(update_fields=['subscriber_count'])
-        community.refresh_from_db()
+        subscriber_count = counters.adjust(community, 'subscriber_count', -1, refresh=True)
+        activity.record(community=community.pk, subscribers=-1)
         
         return Response({
             'message': 'Unsubscribed',
-            'subscriber_count': community.subscriber_count,
+            'subscriber_count': subscriber_count,
             'is_subscribed': False
         })
 
-class PostViewSet(viewsets.ModelViewSet):
-    queryset = Post.objects.all()
+class PostViewSet(MultiGetMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
+    queryset = Post.objects.filter(deleted_at__isnull=True, community__deleted_at__isnull=True).select_related('user', 'community')
     serializer_class = PostSerializer
     permission_classes = [IsAuthenticated]
+    sparse_actions = ('list', 'retrieve')
+    # Actions set their own throttle scope (see api/throttling.py)
+    throttle_scope = None
+
+    def get_queryset(self):
+        return counters.annotate_pending(super().get_queryset())
+
+    def perform_create(self, serializer):
+        post = serializer.save()
+        snapshots.touch(post.community_id)
+        activity.record(community=post.community_id, user=post.user_id, posts=1)
+
+    def perform_update(self, serializer):
+        post = serializer.save()
+        snapshots.touch(post.community_id)
+
+    def perform_destroy(self, instance):
+        purge.mark_deleted(instance)
+        snapshots.touch(instance.community_id)
+
+    def get_object(self):
+        try:
+            return super().get_object()
+        except Http404:
+            # Read through to the archive; archived threads are read-only.
+            return archive.find(ArchivedPost.objects.select_related('user', 'community'), self.kwargs['pk'], self.request.method not in SAFE_METHODS)
+
+    def get_missing(self, ids):
+        # Archived posts are still readable by id, as in retrieve().
+        archived = ArchivedPost.objects.filter(pk__in=ids).select_related('user', 'community')
+        serializer = ArchivedPostSerializer(archived, many=True, context=self.get_serializer_context())
+        return {item['id']: item for item in serializer.data}
 
-    @action(detail=True, methods=['post', 'delete'])
+    def retrieve(self, request, *args, **kwargs):
+        post = self.get_object()
+        if isinstance(post, ArchivedPost):
+            return Response(ArchivedPostSerializer(post, context=self.get_serializer_context()).data)
+        post_views.record(post.pk, post_views.viewer_key(request))
+        return Response(self.get_serializer(post).data)
+
+    @action(detail=True, methods=['post', 'delete'], throttle_scope='vote')
     def vote(self, request, pk=None):
         post = self.get_object()
-        existing_vote = PostVote.objects.filter(user=request.user, post=post).first()
-        
-        if request.method == 'POST':
-            vote_value = request.data.get('vote_value')
-            if vote_value not in [1, -1]:
-                return Response(
-                    {'error': 'vote_value must be 1 or -1'},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            
-            if existing_vote:
-                if existing_vote.vote_value == vote_value:
-                    # Toggle off - remove vote
-                    delta = -existing_vote.vote_value
-                    existing_vote.delete()
-                    user_vote = None
-                    message = 'Vote removed'
-                    response_status = status.HTTP_200_OK
-                else:
-                    # Switch vote
-                    delta = vote_value - existing_vote.vote_value
-                    existing_vote.vote_value = vote_value
-                    existing_vote.save()
-                    user_vote = vote_value
-                    message = 'Vote updated'
-                    response_status = status.HTTP_200_OK
-            else:
-                # New vote
-                PostVote.objects.create(user=request.user, post=post, vote_value=vote_value)
-                delta = vote_value
-                user_vote = vote_value
-                message = 'Vote created'
-                response_status = status.HTTP_201_CREATED
-            
-            post.vote_count = F('vote_count') + delta
-            post.save(update_fields=['vote_count'])
-            post.refresh_from_db()
-            
-            return Response({
-                'message': message,
-                'vote_count': post.vote_count,
-                'user_vote': user_vote
-            }, status=response_status)
-            
-        else:  # DELETE
-            if not existing_vote:
-                return Response(
-                    {'error': 'No vote to remove'},
-                    status=status.HTTP_404_NOT_FOUND
-                )
-            
-            post.vote_count = F('vote_count') - existing_vote.vote_value
-            existing_vote.delete()
-            post.save(update_fields=['vote_count'])
-            post.refresh_from_db()
-            
-            return Response({
-                'message': 'Vote removed',
-                'vote_count': post.vote_count,
-                'user_vote': None
-            })
+        response = cast_vote(request, post)
+        if response.status_code < 400:
+            snapshots.touch(post.community_id)
+            totals = {name: response.data[name] for name in ('vote_count', 'upvotes', 'downvotes')}
+            event = {'post': post.pk, **totals}
+            live.publish(live.post_channel(post.pk), 'vote', event, key=str(post.pk))
+            live.publish(live.community_channel(post.community_id), 'vote', event, key=str(post.pk))
+            if response.status_code == status.HTTP_201_CREATED:
+                activity.record(community=post.community_id, user=request.user.pk, votes=1)
+        return response
     
     @action(detail=True, methods=['get'])
     def comments(self, request, pk=None):
         post = self.get_object()
-        comments = Comment.objects.filter(post=post).order_by('created_at')
-        serializer = CommentSerializer(comments, many=True, context={'request': request})
+        ordering = comment_ordering(request)
+        if isinstance(post, ArchivedPost):
+            comments = post.comments.select_related('user').order_by(*ordering)
+            return Response(ArchivedCommentSerializer(comments, many=True, context={'request': request}).data)
+        context = {'request': request, 'sparse': parse_sparse(request, CommentSerializer)}
+        comments = Comment.objects.filter(post=post).select_related('user').order_by(*ordering)
+        if context['sparse']:
+            comments = sparse_queryset(comments, CommentSerializer(context=context))
+        serializer = CommentSerializer(comments, many=True, context=context)
         return Response(serializer.data)
 
-class CommentList(generics.ListCreateAPIView):
-    queryset = Comment.objects.all()
+# Comments whose post and community aren't marked deleted (they wait there for the purge job)
+LIVE_COMMENTS = Comment.objects.filter(post__deleted_at__isnull=True, post__community__deleted_at__isnull=True)
+
+
+class CommentList(SparseFieldsetMixin, generics.ListCreateAPIView):
+    queryset = LIVE_COMMENTS.select_related('user')
     serializer_class = CommentSerializer
     permission_classes = [IsAuthenticated]
 
     def perform_create(self, serializer):
         comment = serializer.save()
-        # Update post comment count
-        post = comment.post
-        post.comment_count = F('comment_count') + 1
-        post.save(update_fields=['comment_count'])
+        counters.adjust(comment.post, 'comment_count', 1)
+        live.publish(live.post_channel(comment.post_id), 'comment', serializer.data)
+        live.publish(live.community_channel(comment.post.community_id), 'comment', serializer.data)
+        activity.record(community=comment.post.community_id, user=comment.user_id, comments=1)
+        inbox.notify_reply(comment)
 
 class CommentDetail(generics.RetrieveUpdateDestroyAPIView):
-    queryset = Comment.objects.all()
+    queryset = LIVE_COMMENTS
     serializer_class = CommentSerializer
     permission_classes = [IsAuthenticated]
 
+    def get_object(self):
+        try:
+            return super().get_object()
+        except Http404:
+            return archive.find(ArchivedComment.objects.select_related('user'), self.kwargs['pk'], self.request.method not in SAFE_METHODS)
+
+    def retrieve(self, request, *args, **kwargs):
+        comment = self.get_object()
+        if isinstance(comment, ArchivedComment):
+            return Response(ArchivedCommentSerializer(comment, context=self.get_serializer_context()).data)
+        return Response(self.get_serializer(comment).data)
+
     def perform_destroy(self, instance):
-        post = instance.post
+        # Post.objects, not instance.post: the relation would load viewers_hll too.
+        post = Post.objects.get(pk=instance.post_id)
         instance.delete()
-        # Update post comment count
-        post.comment_count = F('comment_count') - 1
-        post.save(update_fields=['comment_count'])
\ No newline at end of file
+        counters.adjust(post, 'comment_count', -1)
+
+
+class CommentVoteView(generics.GenericAPIView):
+    # The community comes with the comment, so comment.post (and its viewers_hll) is never loaded.
+    queryset = LIVE_COMMENTS.annotate(community_id=F('post__community_id'))
+    permission_classes = [IsAuthenticated]
+    throttle_scope = 'vote'
+
+    def get_object(self):
+        try:
+            return super().get_object()
+        except Http404:
+            return archive.find(ArchivedComment.objects.all(), self.kwargs['pk'], writing=True)
+
+    def vote(self, request):
+        comment = self.get_object()
+        response = cast_vote(request, comment)
+        if response.status_code < 400:
+            totals = {name: response.data[name] for name in ('vote_count', 'upvotes', 'downvotes')}
+            live.publish(
+                live.post_channel(comment.post_id), 'comment_vote',
+                {'comment': comment.pk, 'post': comment.post_id, **totals}, key=str(comment.pk),
+            )
+            if response.status_code == status.HTTP_201_CREATED:
+                activity.record(community=comment.community_id, user=request.user.pk, votes=1)
+        return response
+
+    def post(self, request, *args, **kwargs):
+        return self.vote(request)
+
+    def delete(self, request, *args, **kwargs):
+        return self.vote(request)
+
+
+class BulkVoteView(generics.GenericAPIView):
+    """Replay a batch of queued votes: ``{"votes": [{type, id, vote_value}, ...]}``."""
+    serializer_class = BulkVoteSerializer
+    permission_classes = [IsAuthenticated]
+    throttle_scope = 'vote'
+
+    def throttle_cost(self, request):
+        # Each vote in the batch counts against the vote rate; batches that
+        # fail validation anyway cost one request.
+        batch = request.data.get('votes') if isinstance(request.data, dict) else None
+        if isinstance(batch, list) and 0 < len(batch) <= settings.BULK_VOTE_MAX_ITEMS:
+            return len(batch)
+        return 1
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        results = votes.apply_bulk(request.user, serializer.validated_data['votes'])
+        return Response({'results': results})
+
+
+class InboxPagination(NewestFirstPagination):
+    page_size = settings.INBOX_PAGE_SIZE
+
+
+class InboxList(generics.ListAPIView):
+    """The requesting user's reply notifications, newest first."""
+    serializer_class = InboxItemSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = InboxPagination
+
+    def get_queryset(self):
+        return InboxItem.objects.filter(recipient=self.request.user).select_related('actor')
+
+
+class InboxUnreadView(generics.GenericAPIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        return Response({'unread': inbox.unread(request.user)})
+
+
+class InboxReadView(generics.GenericAPIView):
+    """Mark ``{"ids": [...]}``, or everything when ``ids`` is omitted, as read."""
+    serializer_class = InboxReadSerializer
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        marked, unread = inbox.mark_read(request.user, serializer.validated_data.get('ids'))
+        return Response({'marked': marked, 'unread': unread})
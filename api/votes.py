@@ -0,0 +1,160 @@
+"""
+Bulk vote replay for clients that queue votes offline.
+
+``apply_bulk()`` takes a list of ``{type, id, vote_value}`` items, where
+``vote_value`` is the vote the user wants to end up with (1, -1, or 0 for
+none), and applies them in one transaction with a fixed number of queries
+per target type, whatever the batch size:
+
+- one read of the targets and one of the user's existing votes,
+- one ``INSERT ... ON CONFLICT DO UPDATE`` (``ON DUPLICATE KEY UPDATE`` on
+  MySQL) for new and changed votes and one ``DELETE`` for removed ones,
+- one ``UPDATE ... CASE`` for the vote totals of every affected object
+  (``counters.adjust_bulk``), then one read of the new totals.
+
+When the same target appears more than once, the last item wins.
+"""
+from django.conf import settings
+from django.db import connection, transaction
+
+from . import activity, counters, live, snapshots
+from .models import ArchivedComment, ArchivedPost, Comment, CommentVote, Post, PostVote
+
+# kind -> (live targets, vote model, vote FK, {result key: lookup}, archive model)
+TARGETS = {
+    'post': (
+        Post.objects.filter(deleted_at__isnull=True, community__deleted_at__isnull=True),
+        PostVote, 'post', {'community': 'community_id'}, ArchivedPost,
+    ),
+    'comment': (
+        Comment.objects.filter(post__deleted_at__isnull=True, post__community__deleted_at__isnull=True),
+        CommentVote, 'comment',
+        {'community': 'post__community_id', 'post': 'post_id'}, ArchivedComment,
+    ),
+}
+
+TOTALS = ('vote_count', 'upvotes', 'downvotes')
+
+
+def _status(old, new):
+    if old == new:
+        return 'unchanged'
+    if old is None:
+        return 'created'
+    return 'removed' if new is None else 'updated'
+
+
+def _apply_kind(user, kind, wanted):
+    """Apply ``{target_id: vote or None}`` for one target type. Returns per-target results."""
+    queryset, vote_model, owner, parents, archived_model = TARGETS[kind]
+    results = {}
+    targets = {
+        row['pk']: {**row, **{key: row[lookup] for key, lookup in parents.items()}}
+        for row in queryset.filter(pk__in=wanted).values('pk', *TOTALS, *parents.values())
+    }
+    missing = set(wanted) - set(targets)
+    if missing:
+        archived = set(archived_model.objects.filter(pk__in=missing).values_list('pk', flat=True))
+        for pk in missing:
+            results[pk] = {'status': 'error', 'error': 'archived' if pk in archived else 'not_found'}
+
+    existing = dict(
+        vote_model.objects.filter(user=user, **{f'{owner}__in': list(targets)})
+        .values_list(f'{owner}_id', 'vote_value')
+    )
+    upserts, removals, deltas = [], [], {}
+    for pk in targets:
+        old, new = existing.get(pk), wanted[pk]
+        if old == new:
+            continue
+        if new is None:
+            removals.append(pk)
+        else:
+            upserts.append(vote_model(user=user, vote_value=new, **{f'{owner}_id': pk}))
+        deltas[pk] = {
+            'vote_count': (new or 0) - (old or 0),
+            'upvotes': (new == 1) - (old == 1),
+            'downvotes': (new == -1) - (old == -1),
+        }
+    if upserts:
+        # MySQL's ON DUPLICATE KEY UPDATE takes no conflict target, and Django refuses one there.
+        target = {}
+        if connection.features.supports_update_conflicts_with_target:
+            target['unique_fields'] = ['user', owner]
+        vote_model.objects.bulk_create(upserts, update_conflicts=True, update_fields=['vote_value'], **target)
+    if removals:
+        vote_model.objects.filter(user=user, **{f'{owner}__in': removals}).delete()
+    counters.adjust_bulk(queryset.model, deltas)
+
+    totals = {}
+    if deltas and not settings.JOB_QUEUE_ENABLED:
+        totals = {
+            pk: dict(zip(TOTALS, values))
+            for pk, *values in queryset.model.objects.filter(pk__in=list(deltas)).values_list('pk', *TOTALS)
+        }
+    for pk, target in targets.items():
+        current = totals.get(pk) or {
+            field: target[field] + deltas.get(pk, {}).get(field, 0) for field in TOTALS
+        }
+        results[pk] = {
+            'status': _status(existing.get(pk), wanted[pk]),
+            'user_vote': wanted[pk],
+            **current,
+            **{key: target[key] for key in parents},
+        }
+    return results
+
+
+def _announce(kind, results):
+    """Refresh snapshots and publish live events for the targets that changed."""
+    changed = {pk: r for pk, r in results.items() if r['status'] not in ('error', 'unchanged')}
+    if kind == 'post':
+        for community_id in sorted({r['community'] for r in changed.values()}):
+            snapshots.touch(community_id)
+    for pk, result in changed.items():
+        totals = {field: result[field] for field in TOTALS}
+        if kind == 'post':
+            event = {'post': pk, **totals}
+            live.publish(live.post_channel(pk), 'vote', event, key=str(pk))
+            live.publish(live.community_channel(result['community']), 'vote', event, key=str(pk))
+        else:
+            live.publish(live.post_channel(result['post']), 'comment_vote', {'comment': pk, **totals}, key=str(pk))
+
+
+@transaction.atomic
+def apply_bulk(user, items):
+    """
+    Apply validated ``items`` for ``user`` and return one result per item,
+    in order: ``status`` is created, updated, removed, unchanged, superseded
+    (a later item targets the same object) or error.
+    """
+    latest = {}
+    for index, item in enumerate(items):
+        latest[item['type'], item['id']] = index
+
+    by_kind = {}
+    for kind in TARGETS:
+        wanted = {
+            target_id: items[index]['vote_value'] or None
+            for (item_kind, target_id), index in latest.items() if item_kind == kind
+        }
+        if wanted:
+            by_kind[kind] = _apply_kind(user, kind, wanted)
+    for kind, results in by_kind.items():
+        _announce(kind, results)
+
+    activity.record_many([
+        (result['community'], user.pk, {'votes': 1})
+        for results in by_kind.values() for result in results.values() if result.get('status') == 'created'
+    ])
+
+    output = []
+    for index, item in enumerate(items):
+        entry = {'type': item['type'], 'id': item['id']}
+        if latest[item['type'], item['id']] != index:
+            entry['status'] = 'superseded'
+        else:
+            result = by_kind[item['type']][item['id']]
+            entry.update((key, value) for key, value in result.items() if key not in ('community', 'post'))
+        output.append(entry)
+    return output
@@ -0,0 +1,52 @@
+"""
+Deferred-import registry.
+
+Modules registered here are imported lazily: ``import x`` binds a module
+object immediately and the module body only runs on first attribute access
+(``importlib.util.LazyLoader``). Use it for heavy modules that are imported at
+startup but only needed by a few requests. ``from x import y`` still loads the
+module right away, because it touches an attribute.
+
+Settings call ``install(DEFERRED_IMPORTS)`` before any app is imported.
+"""
+import importlib.abc
+import importlib.util
+import sys
+
+_registry = set()
+
+
+class _LazyFinder(importlib.abc.MetaPathFinder):
+    def find_spec(self, fullname, path, target=None):
+        if fullname not in _registry:
+            return None
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, 'find_spec'):
+                continue
+            spec = finder.find_spec(fullname, path, target)
+            if spec is not None:
+                break
+        else:
+            return None
+        if spec.loader is None or not hasattr(spec.loader, 'exec_module'):
+            return spec
+        spec.loader = importlib.util.LazyLoader(spec.loader)
+        return spec
+
+
+_finder = _LazyFinder()
+
+
+def register(*names):
+    """Defer the named modules' execution until first use."""
+    _registry.update(names)
+
+
+def registered():
+    return sorted(_registry)
+
+
+def install(names=()):
+    register(*names)
+    if _finder not in sys.meta_path:
+        sys.meta_path.insert(0, _finder)
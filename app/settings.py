@@ -2,10 +2,15 @@
 Django settings for app project.
 """
 
+from importlib.util import find_spec
 from pathlib import Path
 import environ
+from django.conf import global_settings
+from django.core.exceptions import ImproperlyConfigured
 from datetime import timedelta
 
+from app import lazy_imports
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -43,6 +48,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -53,6 +59,25 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# API-only deployments skip the admin and the session/message machinery it
+# needs; clients authenticate with JWTs. Saves their import and init cost on
+# every cold start.
+API_ONLY = env.bool('API_ONLY', default=False)
+if API_ONLY:
+    for app in ('django.contrib.admin', 'django.contrib.messages', 'django.contrib.sessions'):
+        INSTALLED_APPS.remove(app)
+    for middleware in (
+        'django.contrib.sessions.middleware.SessionMiddleware',
+        'django.contrib.auth.middleware.AuthenticationMiddleware',
+        'django.contrib.messages.middleware.MessageMiddleware',
+    ):
+        MIDDLEWARE.remove(middleware)
+
+# Modules whose body runs on first attribute access rather than at import
+# (see app/lazy_imports.py). `manage.py startup_profile` shows what they cost.
+DEFERRED_IMPORTS = env.list('DEFERRED_IMPORTS', default=[])
+lazy_imports.install(DEFERRED_IMPORTS)
+
 ROOT_URLCONF = 'app.urls'
 
 TEMPLATES = [
@@ -101,9 +126,163 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.AllowAny',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'api.authentication.CachedJWTAuthentication',
+    ],
+    'DEFAULT_THROTTLE_CLASSES': [
+        'api.throttling.SlidingWindowThrottle',
     ],
+    # Reverse proxies in front of the app (1 on Fly.io). Anonymous clients are
+    # throttled by the address that many hops back in X-Forwarded-For; 0
+    # ignores the header, which clients could otherwise spoof.
+    'NUM_PROXIES': env.int('NUM_PROXIES', default=0),
+}
+
+# Shared cache, e.g. CACHE_URL=redis://cache:6379/1 or
+# memcache://cache:11211. The default local-memory cache is per process.
+CACHES = {
+    'default': env.cache('CACHE_URL', default='locmemcache://'),
+}
+
+# Request throttling (api/throttling.py), per user or per IP for anonymous
+# clients. Views choose a scope with `throttle_scope`; others count as `read`
+# or `write`. Override with e.g. THROTTLE_RATES="vote=30/min;register=5/hour";
+# an empty rate ("read=") turns a scope off.
+# THROTTLE_CACHE must be shared by every worker for the limits to hold.
+THROTTLE_CACHE = env.str('THROTTLE_CACHE', default='default')
+THROTTLE_RATES = {
+    'read': '600/min',
+    'write': '120/min',
+    'vote': '60/min',
+    'register': '10/hour',
+    'login': '20/min',
+    **env.dict('THROTTLE_RATES', cast={'value': str}, default={}),
 }
+THROTTLE_WINDOW_CACHE_SIZE = env.int('THROTTLE_WINDOW_CACHE_SIZE', default=10000)
+
+# Per-worker cache of authenticated users for read requests (see api/authentication.py).
+# AUTH_USER_CACHE holds the user-change marks and must be shared by every worker.
+AUTH_USER_CACHE = env.str('AUTH_USER_CACHE', default='default')
+AUTH_USER_CACHE_TTL = env.int('AUTH_USER_CACHE_TTL', default=30)
+AUTH_USER_CACHE_SIZE = env.int('AUTH_USER_CACHE_SIZE', default=10000)
+
+# Prometheus metrics served at /metrics/
+# Point METRICS_DIR at a directory shared by all gunicorn workers (e.g. a tmpfs)
+# so the endpoint aggregates every worker, not just the one that answers.
+METRICS_ENABLED = env.bool('METRICS_ENABLED', default=True)
+METRICS_DIR = env('METRICS_DIR', default='')
+METRICS_ALLOWED_IPS = env.list('METRICS_ALLOWED_IPS', default=['127.0.0.1', '::1'])
+METRICS_TOKEN = env('METRICS_TOKEN', default='')
+
+# Hot counter columns to spread over N CounterShard rows, e.g.
+# SHARDED_COUNTERS="api.Community.subscriber_count=16;api.Post.vote_count=16"
+# Run `manage.py consolidate_counters --loop 60` to fold shards back in.
+SHARDED_COUNTERS = env.dict('SHARDED_COUNTERS', cast={'value': int}, default={})
+
+# Keep vote, comment and subscriber counts with database triggers instead of
+# the views' UPDATEs (api/triggers.py; SQLite and MySQL). `migrate` installs
+# the triggers when this is on; `manage.py counter_triggers install|drop`
+# switches an existing database. Change both together.
+COUNTER_TRIGGERS = env.bool('COUNTER_TRIGGERS', default=False)
+
+# Background job queue (api/jobs.py). When disabled, jobs run inline.
+# Workers: `python manage.py run_jobs`. JOB_SCHEDULE enqueues periodic jobs,
+# e.g. JOB_SCHEDULE="consolidate_counters=60" (seconds).
+JOB_QUEUE_ENABLED = env.bool('JOB_QUEUE_ENABLED', default=False)
+JOB_MAX_ATTEMPTS = env.int('JOB_MAX_ATTEMPTS', default=5)
+JOB_RETRY_BACKOFF = env.float('JOB_RETRY_BACKOFF', default=2.0)
+JOB_CLAIM_TIMEOUT = env.int('JOB_CLAIM_TIMEOUT', default=300)
+JOB_SCHEDULE = env.dict('JOB_SCHEDULE', cast={'value': float}, default={})
+
+# Post views are buffered per worker and written every
+# POST_VIEW_FLUSH_INTERVAL seconds, or sooner once POST_VIEW_BUFFER_SIZE
+# distinct posts are buffered (about 2 KB of sketch per buffered post).
+POST_VIEW_FLUSH_INTERVAL = env.float('POST_VIEW_FLUSH_INTERVAL', default=10.0)
+POST_VIEW_BUFFER_SIZE = env.int('POST_VIEW_BUFFER_SIZE', default=1000)
+
+# Rows per DELETE when purging deleted communities, posts and users
+PURGE_CHUNK_SIZE = env.int('PURGE_CHUNK_SIZE', default=1000)
+
+# `manage.py archive_posts` moves posts older than this (with their comments
+# and votes) to the archive tables, zlib-compressing content when enabled.
+ARCHIVE_AFTER_DAYS = env.int('ARCHIVE_AFTER_DAYS', default=365)
+ARCHIVE_COMPRESS = env.bool('ARCHIVE_COMPRESS', default=True)
+
+# Posts per community front-page snapshot (GET /api/communities/<id>/posts/),
+# and how long a rebuild may hold its claim before another process retries.
+COMMUNITY_SNAPSHOT_SIZE = env.int('COMMUNITY_SNAPSHOT_SIZE', default=25)
+COMMUNITY_SNAPSHOT_REGENERATE_TIMEOUT = env.int('COMMUNITY_SNAPSHOT_REGENERATE_TIMEOUT', default=60)
+
+# Live updates over server-sent events (api/live.py); needs an ASGI worker.
+# Events are coalesced per channel and sent every LIVE_COALESCE_INTERVAL
+# seconds. LIVE_BACKEND relays them between processes: api.live.LocalBackend
+# (one process only) or api.live.DatabaseBackend (LiveEvent rows, polled).
+LIVE_BACKEND = env.str('LIVE_BACKEND', default='api.live.LocalBackend')
+LIVE_COALESCE_INTERVAL = env.float('LIVE_COALESCE_INTERVAL', default=1.0)
+LIVE_HEARTBEAT_INTERVAL = env.float('LIVE_HEARTBEAT_INTERVAL', default=15.0)
+LIVE_QUEUE_SIZE = env.int('LIVE_QUEUE_SIZE', default=100)
+LIVE_EVENT_RETENTION = env.int('LIVE_EVENT_RETENTION', default=300)
+
+# Community recommendations (api/recommendations.py; the batch job needs numpy
+# and scipy). Each community keeps its RECOMMENDATION_TOP_K most similar
+# communities that share at least RECOMMENDATION_MIN_OVERLAP subscribers.
+RECOMMENDATION_TOP_K = env.int('RECOMMENDATION_TOP_K', default=20)
+RECOMMENDATION_MIN_OVERLAP = env.int('RECOMMENDATION_MIN_OVERLAP', default=2)
+RECOMMENDATION_BLOCK_SIZE = env.int('RECOMMENDATION_BLOCK_SIZE', default=1000)
+
+# Longest range, in days, one activity rollup request may cover
+ACTIVITY_MAX_DAYS = env.int('ACTIVITY_MAX_DAYS', default=731)
+
+# Trending communities (api/trending.py): recent activity weighted per kind
+# and decayed by age, e.g. TRENDING_WEIGHTS="subscribers=3;posts=2;comments=1".
+TRENDING_WINDOW_DAYS = env.int('TRENDING_WINDOW_DAYS', default=7)
+TRENDING_HALF_LIFE_DAYS = env.float('TRENDING_HALF_LIFE_DAYS', default=2.0)
+TRENDING_WEIGHTS = env.dict(
+    'TRENDING_WEIGHTS', cast={'value': float}, default={'subscribers': 3.0, 'posts': 2.0, 'comments': 1.0},
+)
+
+# Most votes one POST /api/votes/bulk/ request may carry
+BULK_VOTE_MAX_ITEMS = env.int('BULK_VOTE_MAX_ITEMS', default=500)
+
+# Most ids one ?ids= multi-get request may ask for
+MULTI_GET_MAX_IDS = env.int('MULTI_GET_MAX_IDS', default=100)
+
+# Default page size of the cursor-paginated history lists
+# (GET /api/users/<id>/posts/, comments/ and votes/)
+HISTORY_PAGE_SIZE = env.int('HISTORY_PAGE_SIZE', default=25)
+
+# Reply notifications (api/inbox.py). The unread count clients poll is cached
+# per worker for INBOX_UNREAD_CACHE_TTL seconds.
+INBOX_UNREAD_CACHE_TTL = env.int('INBOX_UNREAD_CACHE_TTL', default=5)
+INBOX_UNREAD_CACHE_SIZE = env.int('INBOX_UNREAD_CACHE_SIZE', default=10000)
+INBOX_PAGE_SIZE = env.int('INBOX_PAGE_SIZE', default=25)
+
+# Password hashing. PASSWORD_HASHER picks the hasher for new hashes: pbkdf2
+# (default), argon2 (needs argon2-cffi), scrypt, bcrypt (needs bcrypt) or a
+# dotted path. The others stay installed, so existing hashes still verify and
+# are re-hashed with the new one on each user's next login.
+PASSWORD_HASHER = env.str('PASSWORD_HASHER', default='pbkdf2')
+PASSWORD_HASHERS = [{
+    'pbkdf2': 'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'argon2': 'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'scrypt': 'django.contrib.auth.hashers.ScryptPasswordHasher',
+    'bcrypt': 'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+}.get(PASSWORD_HASHER, PASSWORD_HASHER)]
+PASSWORD_HASHERS += [h for h in global_settings.PASSWORD_HASHERS if h not in PASSWORD_HASHERS]
+# Neither library is in the Pipfile: fail at startup, not on the first login.
+_hasher_package = {'argon2': ('argon2', 'argon2-cffi'), 'bcrypt': ('bcrypt', 'bcrypt')}.get(PASSWORD_HASHER)
+if _hasher_package and find_spec(_hasher_package[0]) is None:
+    raise ImproperlyConfigured(f"PASSWORD_HASHER={PASSWORD_HASHER} needs the {_hasher_package[1]} package.")
+
+# Hashing runs on a pool (api/hashing.py) of PASSWORD_HASH_WORKERS threads, or
+# processes with PASSWORD_HASH_POOL=process; 0 hashes in the request thread.
+# Up to PASSWORD_HASH_QUEUE more wait per worker process, for at most
+# PASSWORD_HASH_WAIT seconds, before the request gets a 503. The pool only
+# helps workers that serve requests concurrently (gthread, asgi): gunicorn's
+# sync worker defaults this to 0 (gunicorn.conf.py).
+PASSWORD_HASH_POOL = env.str('PASSWORD_HASH_POOL', default='thread')
+PASSWORD_HASH_WORKERS = env.int('PASSWORD_HASH_WORKERS', default=2)
+PASSWORD_HASH_QUEUE = env.int('PASSWORD_HASH_QUEUE', default=8)
+PASSWORD_HASH_WAIT = env.float('PASSWORD_HASH_WAIT', default=5.0)
 
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
@@ -153,6 +332,7 @@ SIMPLE_JWT = {
     'USER_ID_CLAIM': 'user_id',
     'AUTH_TOKEN_CLASSES': ('rest_framework_simplejwt.tokens.AccessToken',),
     'TOKEN_TYPE_CLAIM': 'token_type',
+    'TOKEN_OBTAIN_SERIALIZER': 'api.serializers.TokenObtainPairSerializer',
 }
 
 # CORS settings
@@ -0,0 +1,83 @@
+"""
+Pre-fork warm-up for the gunicorn master.
+
+Django and DRF build much of their state lazily on the first request: app
+submodules, the URL resolver, model relation trees, serializer field maps.
+Without ``preload_app`` every worker pays for that on its first request, and
+with it the work is only shared if it happens before forking. ``warm_up()``
+does it eagerly, then freezes the heap so worker garbage collection doesn't
+touch (and copy) the shared pages.
+"""
+import gc
+import importlib
+import importlib.util
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+APP_SUBMODULES = ('models', 'serializers', 'views', 'urls', 'admin')
+
+
+def _import_app_submodules():
+    from django.apps import apps
+
+    for config in apps.get_app_configs():
+        for submodule in APP_SUBMODULES:
+            if submodule == 'admin' and not apps.is_installed('django.contrib.admin'):
+                continue
+            name = f'{config.name}.{submodule}'
+            if importlib.util.find_spec(name) is not None:
+                importlib.import_module(name)
+
+
+def _build_url_resolver():
+    from django.urls import get_resolver
+
+    resolver = get_resolver()
+    # reverse_dict populates every pattern's compiled regex and lookup table.
+    resolver.reverse_dict
+
+
+def _build_model_metadata():
+    from django.apps import apps
+
+    for model in apps.get_models():
+        model._meta.get_fields()
+
+
+def _build_serializer_fields():
+    from rest_framework import serializers
+
+    from api import serializers as api_serializers
+
+    for value in vars(api_serializers).values():
+        if (
+            isinstance(value, type)
+            and issubclass(value, serializers.ModelSerializer)
+            and value.__module__ == api_serializers.__name__
+        ):
+            value().fields
+
+
+def _load_auth():
+    from django.contrib.auth.hashers import get_hashers
+    from rest_framework_simplejwt.state import token_backend
+
+    get_hashers()
+    token_backend.prepared_signing_key
+    token_backend.prepared_verifying_key
+
+
+def warm_up(freeze=True):
+    """Build lazily-initialized Django/DRF state now. Safe to call more than once."""
+    start = time.perf_counter()
+    _import_app_submodules()
+    _build_url_resolver()
+    _build_model_metadata()
+    _build_serializer_fields()
+    _load_auth()
+    if freeze:
+        gc.collect()
+        gc.freeze()
+    logger.info("Warm-up finished in %.0f ms", (time.perf_counter() - start) * 1000)
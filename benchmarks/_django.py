@@ -0,0 +1,36 @@
+"""
+Shared bootstrap for the benchmark scripts.
+
+Imports Django against the project settings (SQLite unless DB_* variables
+point elsewhere) and, with ``test_db=True``, creates a throwaway test
+database with all migrations applied.
+"""
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
+if 'DB_HOST' not in os.environ:
+    os.environ.setdefault('USE_SQLITE', '1')
+
+
+def setup(test_db=False, threads=False):
+    """
+    ``threads=True`` puts a SQLite test database in a temporary file instead
+    of memory so several threads can each open their own connection.
+    """
+    import django
+
+    django.setup()
+    if test_db:
+        import tempfile
+
+        from django.db import connection
+        from django.test.utils import setup_test_environment
+
+        if threads and connection.vendor == 'sqlite':
+            connection.settings_dict['TEST']['NAME'] = tempfile.mktemp(suffix='.sqlite3')
+            connection.settings_dict['OPTIONS']['timeout'] = 60
+        setup_test_environment()
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
@@ -0,0 +1,56 @@
+"""
+Compare stock JWTAuthentication with CachedJWTAuthentication on read requests.
+
+    python benchmarks/bench_auth.py
+
+For each class, reports queries per request and mean latency of
+GET /api/users/<id>/ with a bearer token.
+"""
+import time
+
+import _django
+
+_django.setup(test_db=True)
+
+from django.db import connection, reset_queries
+from django.test import Client
+from django.utils.module_loading import import_string
+from rest_framework.views import APIView
+from django.test.utils import CaptureQueriesContext
+
+from api.authentication import ClaimsRefreshToken, user_cache
+from api.models import User
+
+REQUESTS = 2000
+CLASSES = [
+    'rest_framework_simplejwt.authentication.JWTAuthentication',
+    'api.authentication.CachedJWTAuthentication',
+]
+
+
+def run(auth_class, user, token):
+    # Views read authentication_classes from APIView at import time.
+    APIView.authentication_classes = [import_string(auth_class)]
+    user_cache.clear()
+    client = Client(HTTP_AUTHORIZATION=f'Bearer {token}')
+    url = f'/api/users/{user.pk}/'
+    client.get(url)
+
+    reset_queries()
+    with CaptureQueriesContext(connection) as queries:
+        client.get(url)
+
+    start = time.perf_counter()
+    for _ in range(REQUESTS):
+        client.get(url)
+    elapsed = time.perf_counter() - start
+
+    print(f'{auth_class.rsplit(".", 1)[1]:<26} {len(queries):>3} queries/request '
+          f'{elapsed / REQUESTS * 1e6:>8.0f} us/request')
+
+
+if __name__ == '__main__':
+    user = User.objects.create_user(username='bench', password='x')
+    token = str(ClaimsRefreshToken.for_user(user).access_token)
+    for auth_class in CLASSES:
+        run(auth_class, user, token)
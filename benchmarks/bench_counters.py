@@ -0,0 +1,67 @@
+"""
+Multi-threaded contention benchmark for counter updates on one hot row.
+
+    python benchmarks/bench_counters.py [--threads 16] [--ops 200] [--shards 16]
+
+Each thread runs --ops transactions that bump Community.subscriber_count on
+the same community, first with the plain F() update and then with sharded
+counters. Row-lock contention only shows up on a server database (set the
+DB_* variables for MySQL); SQLite serializes all writers either way.
+"""
+import argparse
+import threading
+import time
+
+import _django
+
+_django.setup(test_db=True, threads=True)
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from api import counters
+from api.models import Community, User
+
+
+def hammer(community, ops, errors):
+    try:
+        for _ in range(ops):
+            with transaction.atomic():
+                counters.adjust(community, 'subscriber_count', 1)
+    except Exception as exc:  # pragma: no cover - reported below
+        errors.append(exc)
+    finally:
+        connection.close()
+
+
+def run(label, community, threads, ops):
+    errors = []
+    workers = [threading.Thread(target=hammer, args=(community, ops, errors)) for _ in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+
+    counters.consolidate()
+    total = counters.current_value(community, 'subscriber_count')
+    print(f'{label:<10} {threads * ops / elapsed:>10.0f} updates/s  '
+          f'(final count {total}, {len(errors)} errors)')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--ops', type=int, default=200)
+    parser.add_argument('--shards', type=int, default=16)
+    args = parser.parse_args()
+
+    user = User.objects.create_user(username='bench', password='x')
+    print(f'{connection.vendor}, {args.threads} threads x {args.ops} updates')
+
+    settings.SHARDED_COUNTERS = {}
+    run('direct', Community.objects.create(creator=user, name='direct', description=''), args.threads, args.ops)
+
+    settings.SHARDED_COUNTERS = {'api.Community.subscriber_count': args.shards}
+    run('sharded', Community.objects.create(creator=user, name='sharded', description=''), args.threads, args.ops)
@@ -0,0 +1,50 @@
+"""
+Payload size and query cost of the post feed, full vs. sparse.
+
+    python benchmarks/bench_feed_payload.py
+
+Creates 100 posts with 4 KB bodies and compares GET /api/posts/ against a
+title-only feed request using ?fields= and ?excerpt=.
+"""
+import time
+
+import _django
+
+_django.setup(test_db=True)
+
+from django.db import connection, reset_queries
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from api.authentication import ClaimsRefreshToken
+from api.models import Community, Post, User
+
+QUERIES = {
+    'full': '/api/posts/',
+    'sparse': '/api/posts/?fields=title,vote_count,comment_count,community&excerpt=140',
+}
+
+
+def measure(client, url, repeat=20):
+    reset_queries()
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(url)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        client.get(url)
+    elapsed = (time.perf_counter() - start) / repeat
+    return len(response.content), len(queries), elapsed
+
+
+if __name__ == '__main__':
+    user = User.objects.create_user(username='bench', password='x')
+    community = Community.objects.create(creator=user, name='bench', description='d' * 200)
+    Post.objects.bulk_create(
+        Post(user=user, community=community, title=f'Post {i}', content='lorem ipsum ' * 350, post_type='text')
+        for i in range(100)
+    )
+    client = Client(HTTP_AUTHORIZATION=f'Bearer {ClaimsRefreshToken.for_user(user).access_token}')
+
+    for label, url in QUERIES.items():
+        size, queries, elapsed = measure(client, url)
+        print(f'{label:<7} {size:>9,} bytes  {queries} queries  {elapsed * 1000:7.1f} ms')
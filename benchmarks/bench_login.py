@@ -0,0 +1,93 @@
+"""
+Login throughput, and what a login wave does to other requests.
+
+    python benchmarks/bench_login.py [--threads 8] [--logins 40]
+
+For each hasher and hashing mode, ``--threads`` clients log in
+``--logins`` times each through POST /api/token/ while one more client keeps
+reading GET /api/communities/. Reports logins per second and the readers'
+median and 95th percentile latency. Inline hashing is Django's default;
+``pool`` sends it to api.hashing's bounded thread pool.
+"""
+import argparse
+import os
+import statistics
+import threading
+import time
+
+import _django
+
+# The benchmark logs in far faster than the login throttle allows.
+os.environ['THROTTLE_RATES'] = 'login=;read='
+_django.setup(test_db=True, threads=True)
+
+from django.contrib.auth import hashers
+from django.db import connection
+from django.test import Client
+from django.test.utils import override_settings
+
+from api.authentication import ClaimsRefreshToken
+from api.models import User
+
+HASHERS = {
+    'pbkdf2': 'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'argon2': 'django.contrib.auth.hashers.Argon2PasswordHasher',
+}
+MODES = {'inline': 0, 'pool': 2}
+
+
+def run(hasher, workers, threads, logins):
+    with override_settings(PASSWORD_HASHERS=[hasher, *HASHERS.values()], PASSWORD_HASH_WORKERS=workers):
+        users = []
+        for i in range(threads):
+            user, _ = User.objects.get_or_create(username=f'bench{i}')
+            user.password = hashers.make_password('password')
+            user.save(update_fields=['password'])
+            users.append(user)
+
+        done = threading.Event()
+        reads = []
+        token = ClaimsRefreshToken.for_user(users[0]).access_token
+
+        def reader():
+            client = Client(HTTP_AUTHORIZATION=f'Bearer {token}')
+            while not done.is_set():
+                start = time.perf_counter()
+                client.get('/api/communities/')
+                reads.append(time.perf_counter() - start)
+            connection.close()
+
+        def login(user):
+            client = Client()
+            for _ in range(logins):
+                response = client.post('/api/token/', {'username': user.username, 'password': 'password'})
+                assert response.status_code == 200, response.content
+            connection.close()
+
+        read_thread = threading.Thread(target=reader)
+        read_thread.start()
+        clients = [threading.Thread(target=login, args=(user,)) for user in users]
+        start = time.perf_counter()
+        for client in clients:
+            client.start()
+        for client in clients:
+            client.join()
+        elapsed = time.perf_counter() - start
+        done.set()
+        read_thread.join()
+
+    reads.sort()
+    return threads * logins / elapsed, statistics.median(reads), reads[int(len(reads) * 0.95)]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--logins', type=int, default=40)
+    args = parser.parse_args()
+
+    print(f'{"hasher":<8} {"mode":<7} {"logins/s":>9} {"read p50":>10} {"read p95":>10}')
+    for name, hasher in HASHERS.items():
+        for mode, workers in MODES.items():
+            rate, p50, p95 = run(hasher, workers, args.threads, args.logins)
+            print(f'{name:<8} {mode:<7} {rate:>9.1f} {p50 * 1000:>8.1f}ms {p95 * 1000:>8.1f}ms')
@@ -0,0 +1,51 @@
+"""
+Microbenchmark for metric recording on the request hot path.
+
+    python benchmarks/bench_metrics.py
+
+Reports the cost of a counter increment, a histogram observation and the
+whole MetricsMiddleware wrapper, with in-memory and mmap-backed stores.
+"""
+import tempfile
+import timeit
+
+import _django
+
+_django.setup()
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.test import RequestFactory
+
+from api import metrics
+
+N = 200_000
+
+
+def per_call(stmt, number=N):
+    return min(timeit.repeat(stmt, number=number, repeat=3)) / number * 1e9
+
+
+def run(label):
+    metrics.reset_store()
+    counter = lambda: metrics.REQUESTS.inc('api:post-list', 'GET', '200')
+    histogram = lambda: metrics.REQUEST_LATENCY.observe(0.012, 'api:post-list')
+
+    request = RequestFactory().get('/')
+    request.resolver_match = None
+    middleware = metrics.MetricsMiddleware(lambda r: HttpResponse())
+    bare = lambda: HttpResponse()
+
+    print(f'[{label}]')
+    print(f'  counter.inc          {per_call(counter):8.0f} ns/op')
+    print(f'  histogram.observe    {per_call(histogram):8.0f} ns/op')
+    overhead = per_call(lambda: middleware(request), N // 10) - per_call(bare, N // 10)
+    print(f'  middleware overhead  {overhead:8.0f} ns/request')
+
+
+if __name__ == '__main__':
+    settings.METRICS_DIR = ''
+    run('in-process store')
+    with tempfile.TemporaryDirectory() as directory:
+        settings.METRICS_DIR = directory
+        run('mmap store')
@@ -0,0 +1,111 @@
+"""
+Community recommendations at scale: the batch job and the read paths.
+
+    python benchmarks/bench_recommendations.py [--subscriptions 1000000] [--users 100000] [--communities 5000]
+
+Generates subscriptions with Zipf-like community popularity, then times
+loading the sparse matrix, computing top-K neighbours, storing them, and the
+``similar``/``recommended`` reads. For comparison it times the per-community
+ORM query a naive implementation would run and extrapolates it to every
+community. Needs numpy and scipy.
+"""
+import argparse
+import time
+
+import _django
+
+_django.setup(test_db=True)
+
+import numpy as np
+from django.conf import settings
+from django.db import connection
+
+from api import recommendations, similarity
+from api.models import Community, Subscription, User
+
+
+def timed(label, func):
+    start = time.perf_counter()
+    result = func()
+    print(f'{label:<28} {time.perf_counter() - start:>8.2f}s')
+    return result
+
+
+def populate(users, communities, subscriptions, seed=0):
+    rng = np.random.default_rng(seed)
+    User.objects.bulk_create((User(username=f'u{i}') for i in range(users)), batch_size=5000)
+    creator = User.objects.order_by('pk').first()
+    Community.objects.bulk_create(
+        (Community(creator=creator, name=f'c{i}', name_key=f'c{i}', description='') for i in range(communities)),
+        batch_size=5000,
+    )
+    user_ids = np.array(User.objects.order_by('pk').values_list('pk', flat=True))
+    community_ids = np.array(Community.objects.order_by('pk').values_list('pk', flat=True))
+
+    # Popularity falls off like 1/rank; draw extra pairs to make up for duplicates.
+    weights = 1 / np.arange(1, communities + 1)
+    draws = int(subscriptions * 1.3)
+    pairs = np.stack([
+        rng.integers(0, users, draws),
+        rng.choice(communities, draws, p=weights / weights.sum()),
+    ], axis=1)
+    pairs = np.unique(pairs, axis=0)
+    pairs = pairs[rng.permutation(len(pairs))[:subscriptions]]
+    batch = 20000
+    for start in range(0, len(pairs), batch):
+        Subscription.objects.bulk_create(
+            Subscription(user_id=user_ids[u], community_id=community_ids[c])
+            for u, c in pairs[start:start + batch].tolist()
+        )
+    return len(pairs)
+
+
+def naive_per_community(sample=20):
+    """Co-subscription counts for one community via the ORM, as a per-request view would."""
+    from django.db.models import Count
+
+    pks = list(Community.objects.order_by('pk').values_list('pk', flat=True))
+    pks = pks[::max(1, len(pks) // sample)]  # popular and obscure alike
+    start = time.perf_counter()
+    for pk in pks:
+        readers = Subscription.objects.filter(community_id=pk).values('user_id')
+        list(
+            Subscription.objects.filter(user_id__in=readers).exclude(community_id=pk)
+            .values('community_id').annotate(n=Count('pk')).order_by('-n')[:settings.RECOMMENDATION_TOP_K]
+        )
+    return (time.perf_counter() - start) / len(pks)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--subscriptions', type=int, default=1_000_000)
+    parser.add_argument('--users', type=int, default=100_000)
+    parser.add_argument('--communities', type=int, default=5_000)
+    args = parser.parse_args()
+
+    print(f'database: {connection.vendor}')
+    created = timed('populate', lambda: populate(args.users, args.communities, args.subscriptions))
+    print(f'{created} subscriptions, {args.users} users, {args.communities} communities')
+
+    matrix, ids = timed('load sparse matrix', lambda: similarity.subscription_matrix(recommendations._pairs(100_000)))
+    blocks = timed('top-K neighbours', lambda: list(similarity.top_neighbours(
+        matrix, settings.RECOMMENDATION_TOP_K, settings.RECOMMENDATION_MIN_OVERLAP, settings.RECOMMENDATION_BLOCK_SIZE,
+    )))
+    print(f'{sum(len(b[2]) for b in blocks)} neighbour rows')
+    timed('full compute() incl. store', recommendations.compute)
+
+    per = naive_per_community()
+    print(f'{"naive ORM, per community":<28} {per * 1000:>8.1f}ms  (~{per * args.communities:.0f}s for all)')
+
+    popular = Community.objects.order_by('pk').first()
+    reader = Subscription.objects.values_list('user', flat=True).order_by('user').first()
+    reps = 200
+    start = time.perf_counter()
+    for _ in range(reps):
+        recommendations.similar(popular.pk, 10)
+    print(f'{"similar() read":<28} {(time.perf_counter() - start) / reps * 1000:>8.2f}ms')
+    user = User.objects.get(pk=reader)
+    start = time.perf_counter()
+    for _ in range(reps):
+        recommendations.recommended(user, 10)
+    print(f'{"recommended() read":<28} {(time.perf_counter() - start) / reps * 1000:>8.2f}ms')
@@ -0,0 +1,62 @@
+"""
+Serializer construction and rendering cost, with and without the cached
+field maps of CachedFieldsMixin.
+
+    python benchmarks/bench_serializers.py [--posts 100] [--repeat 200]
+
+"construct" builds a PostSerializer and its fields (as every request does);
+"render" serializes a page of posts with nested user and community.
+"""
+import argparse
+import time
+
+import _django
+
+_django.setup(test_db=True)
+
+from api.models import Community, Post, User
+from api.serializers import CachedFieldsMixin, PostSerializer, clear_field_cache
+
+cached_get_fields = CachedFieldsMixin.get_fields
+
+
+def uncached_get_fields(self):
+    return super(CachedFieldsMixin, self).get_fields()
+
+
+def per_call(func, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def construct():
+    PostSerializer().fields
+
+
+def run(label, get_fields, posts, repeat):
+    CachedFieldsMixin.get_fields = get_fields
+    clear_field_cache()
+    construct()
+    build = per_call(construct, repeat)
+    render = per_call(lambda: PostSerializer(posts, many=True).data, max(1, repeat // 20))
+    print(f'{label:<9} construct {build:8.1f} us   render {len(posts)} posts {render / 1000:8.2f} ms')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--posts', type=int, default=100)
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    user = User.objects.create_user(username='bench', password='x')
+    community = Community.objects.create(creator=user, name='bench', description='d')
+    Post.objects.bulk_create(
+        Post(user=user, community=community, title=f'Post {i}', content='body', post_type='text')
+        for i in range(args.posts)
+    )
+    posts = list(Post.objects.select_related('user', 'community'))
+
+    run('uncached', uncached_get_fields, posts, args.repeat)
+    run('cached', cached_get_fields, posts, args.repeat)
@@ -0,0 +1,108 @@
+"""
+Gunicorn cold-start benchmark: time to first response and per-worker memory.
+
+    python benchmarks/bench_startup.py [--workers 3] [--classes sync,gthread,asgi]
+
+For each worker class, with and without preload, starts gunicorn with
+gunicorn.conf.py on a free port and reports:
+
+- time from exec to the first successful response,
+- latency of the first request answered by each worker,
+- RSS and PSS of each worker (PSS divides shared copy-on-write pages between
+  the processes sharing them, so it drops when preload shares memory).
+
+Linux only (reads /proc).
+"""
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+URL = 'http://127.0.0.1:{port}/api/'
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def get(url):
+    start = time.perf_counter()
+    try:
+        urllib.request.urlopen(url, timeout=10).read()
+    except urllib.error.HTTPError:
+        pass
+    return time.perf_counter() - start
+
+
+def children(pid):
+    path = Path(f'/proc/{pid}/task/{pid}/children')
+    return [int(child) for child in path.read_text().split()] if path.exists() else []
+
+
+def memory_kb(pid):
+    values = {}
+    for line in Path(f'/proc/{pid}/smaps_rollup').read_text().splitlines():
+        parts = line.split()
+        if parts[0] in ('Rss:', 'Pss:'):
+            values[parts[0][:-1]] = int(parts[1])
+    return values
+
+
+def run(worker_class, preload, workers):
+    port = free_port()
+    env = {
+        **os.environ,
+        'PORT': str(port),
+        'WEB_CONCURRENCY': str(workers),
+        'GUNICORN_WORKER_CLASS': worker_class,
+        'GUNICORN_PRELOAD': str(preload),
+        'USE_SQLITE': os.environ.get('USE_SQLITE', '1'),
+    }
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--config', 'gunicorn.conf.py', '--log-level', 'warning'],
+        cwd=ROOT, env=env,
+    )
+    try:
+        url = URL.format(port=port)
+        while True:
+            try:
+                first = get(url)
+                break
+            except (urllib.error.URLError, ConnectionError):
+                if server.poll() is not None:
+                    raise RuntimeError(f'gunicorn exited with {server.returncode}')
+                time.sleep(0.01)
+        ready = time.perf_counter() - start
+
+        # Spread requests so every worker answers at least once.
+        latencies = sorted(get(url) for _ in range(workers * 4))
+        pids = children(server.pid)
+        memory = [memory_kb(pid) for pid in pids]
+    finally:
+        server.terminate()
+        server.wait()
+
+    rss = sum(m['Rss'] for m in memory) / len(memory) / 1024
+    pss = sum(m['Pss'] for m in memory) / len(memory) / 1024
+    print(f'{worker_class:<8} preload={str(preload):<5} first response {ready * 1000:7.0f} ms '
+          f'(request {first * 1000:5.1f} ms, slowest warm {latencies[-1] * 1000:5.1f} ms)  '
+          f'worker RSS {rss:5.1f} MB  PSS {pss:5.1f} MB')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', type=int, default=3)
+    parser.add_argument('--classes', default='sync,gthread,asgi')
+    args = parser.parse_args()
+    for worker_class in args.classes.split(','):
+        for preload in (False, True):
+            run(worker_class, preload, args.workers)
@@ -0,0 +1,84 @@
+"""
+Gunicorn settings. Gunicorn reads ./gunicorn.conf.py automatically, so the
+Dockerfile and compose file only need to run `gunicorn`.
+
+Environment variables:
+
+- PORT: listen port (default 8000)
+- WEB_CONCURRENCY: worker processes (default 3)
+- GUNICORN_WORKER_CLASS: `sync` (default), `gthread`, or `asgi` (uvicorn worker
+  serving app.asgi; needs uvicorn installed)
+- GUNICORN_THREADS: threads per worker for `gthread` (default 4)
+- GUNICORN_PRELOAD: load and warm the app in the master before forking so
+  workers share its memory copy-on-write (default true)
+- GUNICORN_TIMEOUT, GUNICORN_MAX_REQUESTS, GUNICORN_MAX_REQUESTS_JITTER
+"""
+import glob
+import os
+import sys
+
+
+def _env_bool(name, default):
+    return os.environ.get(name, str(default)).lower() in ('1', 'true', 'yes', 'on')
+
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', '3'))
+preload_app = _env_bool('GUNICORN_PRELOAD', True)
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', '30'))
+keepalive = 5
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', '0'))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', '0'))
+loglevel = 'info'
+
+_worker_kind = os.environ.get('GUNICORN_WORKER_CLASS', 'sync')
+if _worker_kind == 'gthread':
+    worker_class = 'gthread'
+    threads = int(os.environ.get('GUNICORN_THREADS', '4'))
+    wsgi_app = 'app.wsgi:application'
+elif _worker_kind == 'asgi':
+    worker_class = 'uvicorn.workers.UvicornWorker'
+    wsgi_app = 'app.asgi:application'
+elif _worker_kind == 'sync':
+    worker_class = 'sync'
+    wsgi_app = 'app.wsgi:application'
+    # A sync worker serves one request at a time and would only wait on the
+    # password-hash pool, so hash inline unless explicitly configured.
+    os.environ.setdefault('PASSWORD_HASH_WORKERS', '0')
+else:
+    raise ValueError(f"Unknown GUNICORN_WORKER_CLASS {_worker_kind!r}; use sync, gthread or asgi.")
+
+
+def on_starting(server):
+    # Metrics files from a previous master describe workers that no longer exist.
+    # Only this app's files: the directory may be shared (e.g. /dev/shm).
+    metrics_dir = os.environ.get('METRICS_DIR')
+    if metrics_dir:
+        os.makedirs(metrics_dir, exist_ok=True)
+        for path in glob.glob(os.path.join(metrics_dir, 'metrics_*.db')):
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+
+
+def when_ready(server):
+    if server.cfg.preload_app:
+        from app.warmup import warm_up
+
+        warm_up()
+
+
+def pre_fork(server, worker):
+    # Never hand the master's database connections to a child.
+    if 'django.db' in sys.modules:
+        from django.db import connections
+
+        connections.close_all()
+
+
+def post_worker_init(worker):
+    if not worker.cfg.preload_app:
+        from app.warmup import warm_up
+
+        warm_up(freeze=False)